@@ -49,14 +49,79 @@ def create_app(config_name=None):
     from app.api.docs import docs_bp
     from app.api.health import health_bp
     from app.api.paths import paths_bp
+    from app.api.replays import replays_bp
     from app.api.webhooks import webhooks_bp
 
     app.register_blueprint(paths_bp, url_prefix="/api")
+    app.register_blueprint(replays_bp, url_prefix="/api")
     app.register_blueprint(webhooks_bp, url_prefix="/webhook")
     app.register_blueprint(health_bp, url_prefix="/health")
     app.register_blueprint(docs_bp)
 
     # Import models to ensure they are registered with SQLAlchemy
-    from app.models import path, request
+    from app.models import path, request, request_body, request_rollup
+
+    # Per-worker path lookup cache
+    if app.config["PATH_CACHE_SIZE"] > 0:
+        from app.utils.cache import LRUCache
+
+        app.extensions["path_cache"] = LRUCache(
+            maxsize=app.config["PATH_CACHE_SIZE"], ttl=app.config["PATH_CACHE_TTL"]
+        )
+
+    # Per-worker filter of existing paths (built on first lookup)
+    if app.config["PATH_FILTER_ENABLED"]:
+        from app.services.path_filter import PathFilter
+
+        app.extensions["path_filter"] = PathFilter.from_config(app)
+
+    # Dashboard statistics snapshot
+    from app.services.stats_snapshot import StatsSnapshot
+
+    app.extensions["stats_snapshot"] = StatsSnapshot.from_config(app)
+
+    # Segment files for large bodies (also read after spilling is disabled)
+    from app.services.blob_store import BlobStore
+
+    app.extensions["blob_store"] = BlobStore.from_config(app)
+
+    # Partition maintenance for a range-partitioned requests table
+    if app.config["REQUESTS_PARTITIONING"] != "none":
+        from app.services.partitions import RequestPartitions
+
+        app.extensions["request_partitions"] = RequestPartitions.from_config(app)
+
+    # Retention worker (the scheduler is started per worker by gunicorn)
+    from app.services.retention import RetentionWorker
+
+    app.extensions["retention_worker"] = RetentionWorker.from_config(app)
+
+    # Live delivery of captured requests to stream subscribers
+    from app.services.capture_broker import CaptureBroker
+
+    app.extensions["capture_broker"] = CaptureBroker.from_config(app)
+
+    # Replay jobs re-sending captured requests (run by the worker creating them)
+    from app.services.replay import ReplayManager
+
+    app.extensions["replay_manager"] = ReplayManager.from_config(app)
+
+    # Relaying of captured requests to path upstreams (pool started on use)
+    from app.services.forwarder import Forwarder
+
+    app.extensions["forwarder"] = Forwarder.from_config(app)
+
+    # CLI commands
+    from app.cli import export_requests, import_requests, retention_cli
+
+    app.cli.add_command(retention_cli)
+    app.cli.add_command(export_requests)
+    app.cli.add_command(import_requests)
+
+    # Write-behind ingest queue (per worker, started on first capture)
+    if app.config["INGEST_MODE"] == "queued":
+        from app.services.ingest_queue import IngestQueue
+
+        app.extensions["ingest_queue"] = IngestQueue.from_config(app)
 
     return app
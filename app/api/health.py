@@ -1,7 +1,9 @@
 """Health check blueprint."""
 
+import os
+
 import structlog
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify
 from sqlalchemy import text
 
 from app import db
@@ -53,3 +55,30 @@ def readiness_check():
 def liveness_check():
     """Liveness check for basic application health."""
     return jsonify({"status": "alive", "service": "callback-listener-backend"}), 200
+
+
+@health_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """In-process metrics for this worker."""
+    data = {"pid": os.getpid(), "ingest_mode": current_app.config["INGEST_MODE"]}
+
+    path_cache = current_app.extensions.get("path_cache")
+    if path_cache is not None:
+        data["path_cache"] = path_cache.stats()
+
+    path_filter = current_app.extensions.get("path_filter")
+    if path_filter is not None:
+        data["path_filter"] = path_filter.stats()
+
+    data["stats_snapshot"] = current_app.extensions["stats_snapshot"].stats()
+    data["blob_store"] = current_app.extensions["blob_store"].stats()
+    data["retention"] = current_app.extensions["retention_worker"].stats()
+    data["capture_broker"] = current_app.extensions["capture_broker"].stats()
+    data["replays"] = current_app.extensions["replay_manager"].stats()
+    data["forwarding"] = current_app.extensions["forwarder"].stats()
+
+    ingest_queue = current_app.extensions.get("ingest_queue")
+    if ingest_queue is not None:
+        data["ingest_queue"] = ingest_queue.stats()
+
+    return jsonify({"status": "ok", "metrics": data}), 200
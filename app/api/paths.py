@@ -1,11 +1,34 @@
 """API blueprint for path management."""
 
 import structlog
-from flask import Blueprint, jsonify, request
-from marshmallow import Schema, ValidationError, fields
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
+from marshmallow import Schema, ValidationError, fields, validate
 
 from app.models.path import Path
 from app.models.request import Request
+from app.models.request_rollup import UNITS
+from app.services.capture_broker import (
+    SubscriberLimitReached,
+    get_capture_broker,
+    sse_stream,
+)
+from app.services.export import (
+    COLUMNAR_FORMATS,
+    EXPORT_MIMETYPES,
+    ColumnarExportUnavailable,
+    export_path,
+    gzip_chunks,
+)
+from app.services.stats_snapshot import get_stats_snapshot
+from app.services.webhook_service import PathService, RequestService
+from app.utils.helpers import parse_timestamp
 
 logger = structlog.get_logger()
 paths_bp = Blueprint("paths", __name__)
@@ -15,6 +38,23 @@ class CreatePathSchema(Schema):
     """Schema for creating a new path."""
 
     path_id = fields.Str(required=False, allow_none=True)
+    max_requests = fields.Int(allow_none=True, validate=validate.Range(min=1))
+    max_age = fields.Int(allow_none=True, validate=validate.Range(min=1))
+    max_bytes = fields.Int(allow_none=True, validate=validate.Range(min=1))
+    forward_url = fields.Url(
+        allow_none=True, schemes={"http", "https"}, require_tld=False
+    )
+
+
+class UpdatePathSchema(Schema):
+    """Schema for changing the settings of a path; absent fields are kept."""
+
+    max_requests = fields.Int(allow_none=True, validate=validate.Range(min=1))
+    max_age = fields.Int(allow_none=True, validate=validate.Range(min=1))
+    max_bytes = fields.Int(allow_none=True, validate=validate.Range(min=1))
+    forward_url = fields.Url(
+        allow_none=True, schemes={"http", "https"}, require_tld=False
+    )
 
 
 class PathResponseSchema(Schema):
@@ -25,6 +65,12 @@ class PathResponseSchema(Schema):
     created_at = fields.Str(required=True)
     updated_at = fields.Str(required=True)
     request_count = fields.Int(required=True)
+    last_request_at = fields.Str(allow_none=True)
+    total_body_bytes = fields.Int(required=True)
+    max_requests = fields.Int(allow_none=True)
+    max_age = fields.Int(allow_none=True)
+    max_bytes = fields.Int(allow_none=True)
+    forward_url = fields.Str(allow_none=True)
 
 
 class RequestResponseSchema(Schema):
@@ -35,10 +81,14 @@ class RequestResponseSchema(Schema):
     method = fields.Str(required=True)
     headers = fields.Dict(required=True)
     body = fields.Str(allow_none=True)
+    body_encoding = fields.Str()
     query_params = fields.Dict(required=True)
     ip_address = fields.Str(allow_none=True)
     user_agent = fields.Str(allow_none=True)
     timestamp = fields.Str(required=True)
+    upstream_status = fields.Int(allow_none=True)
+    upstream_latency_ms = fields.Int(allow_none=True)
+    upstream_error = fields.Str(allow_none=True)
 
 
 @paths_bp.route("/paths", methods=["GET"])
@@ -88,6 +138,244 @@ def get_path(path_id):
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+@paths_bp.route("/paths/<string:path_id>", methods=["PATCH"])
+def update_path(path_id):
+    """Change the retention policy or upstream of a path."""
+    try:
+        data = UpdatePathSchema().load(request.get_json() or {})
+
+        path = Path.find_by_path_id(path_id)
+        if not path:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        path.update_settings(**data)
+
+        logger.info("Path updated", path_id=path_id, fields=sorted(data))
+
+        response_schema = PathResponseSchema()
+        return (
+            jsonify({"success": True, "data": response_schema.dump(path.to_dict())}),
+            200,
+        )
+
+    except ValidationError as e:
+        logger.warning("Validation error updating path", errors=e.messages)
+        return (
+            jsonify(
+                {"success": False, "error": "Validation error", "details": e.messages}
+            ),
+            400,
+        )
+
+    except Exception as e:
+        logger.error(
+            "Error updating path", path_id=path_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@paths_bp.route("/paths/<string:path_id>/stream", methods=["GET"])
+def stream_path_requests(path_id):
+    """Stream newly captured requests of a path as Server-Sent Events."""
+    try:
+        path = Path.find_by_path_id(path_id)
+        if not path:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        broker = get_capture_broker()
+        try:
+            subscription = broker.subscribe(path_id)
+        except SubscriberLimitReached:
+            logger.warning("Stream subscriber limit reached", path_id=path_id)
+            response = jsonify({"success": False, "error": "Too many subscribers"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+
+        # Subscribed first, so nothing captured while catching up is missed
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+            "last_event_id"
+        )
+        try:
+            backlog, complete = RequestService.get_capture_events(
+                path_id, last_event_id or None, broker
+            )
+        except Exception:
+            subscription.close()
+            raise
+
+        logger.info(
+            "Path stream opened",
+            path_id=path_id,
+            resumed=bool(last_event_id),
+            backlog=len(backlog),
+        )
+
+        response = Response(
+            sse_stream(
+                subscription,
+                backlog,
+                live=complete,
+                heartbeat=current_app.config["STREAM_HEARTBEAT"],
+                max_duration=current_app.config["STREAM_MAX_DURATION"],
+            ),
+            mimetype="text/event-stream",
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        # Tell nginx not to buffer the stream
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid Last-Event-ID"}), 400
+
+    except Exception as e:
+        logger.error(
+            "Error streaming path requests",
+            path_id=path_id,
+            error=str(e),
+            exc_info=True,
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@paths_bp.route("/paths/<string:path_id>/export", methods=["GET"])
+def export_path_requests(path_id):
+    """Stream every request of a path as NDJSON, CSV, Parquet or Arrow."""
+    try:
+        export_format = request.args.get("format", "ndjson")
+        since = parse_timestamp(request.args.get("since"))
+        until = parse_timestamp(request.args.get("until"))
+        if since and until and since >= until:
+            raise ValueError("since must be before until")
+        include_body = request.args.get("include_body", "true").lower() == "true"
+
+        chunks = export_path(
+            path_id,
+            format=export_format,
+            since=since,
+            until=until,
+            include_body=include_body,
+        )
+        if chunks is None:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        # Parquet and Arrow are binary and compressed by column already
+        compress = (
+            export_format not in COLUMNAR_FORMATS and "gzip" in request.accept_encodings
+        )
+        logger.info(
+            "Path export started",
+            path_id=path_id,
+            format=export_format,
+            gzip=compress,
+        )
+
+        if compress:
+            chunks = gzip_chunks(chunks)
+        # The database session must stay open while rows are streamed
+        response = Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_MIMETYPES[export_format],
+        )
+        response.headers.set(
+            "Content-Disposition", "attachment", filename=f"{path_id}.{export_format}"
+        )
+        response.headers["Vary"] = "Accept-Encoding"
+        if compress:
+            response.headers["Content-Encoding"] = "gzip"
+        return response
+
+    except ColumnarExportUnavailable as e:
+        return jsonify({"success": False, "error": str(e)}), 501
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid export parameters"}), 400
+
+    except Exception as e:
+        logger.error(
+            "Error exporting path", path_id=path_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@paths_bp.route("/paths/<string:path_id>/stats", methods=["GET"])
+def get_path_stats(path_id):
+    """Get request statistics for a path, optionally within a time window."""
+    try:
+        since = parse_timestamp(request.args.get("since"))
+        until = parse_timestamp(request.args.get("until"))
+        if since and until and since >= until:
+            raise ValueError("since must be before until")
+
+        stats = PathService.get_path_statistics(path_id, since=since, until=until)
+        if stats is None:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        logger.info("Path stats retrieved", path_id=path_id, since=since, until=until)
+
+        return jsonify({"success": True, "data": stats}), 200
+
+    except ValueError:
+        return (
+            jsonify({"success": False, "error": "Invalid time window parameters"}),
+            400,
+        )
+
+    except Exception as e:
+        logger.error(
+            "Error retrieving path stats", path_id=path_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@paths_bp.route("/paths/<string:path_id>/timeseries", methods=["GET"])
+def get_path_timeseries(path_id):
+    """Get request counts over time for a path, from the rollups."""
+    try:
+        since = parse_timestamp(request.args.get("since"))
+        until = parse_timestamp(request.args.get("until"))
+        if since and until and since >= until:
+            raise ValueError("since must be before until")
+        resolution = request.args.get("resolution")
+        if resolution is not None and resolution not in UNITS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        method = request.args.get("method")
+
+        timeseries = PathService.get_path_timeseries(
+            path_id,
+            since=since,
+            until=until,
+            resolution=resolution,
+            method=method.upper() if method else None,
+        )
+        if timeseries is None:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        logger.info(
+            "Path timeseries retrieved",
+            path_id=path_id,
+            resolution=timeseries["resolution"],
+            points=len(timeseries["points"]),
+        )
+
+        return jsonify({"success": True, "data": timeseries}), 200
+
+    except ValueError:
+        return (
+            jsonify({"success": False, "error": "Invalid time series parameters"}),
+            400,
+        )
+
+    except Exception as e:
+        logger.error(
+            "Error retrieving path timeseries",
+            path_id=path_id,
+            error=str(e),
+            exc_info=True,
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 @paths_bp.route("/paths/<string:path_id>", methods=["DELETE"])
 def delete_path(path_id):
     """Delete a webhook path and all its requests."""
@@ -117,31 +405,18 @@ def delete_path(path_id):
 def get_dashboard_stats():
     """Get dashboard statistics."""
     try:
-        # Get basic stats
-        total_paths = Path.count_all()
-        all_paths = Path.get_all_paths()
-
-        # Calculate stats
-        total_requests = sum(path.request_count for path in all_paths)
-        active_paths = len([path for path in all_paths if path.request_count > 0])
-
-        # Get recent requests (last 10)
-        recent_requests = Request.get_recent_requests(limit=10)
+        # Served from the shared snapshot, refreshed off the request thread
+        stats = get_stats_snapshot().get()
 
         # Serialize recent requests
         request_schema = RequestResponseSchema(many=True)
-        recent_requests_data = [
-            req.to_dict(include_body=False) for req in recent_requests
-        ]
-
-        stats = {
-            "total_webhooks": total_paths,
-            "total_requests": total_requests,
-            "active_webhooks": active_paths,
-            "recent_requests": request_schema.dump(recent_requests_data),
-        }
+        stats["recent_requests"] = request_schema.dump(stats["recent_requests"])
 
-        logger.info("Dashboard stats retrieved", stats=stats)
+        logger.info(
+            "Dashboard stats retrieved",
+            total_webhooks=stats["total_webhooks"],
+            age_seconds=stats["age_seconds"],
+        )
 
         return (
             jsonify({"success": True, "data": stats}),
@@ -162,7 +437,13 @@ def create_path():
         data = schema.load(request.get_json() or {})
 
         # Create new path
-        path = Path.create_new_path(path_id=data.get("path_id"))
+        path = Path.create_new_path(
+            path_id=data.get("path_id"),
+            max_requests=data.get("max_requests"),
+            max_age=data.get("max_age"),
+            max_bytes=data.get("max_bytes"),
+            forward_url=data.get("forward_url"),
+        )
 
         logger.info("Path created", path_id=path.path_id, id=str(path.id))
 
@@ -193,7 +474,15 @@ def get_path_logs(path_id):
     try:
         # Get pagination parameters
         limit = min(int(request.args.get("limit", 100)), 1000)  # Max 1000
+        if limit < 1:
+            raise ValueError("limit must be positive")
         offset = max(int(request.args.get("offset", 0)), 0)
+        cursor = request.args.get("cursor") or None
+        method = request.args.get("method") or None
+        since = parse_timestamp(request.args.get("since"))
+        header_keys = [
+            key for key in request.args.get("headers", "").split(",") if key.strip()
+        ]
         include_body = request.args.get("include_body", "true").lower() == "true"
 
         # Check if path exists
@@ -201,8 +490,17 @@ def get_path_logs(path_id):
         if not path:
             return jsonify({"success": False, "error": "Path not found"}), 404
 
-        # Get requests
-        requests = Request.get_by_path_id(path_id, limit=limit, offset=offset)
+        # Get requests; a cursor takes precedence over offset
+        requests, next_cursor, prev_cursor = Request.get_page_by_path_id(
+            path_id,
+            limit=limit,
+            cursor=cursor,
+            offset=offset,
+            method=method,
+            since=since,
+            header_keys=header_keys,
+            include_body=include_body,
+        )
 
         # Serialize requests
         response_schema = RequestResponseSchema(many=True)
@@ -214,6 +512,7 @@ def get_path_logs(path_id):
             count=len(requests_data),
             limit=limit,
             offset=offset,
+            cursor=bool(cursor),
         )
 
         return (
@@ -225,8 +524,11 @@ def get_path_logs(path_id):
                         "requests": response_schema.dump(requests_data),
                         "pagination": {
                             "limit": limit,
-                            "offset": offset,
-                            "total": len(path.requests) if path.requests else 0,
+                            "offset": None if cursor else offset,
+                            # Filtered totals would need a count query
+                            "total": None if method or since else path.request_count,
+                            "next_cursor": next_cursor,
+                            "prev_cursor": prev_cursor,
                         },
                     },
                 }
@@ -247,6 +549,54 @@ def get_path_logs(path_id):
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+@paths_bp.route("/paths/<string:path_id>/logs/wait", methods=["GET"])
+def wait_for_path_request(path_id):
+    """Wait for the next request captured for a path and return it."""
+    try:
+        after = request.args.get("after") or None
+        timeout = float(request.args.get("timeout", 30))
+        if not 0 < timeout <= current_app.config["WAIT_MAX_TIMEOUT"]:
+            raise ValueError("timeout out of range")
+
+        if not Path.find_by_path_id(path_id):
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        try:
+            captured = RequestService.wait_for_request(
+                path_id, after, timeout, get_capture_broker()
+            )
+        except LookupError:
+            return jsonify({"success": False, "error": "Request not found"}), 404
+        except SubscriberLimitReached:
+            logger.warning("Wait subscriber limit reached", path_id=path_id)
+            response = jsonify({"success": False, "error": "Too many subscribers"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+
+        logger.info(
+            "Path wait finished",
+            path_id=path_id,
+            after=after,
+            request_id=captured["id"] if captured else None,
+        )
+
+        if captured is None:
+            return "", 204
+        return jsonify({"success": True, "data": captured}), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid timeout"}), 400
+
+    except Exception as e:
+        logger.error(
+            "Error waiting for path request",
+            path_id=path_id,
+            error=str(e),
+            exc_info=True,
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 @paths_bp.route("/paths/<string:path_id>/logs/<string:request_id>", methods=["GET"])
 def get_specific_request(path_id, request_id):
     """Get a specific request by ID."""
@@ -279,6 +629,88 @@ def get_specific_request(path_id, request_id):
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+@paths_bp.route(
+    "/paths/<string:path_id>/logs/<string:request_id>/body", methods=["GET"]
+)
+def get_request_body(path_id, request_id):
+    """Stream the raw body of a request with its original Content-Type.
+
+    The body digest is the ETag. A single byte range is served as 206 when
+    there is no If-Range or it matches the ETag; other requests get the
+    whole body.
+    """
+    try:
+        req = Request.get_by_id_and_path(request_id, path_id)
+        if not req:
+            return jsonify({"success": False, "error": "Request not found"}), 404
+
+        record = req.body_record
+        if record is None:
+            return Response(status=204)
+
+        if request.if_none_match.contains_weak(record.digest):
+            response = Response(status=304)
+            response.set_etag(record.digest)
+            return response
+
+        length = record.size
+        start, stop = 0, length
+        status = 200
+        content_range = None
+        byte_range = request.range
+        if_range = request.if_range
+        if (
+            byte_range is not None
+            and len(byte_range.ranges) == 1
+            and (if_range.date is None and if_range.etag in (None, record.digest))
+        ):
+            bounds = byte_range.range_for_length(length)
+            if bounds is None:
+                response = Response(status=416)
+                response.headers["Content-Range"] = f"bytes */{length}"
+                return response
+            start, stop = bounds
+            status = 206
+            content_range = byte_range.to_content_range_header(length)
+
+        content_type = req.headers_dict.get("Content-Type")
+        if not content_type and req.content_type:
+            content_type = req.content_type
+            if req.charset:
+                content_type += f"; charset={req.charset}"
+
+        response = Response(
+            record.iter_range(start, stop),
+            status=status,
+            content_type=content_type or "application/octet-stream",
+            direct_passthrough=True,
+        )
+        response.content_length = stop - start
+        response.accept_ranges = "bytes"
+        response.set_etag(record.digest)
+        if content_range:
+            response.headers["Content-Range"] = content_range
+
+        logger.info(
+            "Request body streamed",
+            path_id=path_id,
+            request_id=request_id,
+            start=start,
+            stop=stop,
+        )
+        return response
+
+    except Exception as e:
+        logger.error(
+            "Error streaming request body",
+            path_id=path_id,
+            request_id=request_id,
+            error=str(e),
+            exc_info=True,
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 @paths_bp.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
@@ -0,0 +1,237 @@
+"""API blueprint for replaying captured requests to a target URL."""
+
+import structlog
+from flask import Blueprint, current_app, jsonify, request
+from marshmallow import Schema, ValidationError, fields, validate
+
+from app import db
+from app.models.path import Path
+from app.models.replay import ReplayJob, ReplayResult
+from app.services.replay import ReplayLimitReached, get_replay_manager
+from app.utils.helpers import parse_timestamp
+
+logger = structlog.get_logger()
+replays_bp = Blueprint("replays", __name__)
+
+
+class CreateReplaySchema(Schema):
+    """Schema for starting a replay of a path's requests."""
+
+    target_url = fields.Url(required=True, schemes={"http", "https"}, require_tld=False)
+    method = fields.Str(allow_none=True, validate=validate.Length(min=1, max=10))
+    since = fields.Str(allow_none=True)
+    until = fields.Str(allow_none=True)
+    concurrency = fields.Int(load_default=4, validate=validate.Range(min=1))
+    rate_limit = fields.Float(
+        allow_none=True, validate=validate.Range(min=0, min_inclusive=False)
+    )
+    ordered = fields.Bool(load_default=False)
+    max_retries = fields.Int(load_default=3, validate=validate.Range(min=0, max=10))
+    timeout = fields.Float(
+        load_default=10.0, validate=validate.Range(min=0, max=300, min_inclusive=False)
+    )
+
+
+@replays_bp.route("/paths/<string:path_id>/replays", methods=["POST"])
+def create_replay(path_id):
+    """Start re-sending the requests of a path to a target URL."""
+    try:
+        data = CreateReplaySchema().load(request.get_json() or {})
+        max_concurrency = current_app.config["REPLAY_MAX_CONCURRENCY"]
+        if data["concurrency"] > max_concurrency:
+            raise ValidationError(
+                {"concurrency": [f"Must be at most {max_concurrency}."]}
+            )
+        window = {}
+        for key in ("since", "until"):
+            try:
+                window[key] = parse_timestamp(data.get(key))
+            except ValueError:
+                raise ValidationError({key: ["Invalid ISO datetime."]})
+        since, until = window["since"], window["until"]
+        if since and until and since >= until:
+            raise ValidationError({"since": ["Must be before until."]})
+
+        path = Path.find_by_path_id(path_id)
+        if not path:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        manager = get_replay_manager()
+        if manager.running_count() >= manager.max_jobs:
+            return _too_many_replays()
+
+        job = ReplayJob(
+            path_id=path.id,
+            target_url=data["target_url"],
+            method=data["method"].upper() if data.get("method") else None,
+            since=since,
+            until=until,
+            concurrency=data["concurrency"],
+            rate_limit=data.get("rate_limit"),
+            ordered=data["ordered"],
+            max_retries=data["max_retries"],
+            timeout=data["timeout"],
+        )
+        db.session.add(job)
+        db.session.commit()
+        try:
+            manager.start(job.id)
+        except ReplayLimitReached as e:
+            ReplayJob.finish(job.id, "failed", error=str(e))
+            return _too_many_replays()
+
+        logger.info(
+            "Replay created",
+            path_id=path_id,
+            job_id=job.id,
+            target_url=job.target_url,
+        )
+        return jsonify({"success": True, "data": job.to_dict()}), 202
+
+    except ValidationError as e:
+        logger.warning("Validation error creating replay", errors=e.messages)
+        return (
+            jsonify(
+                {"success": False, "error": "Validation error", "details": e.messages}
+            ),
+            400,
+        )
+
+    except Exception as e:
+        logger.error(
+            "Error creating replay", path_id=path_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@replays_bp.route("/paths/<string:path_id>/replays", methods=["GET"])
+def list_replays(path_id):
+    """List the replays of a path, newest first."""
+    try:
+        path = Path.find_by_path_id(path_id)
+        if not path:
+            return jsonify({"success": False, "error": "Path not found"}), 404
+
+        jobs = ReplayJob.list_for_path(path.id)
+        return (
+            jsonify({"success": True, "data": [job.to_dict() for job in jobs]}),
+            200,
+        )
+
+    except Exception as e:
+        logger.error(
+            "Error listing replays", path_id=path_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@replays_bp.route("/paths/<string:path_id>/replays/<string:job_id>", methods=["GET"])
+def get_replay(path_id, job_id):
+    """Get the status and progress of a replay."""
+    try:
+        job = _find_job(path_id, job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Replay not found"}), 404
+
+        return jsonify({"success": True, "data": job.to_dict()}), 200
+
+    except Exception as e:
+        logger.error(
+            "Error retrieving replay", job_id=job_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@replays_bp.route(
+    "/paths/<string:path_id>/replays/<string:job_id>/results", methods=["GET"]
+)
+def get_replay_results(path_id, job_id):
+    """Get the per-request outcomes of a replay, in capture order."""
+    try:
+        limit = min(int(request.args.get("limit", 100)), 1000)  # Max 1000
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        offset = max(int(request.args.get("offset", 0)), 0)
+        status = request.args.get("status") or None
+        if status not in (None, "succeeded", "failed"):
+            raise ValueError("status must be succeeded or failed")
+
+        job = _find_job(path_id, job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Replay not found"}), 404
+
+        results, total = ReplayResult.page_for_job(
+            job.id, status=status, limit=limit, offset=offset
+        )
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "data": {
+                        "results": [result.to_dict() for result in results],
+                        "pagination": {
+                            "limit": limit,
+                            "offset": offset,
+                            "total": total,
+                        },
+                    },
+                }
+            ),
+            200,
+        )
+
+    except ValueError:
+        return (
+            jsonify({"success": False, "error": "Invalid pagination parameters"}),
+            400,
+        )
+
+    except Exception as e:
+        logger.error(
+            "Error retrieving replay results",
+            job_id=job_id,
+            error=str(e),
+            exc_info=True,
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+@replays_bp.route(
+    "/paths/<string:path_id>/replays/<string:job_id>/cancel", methods=["POST"]
+)
+def cancel_replay(path_id, job_id):
+    """Cancel a pending or running replay."""
+    try:
+        job = _find_job(path_id, job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Replay not found"}), 404
+
+        if not ReplayJob.request_cancel(job.id):
+            return jsonify({"success": False, "error": "Replay is not running"}), 409
+        get_replay_manager().cancel(job.id)
+
+        logger.info("Replay cancelled", path_id=path_id, job_id=job_id)
+        db.session.refresh(job)
+        return jsonify({"success": True, "data": job.to_dict()}), 202
+
+    except Exception as e:
+        logger.error(
+            "Error cancelling replay", job_id=job_id, error=str(e), exc_info=True
+        )
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+def _find_job(path_id, job_id):
+    """Get a replay job of a path by their public ids, or None."""
+    path = Path.resolve(path_id)
+    if not path:
+        return None
+    return ReplayJob.find_for_path(path.id, job_id)
+
+
+def _too_many_replays():
+    """Build the response for a worker already running its maximum of jobs."""
+    logger.warning("Replay limit reached")
+    response = jsonify({"success": False, "error": "Too many replays running"})
+    response.headers["Retry-After"] = "30"
+    return response, 503
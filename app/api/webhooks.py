@@ -1,10 +1,21 @@
 """Webhook blueprint for capturing HTTP requests."""
 
+import math
+
 import structlog
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 
+from app import db
 from app.models.path import Path
 from app.models.request import Request
+from app.services.capture_broker import get_capture_broker
+from app.services.forwarder import (
+    ERROR_CIRCUIT_OPEN,
+    ERROR_TIMEOUT,
+    ERROR_TOO_LARGE,
+    get_forwarder,
+)
+from app.services.ingest_queue import DURABILITY_ENQUEUE, IngestError, get_ingest_queue
 
 logger = structlog.get_logger()
 webhooks_bp = Blueprint("webhooks", __name__)
@@ -17,14 +28,29 @@ webhooks_bp = Blueprint("webhooks", __name__)
 def capture_webhook(path_id):
     """Capture any HTTP request to a webhook path."""
     try:
-        # Find the path
-        path = Path.find_by_path_id(path_id)
+        # Find the path (served from the per-worker cache when possible)
+        path = Path.resolve(path_id)
         if not path:
             logger.warning("Webhook request to non-existent path", path_id=path_id)
             return jsonify({"success": False, "error": "Webhook path not found"}), 404
 
-        # Create request record
-        captured_request = Request.create_from_flask_request(request, path)
+        if path.forward_url:
+            return _capture_and_forward(path, path_id)
+
+        # Create request record, batching the write when the queue is enabled
+        ingest_queue = get_ingest_queue()
+        committed = True
+        if ingest_queue is not None:
+            captured_request = Request.build_from_flask_request(request, path)
+            committed = ingest_queue.put(captured_request)
+        else:
+            captured_request = Request.create_from_flask_request(request, path)
+
+        # Wake streams and long-poll waiters; capturing never fails for them
+        try:
+            get_capture_broker().publish(path_id, captured_request)
+        except Exception as e:
+            logger.error("Error publishing captured request", error=str(e))
 
         logger.info(
             "Webhook request captured",
@@ -37,12 +63,17 @@ def capture_webhook(path_id):
             else None,
         )
 
-        # Return success response
+        # Return success response; 202 when the commit was not confirmed in
+        # time but the row is being written, so senders do not retry it
         return (
             jsonify(
                 {
                     "success": True,
-                    "message": "Request captured successfully",
+                    "message": (
+                        "Request captured successfully"
+                        if committed
+                        else "Request accepted for storage"
+                    ),
                     "data": {
                         "request_id": str(captured_request.id),
                         "timestamp": captured_request.timestamp.isoformat(),
@@ -50,7 +81,19 @@ def capture_webhook(path_id):
                     },
                 }
             ),
-            200,
+            200 if committed else 202,
+        )
+
+    except IngestError as e:
+        logger.error(
+            "Queued webhook request not committed",
+            path_id=path_id,
+            method=request.method,
+            error=str(e),
+        )
+        return (
+            jsonify({"success": False, "error": "Request could not be stored"}),
+            503,
         )
 
     except Exception as e:
@@ -64,6 +107,111 @@ def capture_webhook(path_id):
         return jsonify({"success": False, "error": "Failed to capture request"}), 500
 
 
+def _capture_and_forward(path, path_id):
+    """Capture a request while relaying it to the path's upstream.
+
+    The upstream call runs on the forwarder's threads while this thread
+    commits the capture, and the upstream response is returned to the
+    sender. It is returned even if the capture failed, since the upstream
+    has already acted on the request. An upstream that cannot be waited for
+    (see ``Forwarder.result``) is answered and recorded as a timeout.
+    """
+    forwarder = get_forwarder()
+    pending = forwarder.submit(forwarder.build_delivery(request, path.forward_url))
+
+    captured_request = Request.build_from_flask_request(request, path)
+    request_id, timestamp = captured_request.id, captured_request.timestamp
+    ingest_queue = get_ingest_queue()
+    deferred = (
+        ingest_queue is not None and ingest_queue.durability == DURABILITY_ENQUEUE
+    )
+    stored = False
+    result = None
+    try:
+        if deferred:
+            # Queuing waits for no commit, so the row carries the outcome
+            result = forwarder.result(pending)
+            _set_upstream(captured_request, result)
+            ingest_queue.put(captured_request)
+        elif ingest_queue is not None:
+            ingest_queue.put(captured_request)
+        else:
+            captured_request.save(path)
+        stored = True
+    except Exception as e:
+        db.session.rollback()
+        logger.error(
+            "Error capturing forwarded webhook request",
+            path_id=path_id,
+            method=request.method,
+            error=str(e),
+            exc_info=True,
+        )
+
+    if stored:
+        try:
+            get_capture_broker().publish(path_id, captured_request)
+        except Exception as e:
+            logger.error("Error publishing captured request", error=str(e))
+
+    if result is None:
+        result = forwarder.result(pending)
+    if stored and not deferred:
+        try:
+            Request.record_upstream(request_id, timestamp, result)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(
+                "Error recording upstream outcome",
+                request_id=request_id,
+                error=str(e),
+            )
+
+    logger.info(
+        "Webhook request forwarded",
+        path_id=path_id,
+        method=request.method,
+        request_id=request_id,
+        captured=stored,
+        upstream_status=result.status_code,
+        upstream_latency_ms=result.latency_ms,
+        upstream_error=result.error,
+    )
+
+    if result.status_code is not None:
+        response = Response(result.body, status=result.status_code)
+        # No default Content-Type: only what the upstream sent
+        del response.headers["Content-Type"]
+        for key, value in result.headers:
+            response.headers.add(key, value)
+        if stored:
+            response.headers["X-Webhook-Request-Id"] = request_id
+        return response
+
+    body = {"success": False, "request_id": request_id if stored else None}
+    if result.error == ERROR_CIRCUIT_OPEN:
+        body["error"] = "Upstream unavailable"
+        response = jsonify(body)
+        retry_after = forwarder.breaker(path.forward_url).retry_after()
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return response, 503
+    if result.error == ERROR_TIMEOUT:
+        body["error"] = "Upstream timed out"
+        return jsonify(body), 504
+    if result.error == ERROR_TOO_LARGE:
+        body["error"] = "Upstream response too large"
+        return jsonify(body), 502
+    body["error"] = "Upstream request failed"
+    return jsonify(body), 502
+
+
+def _set_upstream(captured_request, result):
+    """Copy a forwarding outcome onto an unsaved request."""
+    captured_request.upstream_status = result.status_code
+    captured_request.upstream_latency_ms = result.latency_ms
+    captured_request.upstream_error = result.error
+
+
 @webhooks_bp.errorhandler(404)
 def webhook_not_found(error):
     """Handle 404 errors for webhook routes."""
@@ -0,0 +1,149 @@
+"""Flask CLI commands."""
+
+import gzip
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.models.path import Path
+from app.services.export import EXPORT_FORMATS, ColumnarExportUnavailable, export_chunks
+from app.services.importer import RequestImporter
+from app.utils.helpers import parse_timestamp
+
+retention_cli = AppGroup("retention", help="Delete expired requests.")
+
+
+@retention_cli.command("run")
+@click.option("--days", type=int, help="Retention period (default RETENTION_DAYS).")
+@click.option("--batch-size", type=int, help="Requests deleted per transaction.")
+@click.option("--pause", type=float, help="Seconds to sleep between batches.")
+def run_retention(days, batch_size, pause):
+    """Delete requests older than the retention period once."""
+    worker = current_app.extensions["retention_worker"]
+
+    def progress(deleted):
+        click.echo(f"  deleted {deleted} requests", err=True)
+
+    result = worker.run_once(
+        days=days, batch_size=batch_size, pause=pause, progress=progress
+    )
+    click.echo(
+        f"Deleted {result['deleted']} requests older than {result['days']} days "
+        f"in {result['seconds']:.1f}s ({result['rows_per_second']:.0f} rows/s)"
+    )
+
+
+@retention_cli.command("schedule")
+def schedule_retention():
+    """Run retention every RETENTION_INTERVAL seconds, in the foreground."""
+    worker = current_app.extensions["retention_worker"]
+    click.echo(
+        f"Deleting requests older than {worker.days} days "
+        f"every {worker.interval:.0f}s (Ctrl+C to stop)"
+    )
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+@click.command("export-requests")
+@click.option("--path", "path_id", help="Path to export (default: every path).")
+@click.option("--since", help="ISO datetime; only requests at or after it.")
+@click.option("--until", help="ISO datetime; only requests before it.")
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(EXPORT_FORMATS),
+    default="parquet",
+    show_default=True,
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+    help="File to write.",
+)
+@click.option("--no-body", is_flag=True, help="Leave request bodies out.")
+@click.option(
+    "--row-group-size",
+    type=int,
+    help="Rows per Parquet row group (default EXPORT_ROW_GROUP_SIZE).",
+)
+def export_requests(
+    path_id, since, until, export_format, output, no_body, row_group_size
+):
+    """Write captured requests to a file, e.g. Parquet for offline analysis."""
+    path = None
+    if path_id:
+        path = Path.find_by_path_id(path_id)
+        if path is None:
+            raise click.ClickException(f"Path not found: {path_id}")
+    try:
+        since = parse_timestamp(since)
+        until = parse_timestamp(until)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+    started = time.monotonic()
+    try:
+        chunks = export_chunks(
+            path,
+            format=export_format,
+            since=since,
+            until=until,
+            include_body=not no_body,
+            row_group_size=row_group_size,
+        )
+    except ColumnarExportUnavailable as e:
+        raise click.ClickException(str(e)) from e
+
+    written = 0
+    with open(output, "wb") as file:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            file.write(chunk)
+            written += len(chunk)
+    click.echo(
+        f"Wrote {written} bytes of {export_format} to {output} "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+
+
+@click.command("import-requests")
+@click.argument("source", type=click.Path(dir_okay=False, allow_dash=True))
+@click.option(
+    "--batch-size",
+    type=int,
+    default=5000,
+    show_default=True,
+    help="Requests loaded per transaction.",
+)
+def import_requests(source, batch_size):
+    """Load requests from an NDJSON export (.gz accepted, - for stdin).
+
+    Paths are created as needed and requests that already exist are skipped,
+    so an interrupted import can simply be run again.
+    """
+
+    def progress(imported):
+        click.echo(f"  imported {imported} requests", err=True)
+
+    importer = RequestImporter(batch_size=batch_size, progress=progress)
+    if source == "-":
+        result = importer.run(sys.stdin)
+    else:
+        opener = gzip.open if source.endswith(".gz") else open
+        with opener(source, "rt", encoding="utf-8") as lines:
+            result = importer.run(lines)
+    click.echo(
+        f"Imported {result['imported']} of {result['read']} requests "
+        f"({result['skipped']} already present, {result['invalid']} invalid, "
+        f"{result['paths_created']} paths created) in {result['seconds']:.1f}s "
+        f"({result['rows_per_second']:.0f} rows/s)"
+    )
@@ -17,6 +17,113 @@ class BaseConfig:
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+    # Ingest: "sync" commits each captured request on the request thread,
+    # "queued" hands it to a per-worker write-behind queue flushed in batches
+    INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+    INGEST_QUEUE_MAXSIZE = int(os.getenv("INGEST_QUEUE_MAXSIZE", 10000))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 500))
+    INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 0.05))
+    # "flush" acknowledges after the batch commits, "enqueue" right away
+    INGEST_DURABILITY = os.getenv("INGEST_DURABILITY", "flush")
+    INGEST_FLUSH_TIMEOUT = float(os.getenv("INGEST_FLUSH_TIMEOUT", 5.0))
+
+    # Per-worker cache of path_id lookups; a size of 0 disables it
+    PATH_CACHE_SIZE = int(os.getenv("PATH_CACHE_SIZE", 4096))
+    PATH_CACHE_TTL = float(os.getenv("PATH_CACHE_TTL", 30.0))
+
+    # Bloom filter and negative cache rejecting unknown paths without a query
+    PATH_FILTER_ENABLED = os.getenv("PATH_FILTER_ENABLED", "true").lower() == "true"
+    PATH_FILTER_ERROR_RATE = float(os.getenv("PATH_FILTER_ERROR_RATE", 0.01))
+    PATH_FILTER_REFRESH_INTERVAL = float(os.getenv("PATH_FILTER_REFRESH_INTERVAL", 1.0))
+    PATH_FILTER_REBUILD_INTERVAL = float(
+        os.getenv("PATH_FILTER_REBUILD_INTERVAL", 300.0)
+    )
+    PATH_NEGATIVE_CACHE_SIZE = int(os.getenv("PATH_NEGATIVE_CACHE_SIZE", 10000))
+    PATH_NEGATIVE_CACHE_TTL = float(os.getenv("PATH_NEGATIVE_CACHE_TTL", 2.0))
+
+    # Dashboard statistics snapshot shared by the workers on a host
+    DASHBOARD_STATS_TTL = float(os.getenv("DASHBOARD_STATS_TTL", 5.0))
+    DASHBOARD_STATS_PATH = os.getenv("DASHBOARD_STATS_PATH")
+
+    # Bodies of at least BODY_COMPRESSION_THRESHOLD bytes are compressed on
+    # ingest with BODY_COMPRESSION_CODEC ("zlib", "lzma" or "none")
+    BODY_COMPRESSION_CODEC = os.getenv("BODY_COMPRESSION_CODEC", "zlib")
+    BODY_COMPRESSION_THRESHOLD = int(os.getenv("BODY_COMPRESSION_THRESHOLD", 1024))
+
+    # Bodies of at least BODY_SPILL_THRESHOLD bytes are appended, uncompressed,
+    # to segment files in BODY_SPILL_DIR instead of the database (0 disables)
+    BODY_SPILL_THRESHOLD = int(os.getenv("BODY_SPILL_THRESHOLD", 1024 * 1024))
+    BODY_SPILL_DIR = os.getenv("BODY_SPILL_DIR", "data/blobs")
+    BODY_SEGMENT_SIZE = int(os.getenv("BODY_SEGMENT_SIZE", 256 * 1024 * 1024))
+    # Retention rewrites segments whose live bodies fill less than this share
+    BODY_SEGMENT_MIN_LIVE_RATIO = float(os.getenv("BODY_SEGMENT_MIN_LIVE_RATIO", 0.5))
+
+    # Range partitioning of requests by "day" or "week" (PostgreSQL only; the
+    # table is converted with scripts/partition_requests.py), or "none"
+    REQUESTS_PARTITIONING = os.getenv("REQUESTS_PARTITIONING", "none")
+    REQUESTS_PARTITIONS_AHEAD = int(os.getenv("REQUESTS_PARTITIONS_AHEAD", 7))
+
+    # Retention: requests older than RETENTION_DAYS are deleted in batches of
+    # RETENTION_BATCH_SIZE with RETENTION_BATCH_PAUSE seconds between them,
+    # by `flask retention run` or, with RETENTION_SCHEDULER, every
+    # RETENTION_INTERVAL seconds by one gunicorn worker per host
+    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", 30))
+    RETENTION_SCHEDULER = os.getenv("RETENTION_SCHEDULER", "false").lower() == "true"
+    RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", 3600.0))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 1000))
+    RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", 0.1))
+    RETENTION_LOCK_PATH = os.getenv("RETENTION_LOCK_PATH")
+    # Paths with max_requests/max_bytes are trimmed once they exceed a limit
+    # by more than this fraction, back down to the limit
+    PATH_LIMIT_SLACK = float(os.getenv("PATH_LIMIT_SLACK", 0.1))
+
+    # Time-series rollups: minute buckets are folded into hour buckets after
+    # ROLLUP_MINUTE_HOURS hours, hour buckets into days after ROLLUP_HOUR_DAYS
+    ROLLUP_MINUTE_HOURS = int(os.getenv("ROLLUP_MINUTE_HOURS", 48))
+    ROLLUP_HOUR_DAYS = int(os.getenv("ROLLUP_HOUR_DAYS", 30))
+    # Hours covered by the breakdowns of path statistics without a window
+    PATH_STATS_WINDOW_HOURS = int(os.getenv("PATH_STATS_WINDOW_HOURS", 24))
+
+    # Live delivery of captures: "local" reaches subscribers of the capturing
+    # worker only, "postgres" every worker through LISTEN/NOTIFY; a
+    # "module:Class" plugs in another backend
+    CAPTURE_BROKER = os.getenv("CAPTURE_BROKER", "local")
+    CAPTURE_BROKER_QUEUE_SIZE = int(os.getenv("CAPTURE_BROKER_QUEUE_SIZE", 1000))
+    # Server-Sent Events streams; each one holds a worker thread
+    STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", 16))
+    STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", 15.0))
+    STREAM_MAX_DURATION = float(os.getenv("STREAM_MAX_DURATION", 300.0))
+    STREAM_BODY_LIMIT = int(os.getenv("STREAM_BODY_LIMIT", 64 * 1024))
+    # Longest wait accepted by /logs/wait; waiters count as stream subscribers
+    WAIT_MAX_TIMEOUT = float(os.getenv("WAIT_MAX_TIMEOUT", 60.0))
+
+    # Rows per Parquet row group / Arrow record batch in columnar exports
+    EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 10000))
+
+    # Replays of captured requests to a target URL; each running job holds a
+    # thread plus up to REPLAY_MAX_CONCURRENCY sending threads
+    REPLAY_MAX_JOBS = int(os.getenv("REPLAY_MAX_JOBS", 4))
+    REPLAY_MAX_CONCURRENCY = int(os.getenv("REPLAY_MAX_CONCURRENCY", 32))
+    REPLAY_BATCH_SIZE = int(os.getenv("REPLAY_BATCH_SIZE", 200))
+    REPLAY_BACKOFF_BASE = float(os.getenv("REPLAY_BACKOFF_BASE", 0.5))
+    REPLAY_BACKOFF_MAX = float(os.getenv("REPLAY_BACKOFF_MAX", 30.0))
+    # Active jobs not updated for this many seconds lost their worker
+    REPLAY_STALE_AFTER = float(os.getenv("REPLAY_STALE_AFTER", 60.0))
+
+    # Forwarding to path upstreams: sending threads and pooled connections
+    # per upstream in each worker, timeouts in seconds, the consecutive
+    # failures opening an upstream's circuit for FORWARD_BREAKER_RESET seconds
+    # and the largest upstream response body relayed, in bytes
+    FORWARD_MAX_WORKERS = int(os.getenv("FORWARD_MAX_WORKERS", 32))
+    FORWARD_POOL_SIZE = int(os.getenv("FORWARD_POOL_SIZE", 32))
+    FORWARD_TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", 10.0))
+    FORWARD_CONNECT_TIMEOUT = float(os.getenv("FORWARD_CONNECT_TIMEOUT", 3.0))
+    FORWARD_BREAKER_THRESHOLD = int(os.getenv("FORWARD_BREAKER_THRESHOLD", 5))
+    FORWARD_BREAKER_RESET = float(os.getenv("FORWARD_BREAKER_RESET", 30.0))
+    FORWARD_MAX_RESPONSE_BYTES = int(
+        os.getenv("FORWARD_MAX_RESPONSE_BYTES", 16 * 1024 * 1024)
+    )
+
 
 class DevelopmentConfig(BaseConfig):
     """Development configuration."""
@@ -49,6 +156,10 @@ class TestingConfig(BaseConfig):
         "sqlite:///:memory:",
     )
     WTF_CSRF_ENABLED = False
+    # Compute dashboard statistics on every call
+    DASHBOARD_STATS_TTL = 0
+    # Keep bodies in the database unless a test opts in
+    BODY_SPILL_THRESHOLD = 0
 
 
 class ProductionConfig(BaseConfig):
@@ -1,6 +1,16 @@
 """Models package initialization."""
 
 from app.models.path import Path
+from app.models.replay import ReplayJob, ReplayResult
 from app.models.request import Request
+from app.models.request_body import RequestBody
+from app.models.request_rollup import RequestRollup
 
-__all__ = ["Path", "Request"]
+__all__ = [
+    "Path",
+    "ReplayJob",
+    "ReplayResult",
+    "Request",
+    "RequestBody",
+    "RequestRollup",
+]
@@ -1,13 +1,34 @@
 """Path model for storing webhook paths."""
 
 import uuid
+from collections import namedtuple
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, String
+from flask import current_app
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Text,
+    bindparam,
+    case,
+    func,
+    update,
+)
 from sqlalchemy.orm import relationship
 
 from app import db
 
+# Lightweight, immutable view of a path used on hot paths instead of a full row;
+# carries the size limits so ingest knows whether the path needs trimming, and
+# the upstream captured requests are forwarded to
+PathRef = namedtuple(
+    "PathRef",
+    ["id", "path_id", "created_at", "max_requests", "max_bytes", "forward_url"],
+)
+
 
 class Path(db.Model):
     """Model for webhook paths."""
@@ -16,19 +37,51 @@ class Path(db.Model):
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     path_id = Column(String(255), unique=True, nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, index=True
+    )  # Listing order and incremental path filter refreshes
     updated_at = Column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
 
-    # Relationship to requests
+    # Denormalized request counters, maintained on capture and delete
+    request_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_request_at = Column(DateTime, nullable=True)
+    total_body_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    # Retention policy; None means unlimited. Paths over max_requests or
+    # max_bytes lose their oldest requests at ingest (ring buffers); max_age
+    # (seconds) replaces the global retention period for this path
+    max_requests = Column(Integer, nullable=True)
+    max_age = Column(Integer, nullable=True)
+    max_bytes = Column(BigInteger, nullable=True)
+
+    # Upstream every captured request is relayed to, whose response is
+    # returned to the sender; None captures only
+    forward_url = Column(Text, nullable=True)
+
+    # Relationship to requests (deleted in bulk by Path.delete, never loaded)
     requests = relationship(
-        "Request", back_populates="path", cascade="all, delete-orphan"
+        "Request",
+        back_populates="path",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
-    def __init__(self, path_id=None):
+    def __init__(
+        self,
+        path_id=None,
+        max_requests=None,
+        max_age=None,
+        max_bytes=None,
+        forward_url=None,
+    ):
         """Initialize a new Path instance."""
         self.path_id = path_id or str(uuid.uuid4())
+        self.max_requests = max_requests
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.forward_url = forward_url
 
     def __repr__(self):
         """String representation of the Path."""
@@ -41,38 +94,254 @@ class Path(db.Model):
             "path_id": self.path_id,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "request_count": len(self.requests) if self.requests else 0,
+            "request_count": self.request_count or 0,
+            "last_request_at": self.last_request_at.isoformat()
+            if self.last_request_at
+            else None,
+            "total_body_bytes": self.total_body_bytes or 0,
+            "max_requests": self.max_requests,
+            "max_age": self.max_age,
+            "max_bytes": self.max_bytes,
+            "forward_url": self.forward_url,
         }
 
     @classmethod
     def find_by_path_id(cls, path_id):
         """Find a path by its path_id."""
-        return cls.query.filter_by(path_id=path_id).first()
+        path = cls.query.filter_by(path_id=path_id).first()
+
+        cache = _get_path_cache()
+        if path is not None and cache is not None:
+            cache.set(path_id, path.ref)
+        return path
 
     @classmethod
-    def create_new_path(cls, path_id=None):
-        """Create a new path with optional custom path_id."""
-        path = cls(path_id=path_id)
+    def resolve(cls, path_id):
+        """Resolve a path_id to a PathRef, using the per-worker path cache.
+
+        Returns None if the path does not exist. Cached entries live for
+        PATH_CACHE_TTL seconds, which bounds how long another worker's
+        delete can go unnoticed here.
+        """
+        cache = _get_path_cache()
+        if cache is not None:
+            ref = cache.get(path_id)
+            if ref is not None:
+                return ref
+
+        # Reject unknown paths without a query when the filter is enabled
+        path_filter = _get_path_filter()
+        if path_filter is not None and path_filter.rejects(path_id):
+            return None
+
+        row = (
+            db.session.query(
+                cls.id,
+                cls.path_id,
+                cls.created_at,
+                cls.max_requests,
+                cls.max_bytes,
+                cls.forward_url,
+            )
+            .filter_by(path_id=path_id)
+            .first()
+        )
+        if row is None:
+            if path_filter is not None:
+                path_filter.remember_missing(path_id)
+            return None
+
+        ref = PathRef(*row)
+        if cache is not None:
+            cache.set(path_id, ref)
+        return ref
+
+    @classmethod
+    def create_new_path(
+        cls,
+        path_id=None,
+        max_requests=None,
+        max_age=None,
+        max_bytes=None,
+        forward_url=None,
+    ):
+        """Create a new path with optional custom path_id, retention and upstream."""
+        path = cls(
+            path_id=path_id,
+            max_requests=max_requests,
+            max_age=max_age,
+            max_bytes=max_bytes,
+            forward_url=forward_url,
+        )
         db.session.add(path)
         db.session.commit()
+
+        cache = _get_path_cache()
+        if cache is not None:
+            cache.set(path.path_id, path.ref)
+        path_filter = _get_path_filter()
+        if path_filter is not None:
+            path_filter.add(path.path_id)
         return path
 
+    def update_settings(self, **settings):
+        """Change the retention policy or upstream of this path and commit.
+
+        Other workers pick the change up once their cached entry expires,
+        within PATH_CACHE_TTL seconds.
+        """
+        for key, value in settings.items():
+            setattr(self, key, value)
+        db.session.commit()
+
+        cache = _get_path_cache()
+        if cache is not None:
+            cache.set(self.path_id, self.ref)
+
     @classmethod
     def get_all_paths(cls):
         """Get all paths ordered by creation date."""
         return cls.query.order_by(cls.created_at.desc()).all()
 
+    @classmethod
+    def load_path_ids(cls, created_since=None):
+        """Get every path_id, optionally only those created since a time."""
+        query = db.session.query(cls.path_id)
+        if created_since is not None:
+            query = query.filter(cls.created_at >= created_since)
+        return [row.path_id for row in query]
+
     @classmethod
     def count_all(cls):
         """Get the total count of all paths."""
         return cls.query.count()
 
+    @classmethod
+    def add_to_counters(cls, totals):
+        """Apply per-path request totals to the denormalized counters.
+
+        ``totals`` maps a path primary key to ``(count, body_bytes,
+        last_request_at)``. Counts are negative for deleted requests, in which
+        case ``last_request_at`` is None and is only cleared once the path has
+        no requests left. Runs in the caller's transaction, without commit.
+        """
+        if not totals:
+            return
+
+        # Core statement: one executemany with a parameter set per path
+        paths = cls.__table__
+        new_count = paths.c.request_count + bindparam("delta_count")
+        last_request_at = bindparam("delta_last", type_=DateTime)
+        stmt = (
+            update(paths)
+            .where(paths.c.id == bindparam("path_pk"))
+            .values(
+                request_count=new_count,
+                total_body_bytes=paths.c.total_body_bytes + bindparam("delta_bytes"),
+                last_request_at=case(
+                    (new_count <= 0, None),
+                    (last_request_at.is_(None), paths.c.last_request_at),
+                    (paths.c.last_request_at.is_(None), last_request_at),
+                    (paths.c.last_request_at < last_request_at, last_request_at),
+                    else_=paths.c.last_request_at,
+                ),
+                # Counter updates are not edits to the path itself
+                updated_at=paths.c.updated_at,
+            )
+        )
+        # Sorted, so concurrent writers lock path rows in the same order
+        db.session.execute(
+            stmt,
+            [
+                {
+                    "path_pk": path_pk,
+                    "delta_count": count,
+                    "delta_bytes": body_bytes,
+                    "delta_last": last_at,
+                }
+                for path_pk, (count, body_bytes, last_at) in sorted(totals.items())
+            ],
+        )
+
+    @classmethod
+    def recalculate_counters(cls):
+        """Recompute every path's counters from the requests table."""
+        from app.models.request import Request
+
+        db.session.execute(
+            update(cls)
+            .values(
+                request_count=db.session.query(func.count(Request.id))
+                .filter(Request.path_id == cls.id)
+                .scalar_subquery(),
+                total_body_bytes=db.session.query(
+                    func.coalesce(func.sum(Request.body_size), 0)
+                )
+                .filter(Request.path_id == cls.id)
+                .scalar_subquery(),
+                last_request_at=db.session.query(func.max(Request.timestamp))
+                .filter(Request.path_id == cls.id)
+                .scalar_subquery(),
+                updated_at=cls.updated_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
     def delete(self):
         """Delete this path and all associated requests."""
+        from app.models.replay import ReplayJob
+        from app.models.request import Request
+        from app.models.request_body import RequestBody
+        from app.models.request_rollup import RequestRollup
+
+        path_id = self.path_id
+        # Bulk delete instead of loading every request through the cascade;
+        # references are released from the rows actually deleted, so those
+        # captured meanwhile are not left holding their body
+        table = Request.__table__
+        references = {}
+        for (body_digest,) in db.session.execute(
+            table.delete()
+            .where(table.c.path_id == self.id)
+            .returning(table.c.body_digest)
+        ):
+            if body_digest is not None:
+                references[body_digest] = references.get(body_digest, 0) + 1
+        RequestBody.release(references)
+        db.session.execute(
+            RequestRollup.__table__.delete().where(RequestRollup.path_id == self.id)
+        )
+        ReplayJob.delete_for_path(self.id)
         db.session.delete(self)
         db.session.commit()
+        RequestBody.collect_garbage()
+
+        cache = _get_path_cache()
+        if cache is not None:
+            cache.invalidate(path_id)
+        path_filter = _get_path_filter()
+        if path_filter is not None:
+            path_filter.discard(path_id)
 
     @property
-    def request_count(self):
-        """Get the count of requests for this path."""
-        return len(self.requests) if self.requests else 0
+    def ref(self):
+        """Get a PathRef for this path."""
+        return PathRef(
+            self.id,
+            self.path_id,
+            self.created_at,
+            self.max_requests,
+            self.max_bytes,
+            self.forward_url,
+        )
+
+
+def _get_path_cache():
+    """Return the path cache for the current app, or None when disabled."""
+    return current_app.extensions.get("path_cache")
+
+
+def _get_path_filter():
+    """Return the unknown-path filter for the current app, or None."""
+    return current_app.extensions.get("path_filter")
@@ -0,0 +1,262 @@
+"""Replay jobs re-sending captured requests to a target URL."""
+
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    insert,
+    update,
+)
+from sqlalchemy.orm import relationship
+
+from app import db
+
+# Job states before completed, cancelled or failed; "interrupted" is only
+# reported, never stored (see ``state``)
+ACTIVE_STATUSES = ("pending", "running", "cancelling")
+
+
+class ReplayJob(db.Model):
+    """Model for one replay of a path's requests to a target URL.
+
+    The job is run by a thread of the worker that created it, which records
+    progress and per-request outcomes here, so any worker can report on it.
+    The runner refreshes ``updated_at`` at least every few seconds; a job
+    still active but not updated for ``REPLAY_STALE_AFTER`` seconds lost its
+    worker and is reported as interrupted.
+    """
+
+    __tablename__ = "replay_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    path_id = Column(String(36), ForeignKey("paths.id"), nullable=False, index=True)
+    target_url = Column(Text, nullable=False)
+    status = Column(String(12), nullable=False, default="pending")
+
+    # Requests selected for replay; None means no restriction
+    method = Column(String(10), nullable=True)
+    since = Column(DateTime, nullable=True)
+    until = Column(DateTime, nullable=True)
+
+    # Delivery settings
+    concurrency = Column(Integer, nullable=False, default=4)
+    rate_limit = Column(Float, nullable=True)  # Requests per second
+    ordered = Column(Boolean, nullable=False, default=False)
+    max_retries = Column(Integer, nullable=False, default=3)
+    timeout = Column(Float, nullable=False, default=10.0)  # Seconds per attempt
+
+    # Progress
+    total = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    path = relationship("Path")
+
+    def __repr__(self):
+        """String representation of the ReplayJob."""
+        return f"<ReplayJob {self.id} {self.status}>"
+
+    @property
+    def state(self):
+        """Get the status, or "interrupted" for an active job gone stale."""
+        if self.status in ACTIVE_STATUSES:
+            stale_after = timedelta(seconds=current_app.config["REPLAY_STALE_AFTER"])
+            if self.updated_at < datetime.utcnow() - stale_after:
+                return "interrupted"
+        return self.status
+
+    def to_dict(self):
+        """Convert the ReplayJob to a dictionary."""
+        return {
+            "id": self.id,
+            "path_id": self.path.path_id,
+            "target_url": self.target_url,
+            "status": self.state,
+            "method": self.method,
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+            "concurrency": self.concurrency,
+            "rate_limit": self.rate_limit,
+            "ordered": self.ordered,
+            "max_retries": self.max_retries,
+            "timeout": self.timeout,
+            "total": self.total,
+            "sent": self.sent,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+    @classmethod
+    def find_for_path(cls, path_pk, job_id):
+        """Get a job of a path by its id."""
+        return cls.query.filter_by(id=job_id, path_id=path_pk).first()
+
+    @classmethod
+    def list_for_path(cls, path_pk):
+        """Get the jobs of a path, newest first."""
+        return (
+            cls.query.filter_by(path_id=path_pk).order_by(cls.created_at.desc()).all()
+        )
+
+    @classmethod
+    def request_cancel(cls, job_id):
+        """Ask the runner of an active job to stop; returns whether it was active.
+
+        The runner notices at its next progress update.
+        """
+        result = db.session.execute(
+            update(cls.__table__)
+            .where(
+                cls.__table__.c.id == job_id,
+                cls.__table__.c.status.in_(("pending", "running")),
+            )
+            .values(status="cancelling")
+        )
+        db.session.commit()
+        return result.rowcount > 0
+
+    @classmethod
+    def record_results(cls, job_id, results):
+        """Store per-request outcomes and add them to the job's counters.
+
+        Also refreshes ``updated_at``, even without results. Returns the job
+        status afterwards, or None if the job no longer exists.
+        """
+        table = cls.__table__
+        succeeded = sum(1 for result in results if result["status"] == "succeeded")
+        updated = db.session.execute(
+            update(table)
+            .where(table.c.id == job_id)
+            .values(
+                sent=table.c.sent + len(results),
+                succeeded=table.c.succeeded + succeeded,
+                failed=table.c.failed + len(results) - succeeded,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        if updated.rowcount == 0:
+            db.session.rollback()
+            return None
+        if results:
+            db.session.execute(insert(ReplayResult.__table__), results)
+        status = db.session.query(cls.status).filter(cls.id == job_id).scalar()
+        db.session.commit()
+        return status
+
+    @classmethod
+    def finish(cls, job_id, status, error=None):
+        """Mark a job as finished with a final status."""
+        now = datetime.utcnow()
+        db.session.execute(
+            update(cls.__table__)
+            .where(cls.__table__.c.id == job_id)
+            .values(status=status, error=error, finished_at=now, updated_at=now)
+        )
+        db.session.commit()
+
+    @classmethod
+    def fail_interrupted(cls):
+        """Mark active jobs that lost their worker as failed; returns how many.
+
+        Jobs are not resumed: a job not updated for ``REPLAY_STALE_AFTER``
+        seconds is finished with an error, so it no longer counts as active.
+        """
+        now = datetime.utcnow()
+        stale_after = timedelta(seconds=current_app.config["REPLAY_STALE_AFTER"])
+        result = db.session.execute(
+            update(cls.__table__)
+            .where(
+                cls.__table__.c.status.in_(ACTIVE_STATUSES),
+                cls.__table__.c.updated_at < now - stale_after,
+            )
+            .values(
+                status="failed",
+                error="Interrupted: the worker running the replay exited",
+                finished_at=now,
+                updated_at=now,
+            )
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def delete_for_path(cls, path_pk):
+        """Delete the jobs of a path and their results, without commit."""
+        job_ids = db.session.query(cls.id).filter(cls.path_id == path_pk)
+        db.session.execute(
+            ReplayResult.__table__.delete().where(
+                ReplayResult.job_id.in_(job_ids.scalar_subquery())
+            )
+        )
+        db.session.execute(cls.__table__.delete().where(cls.path_id == path_pk))
+
+
+class ReplayResult(db.Model):
+    """Model for the outcome of re-sending one request in a replay job."""
+
+    __tablename__ = "replay_results"
+
+    job_id = Column(String(36), ForeignKey("replay_jobs.id"), primary_key=True)
+    # Not a foreign key: retention may delete the request after its replay
+    request_id = Column(String(36), primary_key=True)
+    sequence = Column(Integer, nullable=False)  # Position in capture order
+    status = Column(String(10), nullable=False)  # succeeded or failed
+    status_code = Column(Integer, nullable=True)  # Of the last attempt
+    attempts = Column(Integer, nullable=False)
+    duration_ms = Column(Integer, nullable=False)  # All attempts and backoff
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Serves result listings of a job in capture order
+        Index("ix_replay_results_job_id_sequence", job_id, sequence),
+    )
+
+    def __repr__(self):
+        """String representation of the ReplayResult."""
+        return f"<ReplayResult {self.request_id} {self.status}>"
+
+    def to_dict(self):
+        """Convert the ReplayResult to a dictionary."""
+        return {
+            "request_id": self.request_id,
+            "sequence": self.sequence,
+            "status": self.status,
+            "status_code": self.status_code,
+            "attempts": self.attempts,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "finished_at": self.finished_at.isoformat(),
+        }
+
+    @classmethod
+    def page_for_job(cls, job_id, status=None, limit=100, offset=0):
+        """Get one page of a job's results in capture order, and their count."""
+        query = cls.query.filter(cls.job_id == job_id)
+        if status is not None:
+            query = query.filter(cls.status == status)
+        total = query.count()
+        results = query.order_by(cls.sequence).offset(offset).limit(limit).all()
+        return results, total
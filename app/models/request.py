@@ -1,13 +1,43 @@
 """Request model for storing captured webhook requests."""
 
+import base64
+import codecs
+import io
 import json
 import uuid
+from collections import namedtuple
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text
-from sqlalchemy.orm import relationship
+from flask import current_app
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    delete,
+    event,
+    insert,
+    or_,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import defer, relationship, selectinload
 
 from app import db
+from app.models.request_body import RequestBody
+from app.models.request_rollup import RequestRollup
+from app.utils.helpers import decode_cursor, encode_cursor, parse_content_type
+
+# JSON documents: JSONB on PostgreSQL, JSON text elsewhere (e.g. SQLite)
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+# One page of captured requests plus cursors to the neighbouring pages
+RequestPage = namedtuple("RequestPage", ["requests", "next_cursor", "prev_cursor"])
 
 
 class Request(db.Model):
@@ -16,17 +46,19 @@ class Request(db.Model):
     __tablename__ = "requests"
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    path_id = Column(String(36), ForeignKey("paths.id"), nullable=False, index=True)
+    path_id = Column(String(36), ForeignKey("paths.id"), nullable=False)
 
     # Request details
     method = Column(String(10), nullable=False)
-    headers = Column(
-        Text, nullable=False, default="{}"
-    )  # Store as JSON string for SQLite
-    body = Column(Text, nullable=True)
-    query_params = Column(
-        Text, nullable=False, default="{}"
-    )  # Store as JSON string for SQLite
+    headers = Column(JSONDocument, nullable=False, default=dict)
+    # Digest of the body in request_bodies; read it through ``body``
+    body_digest = Column(String(64), nullable=True)
+    body_size = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )  # Size of the received body in bytes
+    content_type = Column(String(255), nullable=True)  # Media type, lowercased
+    charset = Column(String(40), nullable=True)  # Declared charset, lowercased
+    query_params = Column(JSONDocument, nullable=False, default=dict)
 
     # Client information
     ip_address = Column(String(45), nullable=True)  # IPv6 support
@@ -35,40 +67,105 @@ class Request(db.Model):
     # Timing
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
+    # Outcome of forwarding to the path's upstream; all None when not forwarded
+    upstream_status = Column(Integer, nullable=True)  # None when no response
+    upstream_latency_ms = Column(Integer, nullable=True)
+    upstream_error = Column(String(20), nullable=True)  # e.g. timeout
+
     # Relationship to path
     path = relationship("Path", back_populates="requests")
 
+    # Stored body; references are counted in RequestBody.refcount rather than
+    # with a foreign key, so ingest does not maintain another index
+    body_record = relationship(
+        "RequestBody",
+        primaryjoin="foreign(Request.body_digest) == RequestBody.digest",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        # Serves per-path listings newest first and keyset pagination; its
+        # leading column also covers lookups by path_id alone
+        Index(
+            "ix_requests_path_id_timestamp_id",
+            path_id,
+            timestamp.desc(),
+            id.desc(),
+        ),
+        # Same, for listings filtered by method
+        Index(
+            "ix_requests_path_id_method_timestamp_id",
+            path_id,
+            method,
+            timestamp.desc(),
+            id.desc(),
+        ),
+    )
+
     def __repr__(self):
         """String representation of the Request."""
         return (
             f'<Request {self.method} {self.path.path_id if self.path else "Unknown"}>'
         )
 
+    @property
+    def body(self):
+        """Get the raw body bytes as received."""
+        pending = self.__dict__.get("_pending_body")
+        if pending is not None:
+            return pending
+        if self.body_digest is None:
+            return None
+        record = self.body_record
+        return record.read() if record is not None else None
+
+    @body.setter
+    def body(self, value):
+        """Set the body of a new request from bytes, or text in its charset.
+
+        The body is written to the body store along with the request.
+        """
+        if isinstance(value, str):
+            value = value.encode(_codec_for(self.charset))
+        self._pending_body = value or None
+        self.body_digest = RequestBody.digest_of(value) if value else None
+
+    @property
+    def body_text(self):
+        """Get the body decoded as text, or None if it is not valid text."""
+        return self._decode_body(self.body)
+
+    def _decode_body(self, body):
+        """Decode body bytes with the declared charset."""
+        if body is None:
+            return None
+        try:
+            return body.decode(_codec_for(self.charset))
+        except UnicodeDecodeError:
+            return None
+
     @property
     def headers_dict(self):
         """Get headers as dictionary."""
-        try:
-            return json.loads(self.headers) if self.headers else {}
-        except json.JSONDecodeError:
-            return {}
+        projected = getattr(self, "_projected_headers", None)
+        if projected is not None:
+            return projected
+        return as_dict(self.headers)
 
     @headers_dict.setter
     def headers_dict(self, value):
         """Set headers from dictionary."""
-        self.headers = json.dumps(value) if value else "{}"
+        self.headers = dict(value) if value else {}
 
     @property
     def query_params_dict(self):
         """Get query params as dictionary."""
-        try:
-            return json.loads(self.query_params) if self.query_params else {}
-        except json.JSONDecodeError:
-            return {}
+        return as_dict(self.query_params)
 
     @query_params_dict.setter
     def query_params_dict(self, value):
         """Set query params from dictionary."""
-        self.query_params = json.dumps(value) if value else "{}"
+        self.query_params = dict(value) if value else {}
 
     def to_dict(self, include_body=True):
         """Convert the Request to a dictionary."""
@@ -81,16 +178,53 @@ class Request(db.Model):
             "ip_address": self.ip_address,
             "user_agent": self.user_agent,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "upstream_status": self.upstream_status,
+            "upstream_latency_ms": self.upstream_latency_ms,
+            "upstream_error": self.upstream_error,
         }
 
         if include_body:
-            result["body"] = self.body
+            # Loaded and decoded only here
+            result["body"], result["body_encoding"] = serialize_body(
+                self.body, self.charset
+            )
 
         return result
 
+    def to_row(self):
+        """Convert the Request to a dictionary of column values for bulk inserts.
+
+        The ``body`` key holds the body store row from ``RequestBody.prepare``,
+        or None.
+        """
+        row = {}
+        for attribute in self.__mapper__.column_attrs:
+            column = attribute.columns[0]
+            value = getattr(self, attribute.key)
+            if value is None and column.default is not None:
+                # Apply the column default ourselves, as an ORM flush would
+                if column.default.is_callable:
+                    value = column.default.arg(None)
+                elif column.default.is_scalar:
+                    value = column.default.arg
+            row[column.key] = value
+        row["body"] = self._prepared_body()
+        return row
+
+    def _prepared_body(self, connection=None):
+        """Get the body store row for a body set on this instance, if any."""
+        pending = self.__dict__.get("_pending_body")
+        if pending is None:
+            return None
+        return RequestBody.prepare(pending, connection=connection)
+
     @classmethod
-    def create_from_flask_request(cls, flask_request, path_instance):
-        """Create a Request instance from a Flask request object."""
+    def build_from_flask_request(cls, flask_request, path_instance):
+        """Build an unsaved Request instance from a Flask request object.
+
+        The id and timestamp are assigned up front so the instance can be
+        acknowledged to the sender before it is written.
+        """
         # Extract headers as dict, excluding problematic headers
         headers = {}
         for key, value in flask_request.headers:
@@ -100,13 +234,18 @@ class Request(db.Model):
         # Extract query parameters
         query_params = dict(flask_request.args)
 
-        # Get request body
-        body = None
-        if flask_request.data:
-            try:
-                body = flask_request.data.decode("utf-8")
-            except UnicodeDecodeError:
-                body = f"<Binary data: {len(flask_request.data)} bytes>"
+        # Media type without parameters, for grouping in statistics
+        content_type = charset = None
+        if flask_request.headers.get("Content-Type"):
+            media_type, charset = parse_content_type(
+                flask_request.headers["Content-Type"]
+            )
+            content_type = media_type.lower()[:255]
+            charset = charset.strip("\"'").lower()[:40]
+
+        # Keep the raw body bytes; they are only decoded when read as text
+        body = flask_request.get_data() or None
+        body_size = len(body) if body else 0
 
         # Get client IP (considering proxies)
         ip_address = flask_request.environ.get(
@@ -116,27 +255,249 @@ class Request(db.Model):
             ip_address = ip_address.split(",")[0].strip()
 
         request = cls(
+            id=str(uuid.uuid4()),
             path_id=path_instance.id,
             method=flask_request.method,
             body=body,
+            body_size=body_size,
+            content_type=content_type,
+            charset=charset,
             ip_address=ip_address,
             user_agent=flask_request.headers.get("User-Agent", ""),
+            timestamp=datetime.utcnow(),
         )
 
         # Set JSON data using properties
         request.headers_dict = headers
         request.query_params_dict = query_params
 
-        db.session.add(request)
-        db.session.commit()
         return request
 
+    @classmethod
+    def create_from_flask_request(cls, flask_request, path_instance):
+        """Create a Request instance from a Flask request object."""
+        request = cls.build_from_flask_request(flask_request, path_instance)
+        request.save(path_instance)
+        return request
+
+    def save(self, path_instance):
+        """Commit a built request along with its counters and rollups."""
+        from app.models.path import Path
+
+        db.session.add(self)
+        Path.add_to_counters({self.path_id: (1, self.body_size, self.timestamp)})
+        RequestRollup.record(
+            [
+                {
+                    "path_id": self.path_id,
+                    "method": self.method,
+                    "body_size": self.body_size,
+                    "timestamp": self.timestamp,
+                }
+            ]
+        )
+        if (
+            path_instance.max_requests is not None
+            or path_instance.max_bytes is not None
+        ):
+            self.trim_to_limits([self.path_id])
+        db.session.commit()
+
+    @classmethod
+    def record_upstream(cls, request_id, timestamp, result):
+        """Store the forwarding outcome of a committed request and commit.
+
+        ``result`` is an ``UpstreamResult``. The timestamp lets a partitioned
+        table update the one partition holding the request.
+        """
+        table = cls.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == request_id, table.c.timestamp == timestamp)
+            .values(
+                upstream_status=result.status_code,
+                upstream_latency_ms=result.latency_ms,
+                upstream_error=result.error,
+            )
+        )
+        db.session.commit()
+
+    @classmethod
+    def bulk_insert(cls, rows, copy=False):
+        """Insert many captured requests in a single transaction.
+
+        ``rows`` are dictionaries produced by ``to_row``. They are sent as one
+        executemany, which the PostgreSQL driver turns into multi-row INSERTs;
+        their bodies are stored first, one row per distinct digest, and they
+        are counted in the time-series rollups. With ``copy``, PostgreSQL
+        loads them with COPY instead, which is faster for large batches.
+        """
+        from app.models.path import Path
+
+        if not rows:
+            return 0
+
+        RequestBody.add_references(row["body"] for row in rows if row.get("body"))
+        columns = [
+            {key: value for key, value in row.items() if key != "body"} for row in rows
+        ]
+        if copy and db.session.get_bind().dialect.name == "postgresql":
+            cls._copy_rows(columns)
+        else:
+            db.session.execute(insert(cls.__table__), columns)
+        totals = cls.totals_by_path(rows)
+        Path.add_to_counters(totals)
+        RequestRollup.record(rows)
+        cls.trim_to_limits(list(totals))
+        db.session.commit()
+        return len(rows)
+
+    @classmethod
+    def _copy_rows(cls, rows):
+        """Load column dictionaries into requests with COPY (PostgreSQL only).
+
+        Runs in the session's transaction, without commit.
+        """
+        columns = [column.key for column in cls.__table__.columns]
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row.get(column)) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        quoted = ", ".join(f'"{column}"' for column in columns)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY requests ({quoted}) FROM STDIN", buffer)
+        finally:
+            cursor.close()
+
+    @classmethod
+    def trim_to_limits(cls, path_pks=None, slack=None):
+        """Delete the oldest requests of paths over max_requests or max_bytes.
+
+        A path is only trimmed once it exceeds a limit by more than ``slack``
+        (a fraction, default ``PATH_LIMIT_SLACK``), and then back down to the
+        limit, so ring-buffer paths pay for a trim every few captures rather
+        than on each one. With ``path_pks`` of None every limited path is
+        checked. Runs in the caller's transaction, without commit; returns
+        the number of requests deleted.
+        """
+        deleted = 0
+        for path_pk, last in cls.trim_positions(path_pks, slack).items():
+            expired = db.session.query(cls.id).filter(
+                cls.path_id == path_pk,
+                tuple_(cls.timestamp, cls.id) <= tuple_(*last),
+            )
+            deleted += cls.delete_by_ids([row.id for row in expired])
+        return deleted
+
+    @classmethod
+    def trim_positions(cls, path_pks=None, slack=None):
+        """Find where paths over their limits must be trimmed.
+
+        Returns, for each path exceeding a limit by more than ``slack`` (see
+        ``trim_to_limits``), the (timestamp, id) of the newest request to
+        delete: deleting it and every older request of the path brings the
+        path back within its limits.
+        """
+        from app.models.path import Path
+
+        if slack is None:
+            slack = current_app.config["PATH_LIMIT_SLACK"]
+
+        query = db.session.query(
+            Path.id,
+            Path.request_count,
+            Path.total_body_bytes,
+            Path.max_requests,
+            Path.max_bytes,
+        ).filter(or_(Path.max_requests.isnot(None), Path.max_bytes.isnot(None)))
+        if path_pks is not None:
+            if not path_pks:
+                return {}
+            query = query.filter(Path.id.in_(path_pks))
+
+        positions = {}
+        for path_pk, count, body_bytes, max_requests, max_bytes in query.all():
+            over_count = max_requests is not None and count > max_requests * (1 + slack)
+            over_bytes = max_bytes is not None and body_bytes > max_bytes * (1 + slack)
+            if not (over_count or over_bytes):
+                continue
+
+            # Walk the path's oldest requests until enough are marked
+            last = None
+            while not _within_limits(count, body_bytes, max_requests, max_bytes):
+                oldest = db.session.query(cls.timestamp, cls.id, cls.body_size).filter(
+                    cls.path_id == path_pk
+                )
+                if last is not None:
+                    oldest = oldest.filter(
+                        tuple_(cls.timestamp, cls.id) > tuple_(*last)
+                    )
+                chunk = oldest.order_by(cls.timestamp, cls.id).limit(500).all()
+                if not chunk:
+                    break
+                for timestamp, request_id, body_size in chunk:
+                    if _within_limits(count, body_bytes, max_requests, max_bytes):
+                        break
+                    last = (timestamp, request_id)
+                    count -= 1
+                    body_bytes -= body_size or 0
+            if last is not None:
+                positions[path_pk] = last
+        return positions
+
+    @classmethod
+    def delete_by_ids(cls, request_ids, chunk_size=1000):
+        """Delete requests by id, updating path counters and body references.
+
+        Counters and references are taken from the rows actually deleted, so
+        requests removed concurrently are not counted twice. Runs in the
+        caller's transaction, without commit; returns the number deleted.
+        """
+        from app.models.path import Path
+
+        table = cls.__table__
+        deleted = []
+        for start in range(0, len(request_ids), chunk_size):
+            deleted += db.session.execute(
+                delete(table)
+                .where(table.c.id.in_(request_ids[start : start + chunk_size]))
+                .returning(table.c.path_id, table.c.body_size, table.c.body_digest)
+            ).all()
+
+        totals = {}
+        references = {}
+        for path_pk, body_size, body_digest in deleted:
+            count, body_bytes, _ = totals.get(path_pk, (0, 0, None))
+            totals[path_pk] = (count - 1, body_bytes - (body_size or 0), None)
+            if body_digest is not None:
+                references[body_digest] = references.get(body_digest, 0) + 1
+        Path.add_to_counters(totals)
+        RequestBody.release(references)
+        return len(deleted)
+
+    @staticmethod
+    def totals_by_path(rows):
+        """Aggregate row dictionaries into per-path counter totals."""
+        totals = {}
+        for row in rows:
+            count, body_bytes, last_at = totals.get(row["path_id"], (0, 0, None))
+            timestamp = row["timestamp"]
+            totals[row["path_id"]] = (
+                count + 1,
+                body_bytes + (row["body_size"] or 0),
+                timestamp if last_at is None or timestamp > last_at else last_at,
+            )
+        return totals
+
     @classmethod
     def get_by_path_id(cls, path_id, limit=100, offset=0):
         """Get requests for a specific path with pagination."""
         from app.models.path import Path
 
-        path = Path.find_by_path_id(path_id)
+        path = Path.resolve(path_id)
         if not path:
             return []
 
@@ -148,12 +509,117 @@ class Request(db.Model):
             .all()
         )
 
+    @classmethod
+    def get_page_by_path_id(
+        cls,
+        path_id,
+        limit=100,
+        cursor=None,
+        offset=0,
+        method=None,
+        since=None,
+        header_keys=None,
+        include_body=False,
+    ):
+        """Get one page of requests for a path, newest first.
+
+        With a ``cursor`` (from a previous page) the page is found by seeking
+        on (timestamp, id), so its cost does not depend on how deep it is and
+        rows arriving meanwhile do not shift it. Without one, ``offset`` is
+        applied as before. ``method`` and ``since`` narrow the listing and must
+        be passed unchanged along with the cursor.
+
+        With ``header_keys``, only those headers are extracted by the database
+        and the full headers document is never loaded. ``include_body`` loads
+        the bodies of the whole page in one query. Returns a ``RequestPage``.
+        """
+        from app.models.path import Path
+
+        path = Path.resolve(path_id)
+        if not path:
+            return RequestPage([], None, None)
+
+        if header_keys:
+            # Captured header names are stored in canonical Title-Case
+            header_keys = [key.strip().title() for key in header_keys]
+            query = db.session.query(
+                cls, *[cls.headers[key].as_string() for key in header_keys]
+            ).options(defer(cls.headers))
+        else:
+            query = db.session.query(cls)
+
+        if include_body:
+            query = query.options(selectinload(cls.body_record))
+
+        position = tuple_(cls.timestamp, cls.id)
+        query = query.filter(cls.path_id == path.id)
+        if method:
+            query = query.filter(cls.method == method.upper())
+        if since is not None:
+            query = query.filter(cls.timestamp >= since)
+        direction = "next"
+        if cursor:
+            timestamp, request_id, direction = decode_cursor(cursor)
+            # The plain timestamp bounds are implied by the row comparisons;
+            # they let PostgreSQL prune partitions the seek cannot reach
+            if direction == "next":
+                query = query.filter(
+                    cls.timestamp <= timestamp,
+                    position < tuple_(timestamp, request_id),
+                )
+            else:
+                query = query.filter(
+                    cls.timestamp >= timestamp,
+                    position > tuple_(timestamp, request_id),
+                )
+
+        if direction == "next":
+            query = query.order_by(cls.timestamp.desc(), cls.id.desc())
+        else:
+            # Walk towards newer rows, then restore newest-first order
+            query = query.order_by(cls.timestamp.asc(), cls.id.asc())
+        if not cursor and offset:
+            query = query.offset(offset)
+
+        # One extra row tells us whether there is another page this way
+        requests = query.limit(limit + 1).all()
+        if header_keys:
+            requests = [
+                cls._with_projected_headers(row[0], header_keys, row[1:])
+                for row in requests
+            ]
+        has_more = len(requests) > limit
+        requests = requests[:limit]
+        if direction == "prev":
+            requests.reverse()
+
+        if not requests:
+            return RequestPage([], None, None)
+
+        first, last = requests[0], requests[-1]
+        has_next = has_more if direction == "next" else True
+        has_prev = has_more if direction == "prev" else bool(cursor or offset)
+
+        return RequestPage(
+            requests,
+            encode_cursor(last.timestamp, last.id, "next") if has_next else None,
+            encode_cursor(first.timestamp, first.id, "prev") if has_prev else None,
+        )
+
+    @staticmethod
+    def _with_projected_headers(request, header_keys, values):
+        """Attach headers extracted by the database to a loaded request."""
+        request._projected_headers = {
+            key: value for key, value in zip(header_keys, values) if value is not None
+        }
+        return request
+
     @classmethod
     def get_by_id_and_path(cls, request_id, path_id):
         """Get a specific request by ID and path ID."""
         from app.models.path import Path
 
-        path = Path.find_by_path_id(path_id)
+        path = Path.resolve(path_id)
         if not path:
             return None
 
@@ -163,3 +629,88 @@ class Request(db.Model):
     def get_recent_requests(cls, limit=10):
         """Get the most recent requests across all paths."""
         return cls.query.order_by(cls.timestamp.desc()).limit(limit).all()
+
+
+@event.listens_for(Request, "before_insert")
+def _store_body(mapper, connection, target):
+    """Store the body of a request inserted through the ORM."""
+    body = target._prepared_body(connection)
+    if body is not None:
+        RequestBody.add_references([body], connection=connection)
+
+
+@event.listens_for(Request, "after_delete")
+def _release_body(mapper, connection, target):
+    """Drop the body reference of a request deleted through the ORM."""
+    if target.body_digest is not None:
+        RequestBody.release({target.body_digest: 1}, connection=connection)
+
+
+def _within_limits(count, body_bytes, max_requests, max_bytes):
+    """Return whether a path's totals are within its size limits."""
+    return (max_requests is None or count <= max_requests) and (
+        max_bytes is None or body_bytes <= max_bytes
+    )
+
+
+def as_dict(value):
+    """Return a stored JSON document as a dictionary.
+
+    Values are normally decoded by the column type already; strings are
+    accepted for rows written as JSON text before the column type changed.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def serialize_body(body, charset):
+    """Return (body, encoding) for JSON: text, or base64 if it is not text."""
+    if body is None:
+        return None, "text"
+    try:
+        return body.decode(_codec_for(charset)), "text"
+    except UnicodeDecodeError:
+        return base64.b64encode(body).decode("ascii"), "base64"
+
+
+def deserialize_body(body, encoding, charset):
+    """Return the raw body from the (body, encoding) of ``serialize_body``."""
+    if body is None:
+        return None
+    if encoding == "base64":
+        return base64.b64decode(body, validate=True)
+    if encoding == "text":
+        return body.encode(_codec_for(charset))
+    raise ValueError(f"Unknown body encoding: {encoding}")
+
+
+def _copy_value(value):
+    """Render a column value in the text format of PostgreSQL COPY."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=" ")
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    else:
+        value = str(value)
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _codec_for(charset):
+    """Return a Python codec name for a declared charset, defaulting to UTF-8."""
+    if charset:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            pass
+    return "utf-8"
@@ -0,0 +1,304 @@
+"""Content-addressed store for captured request bodies."""
+
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    bindparam,
+    delete,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.utils.compression import CODEC_NONE, compress, decompress
+
+
+class RequestBody(db.Model):
+    """Model for request bodies, stored once per distinct content.
+
+    Rows are keyed by the SHA-256 digest of the raw body and count the
+    requests referencing them; bodies no longer referenced are removed by
+    ``collect_garbage``. Large bodies are spilled to the blob store: the row
+    then holds only their segment and offset, and ``size`` is their length.
+    """
+
+    __tablename__ = "request_bodies"
+
+    digest = Column(String(64), primary_key=True)  # SHA-256 of the raw body
+    codec = Column(SmallInteger, nullable=False, default=CODEC_NONE, server_default="0")
+    size = Column(Integer, nullable=False)  # Size of the raw body in bytes
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    data = Column(LargeBinary, nullable=True)  # Body compressed with codec
+    segment = Column(Integer, nullable=True)  # Blob store segment of a spilled body
+    segment_offset = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Only spilled bodies are indexed; used to find a segment's bodies
+        Index(
+            "ix_request_bodies_segment",
+            "segment",
+            postgresql_where=segment.isnot(None),
+            sqlite_where=segment.isnot(None),
+        ),
+    )
+
+    def __repr__(self):
+        """String representation of the RequestBody."""
+        return f"<RequestBody {self.digest[:12]} refs={self.refcount}>"
+
+    def read(self):
+        """Get the raw body bytes."""
+        return self.read_stored(
+            self.codec, self.data, self.segment, self.segment_offset, self.size
+        )
+
+    @staticmethod
+    def read_stored(codec, data, segment, segment_offset, size):
+        """Get raw body bytes from the column values of a stored body."""
+        if segment is not None:
+            return current_app.extensions["blob_store"].read(
+                segment, segment_offset, size
+            )
+        return decompress(codec, data)
+
+    def iter_range(self, start=0, stop=None, chunk_size=64 * 1024):
+        """Return an iterator over bytes ``start:stop`` of the raw body.
+
+        Spilled bodies are streamed from the blob store a chunk at a time.
+        Bodies kept in the database are below the spill threshold, so they
+        are decompressed in one piece. Safe to consume outside the app
+        context.
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        if self.segment is not None:
+            blob_store = current_app.extensions["blob_store"]
+            return blob_store.iter_range(
+                self.segment, self.segment_offset + start, stop - start, chunk_size
+            )
+
+        view = memoryview(decompress(self.codec, self.data))[start:stop]
+        return (
+            bytes(view[offset : offset + chunk_size])
+            for offset in range(0, len(view), chunk_size)
+        )
+
+    @staticmethod
+    def digest_of(raw):
+        """Get the digest identifying a raw body."""
+        return hashlib.sha256(raw).hexdigest()
+
+    @staticmethod
+    def prepare(raw, codec=None, threshold=None, connection=None):
+        """Build the row storing a raw body, compressed per the app settings.
+
+        Bodies of at least ``BODY_SPILL_THRESHOLD`` bytes are appended to the
+        blob store as they are, unless the same body is already stored, even
+        without references left: ``add_references`` then revives that row.
+        """
+        config = current_app.config
+        digest = RequestBody.digest_of(raw)
+        row = {
+            "digest": digest,
+            "codec": CODEC_NONE,
+            "size": len(raw),
+            "data": None,
+            "segment": None,
+            "segment_offset": None,
+        }
+
+        spill_threshold = config["BODY_SPILL_THRESHOLD"]
+        if spill_threshold and len(raw) >= spill_threshold:
+            table = RequestBody.__table__
+            executor = connection if connection is not None else db.session
+            stored = executor.execute(
+                select(
+                    table.c.codec, table.c.data, table.c.segment, table.c.segment_offset
+                ).where(table.c.digest == digest)
+            ).first()
+            if stored is not None:
+                row.update(stored._mapping)
+            else:
+                blob_store = current_app.extensions["blob_store"]
+                row["segment"], row["segment_offset"] = blob_store.append(raw)
+            return row
+
+        if codec is None:
+            codec = config["BODY_COMPRESSION_CODEC"]
+        if threshold is None:
+            threshold = config["BODY_COMPRESSION_THRESHOLD"]
+        row["codec"], row["data"] = compress(raw, codec, threshold)
+        return row
+
+    @classmethod
+    def add_references(cls, rows, connection=None):
+        """Store bodies, or count another reference to those already stored.
+
+        ``rows`` come from ``prepare`` and may repeat a digest. This is one
+        INSERT ... ON CONFLICT DO UPDATE executemany; it does not commit.
+        """
+        references = {}
+        for row in rows:
+            if row["digest"] in references:
+                references[row["digest"]]["refcount"] += 1
+            else:
+                references[row["digest"]] = dict(
+                    row, refcount=1, created_at=datetime.utcnow()
+                )
+        if not references:
+            return
+
+        executor = connection if connection is not None else db.session
+        dialect = (
+            connection.dialect
+            if connection is not None
+            else db.session.get_bind().dialect
+        )
+        insert = postgresql_insert if dialect.name == "postgresql" else sqlite_insert
+        statement = insert(cls.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.__table__.c.digest],
+            set_={"refcount": cls.__table__.c.refcount + statement.excluded.refcount},
+        )
+        # Sorted, so concurrent writers lock body rows in the same order
+        executor.execute(
+            statement, [references[digest] for digest in sorted(references)]
+        )
+
+    @classmethod
+    def release(cls, counts, connection=None):
+        """Drop references; ``counts`` maps a digest to how many were removed.
+
+        Bodies left without references are deleted later by
+        ``collect_garbage``. Does not commit.
+        """
+        if not counts:
+            return
+
+        table = cls.__table__
+        executor = connection if connection is not None else db.session
+        executor.execute(
+            update(table)
+            .where(table.c.digest == bindparam("b_digest"))
+            .values(refcount=table.c.refcount - bindparam("b_count")),
+            [
+                {"b_digest": digest, "b_count": count}
+                for digest, count in sorted(counts.items())
+            ],
+        )
+
+    @classmethod
+    def collect_garbage(cls, batch_size=1000):
+        """Delete unreferenced bodies in batches; returns how many were deleted.
+
+        Each batch commits separately. Rows are re-checked when deleted, so a
+        body referenced again meanwhile is kept.
+        """
+        table = cls.__table__
+        deleted = 0
+        while True:
+            digests = (
+                db.session.execute(
+                    select(table.c.digest)
+                    .where(table.c.refcount <= 0)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not digests:
+                return deleted
+
+            result = db.session.execute(
+                delete(table).where(table.c.digest.in_(digests), table.c.refcount <= 0)
+            )
+            db.session.commit()
+            deleted += result.rowcount
+            if len(digests) < batch_size:
+                return deleted
+
+    @classmethod
+    def compact_segments(cls, min_live_ratio=None, grace=60.0):
+        """Rewrite sparse blob store segments and delete them.
+
+        A segment is rewritten when its live bodies (those still referenced)
+        fill less than ``min_live_ratio`` of it: its bodies are appended to
+        the current segment, their rows are repointed and committed, and the
+        old file is removed. Unreferenced bodies not yet collected are moved
+        too, since a capture may revive them meanwhile.
+        The current segment and segments written to in the last ``grace``
+        seconds (whose bodies may not be committed yet) are left alone.
+        Returns the number of segments removed.
+        """
+        if min_live_ratio is None:
+            min_live_ratio = current_app.config["BODY_SEGMENT_MIN_LIVE_RATIO"]
+
+        blob_store = current_app.extensions["blob_store"]
+        segments = blob_store.segments()
+        if len(segments) < 2:
+            return 0
+
+        table = cls.__table__
+        live = dict(
+            db.session.execute(
+                select(table.c.segment, func.sum(table.c.size))
+                .where(table.c.segment.isnot(None), table.c.refcount > 0)
+                .group_by(table.c.segment)
+            ).all()
+        )
+
+        removed = 0
+        recent = time.time() - grace
+        for segment in segments[:-1]:
+            path = blob_store.segment_path(segment)
+            if os.path.getmtime(path) > recent:
+                continue
+            if (live.get(segment) or 0) >= os.path.getsize(path) * min_live_ratio:
+                continue
+
+            bodies = db.session.execute(
+                select(table.c.digest, table.c.segment_offset, table.c.size).where(
+                    table.c.segment == segment
+                )
+            ).all()
+            moved = []
+            for digest, offset, size in bodies:
+                new_segment, new_offset = blob_store.append(
+                    blob_store.read(segment, offset, size)
+                )
+                moved.append(
+                    {
+                        "b_digest": digest,
+                        "b_segment": new_segment,
+                        "b_offset": new_offset,
+                    }
+                )
+            if moved:
+                db.session.execute(
+                    update(table)
+                    .where(table.c.digest == bindparam("b_digest"))
+                    .values(
+                        segment=bindparam("b_segment"),
+                        segment_offset=bindparam("b_offset"),
+                    ),
+                    moved,
+                )
+            db.session.commit()
+            blob_store.remove(segment)
+            removed += 1
+        return removed
@@ -0,0 +1,228 @@
+"""Per-path request counts rolled up into time buckets."""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    and_,
+    delete,
+    or_,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+
+# Bucket units, finest first
+UNITS = ("minute", "hour", "day")
+
+
+def floor_to(moment, unit):
+    """Return the start of the ``unit`` bucket containing ``moment``."""
+    if unit == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if unit == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if unit == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported time unit: {unit}")
+
+
+class RequestRollup(db.Model):
+    """Model for request counts and body bytes per path, bucket and method.
+
+    Captures are counted in minute buckets as they are written. Over time
+    ``coarsen`` folds old minute buckets into hour buckets and old hour
+    buckets into day buckets, so time series of any length are served from a
+    small table. Rollups outlive retention: deleting requests leaves them
+    alone, deleting the path removes them.
+    """
+
+    __tablename__ = "request_rollups"
+
+    path_id = Column(String(36), ForeignKey("paths.id"), primary_key=True)
+    unit = Column(String(6), primary_key=True)  # minute, hour or day
+    bucket = Column(DateTime, primary_key=True)  # Start of the bucket
+    method = Column(String(10), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    body_bytes = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        """String representation of the RequestRollup."""
+        return f"<RequestRollup {self.unit} {self.bucket} {self.method}>"
+
+    @classmethod
+    def record(cls, rows):
+        """Count captured requests in their minute buckets.
+
+        ``rows`` are dictionaries with path_id, method, body_size and
+        timestamp, such as those from ``Request.to_row``. This is one
+        INSERT ... ON CONFLICT DO UPDATE executemany; it does not commit.
+        """
+        totals = {}
+        for row in rows:
+            key = (
+                row["path_id"],
+                "minute",
+                floor_to(row["timestamp"], "minute"),
+                row["method"],
+            )
+            count, body_bytes = totals.get(key, (0, 0))
+            totals[key] = (count + 1, body_bytes + (row["body_size"] or 0))
+        cls._add(totals)
+
+    @classmethod
+    def coarsen(cls, now=None, minutes_for=None, hours_for=None, batch_size=1000):
+        """Fold old buckets into coarser ones; returns the rows folded.
+
+        Minute buckets older than ``minutes_for`` become hour buckets, and
+        hour buckets older than ``hours_for`` become day buckets. Only whole
+        coarse buckets are folded, so a bucket is never split across units
+        once a run completes. Rows are folded up to ``batch_size`` at a time,
+        each batch committed on its own. Each batch is deleted with
+        DELETE ... RETURNING and folded from the rows returned, so counts
+        added to an old bucket meanwhile (late ingest, imports) are left for
+        the next batch instead of being lost.
+        """
+        now = now or datetime.utcnow()
+        if minutes_for is None:
+            minutes_for = timedelta(hours=current_app.config["ROLLUP_MINUTE_HOURS"])
+        if hours_for is None:
+            hours_for = timedelta(days=current_app.config["ROLLUP_HOUR_DAYS"])
+
+        table = cls.__table__
+        columns = (table.c.path_id, table.c.unit, table.c.bucket, table.c.method)
+        folded = 0
+        for unit, coarser, kept_for in (
+            ("minute", "hour", minutes_for),
+            ("hour", "day", hours_for),
+        ):
+            cutoff = floor_to(now - kept_for, coarser)
+            while True:
+                batch = (
+                    select(*columns)
+                    .where(table.c.unit == unit, table.c.bucket < cutoff)
+                    .order_by(table.c.path_id, table.c.bucket, table.c.method)
+                    .limit(batch_size)
+                )
+                rows = db.session.execute(
+                    delete(table)
+                    .where(tuple_(*columns).in_(batch))
+                    .returning(
+                        table.c.path_id,
+                        table.c.bucket,
+                        table.c.method,
+                        table.c.count,
+                        table.c.body_bytes,
+                    )
+                ).all()
+                if not rows:
+                    break
+
+                totals = {}
+                for path_pk, bucket, method, count, body_bytes in rows:
+                    key = (path_pk, coarser, floor_to(bucket, coarser), method)
+                    total_count, total_bytes = totals.get(key, (0, 0))
+                    totals[key] = (total_count + count, total_bytes + body_bytes)
+                cls._add(totals)
+                db.session.commit()
+                folded += len(rows)
+        return folded
+
+    @classmethod
+    def series(cls, path_pk, since, until, unit, method=None):
+        """Return the buckets of a path between ``since`` and ``until``.
+
+        Finer buckets are summed into ``unit`` buckets. Buckets already
+        coarser than ``unit`` (older data) are returned at their own size.
+        Returns a list of (bucket start, unit, count, body_bytes, per-method
+        counts), oldest first.
+        """
+        allowed = UNITS[UNITS.index(unit) :]
+        query = db.session.query(
+            cls.unit, cls.bucket, cls.method, cls.count, cls.body_bytes
+        ).filter(cls.path_id == path_pk)
+        if since is not None:
+            # Coarse buckets starting before ``since`` still overlap the window
+            query = query.filter(
+                or_(
+                    *[
+                        and_(
+                            cls.unit == bucket_unit,
+                            cls.bucket >= floor_to(since, bucket_unit),
+                        )
+                        for bucket_unit in UNITS
+                    ]
+                )
+            )
+        if until is not None:
+            query = query.filter(cls.bucket < until)
+        if method is not None:
+            query = query.filter(cls.method == method)
+
+        points = {}
+        for row_unit, bucket, row_method, count, body_bytes in query:
+            point_unit = row_unit if row_unit in allowed else unit
+            point_bucket = floor_to(bucket, point_unit)
+            key = (point_bucket, point_unit)
+            if key not in points:
+                points[key] = [0, 0, {}]
+            point = points[key]
+            point[0] += count
+            point[1] += body_bytes
+            point[2][row_method] = point[2].get(row_method, 0) + count
+
+        series = [
+            (bucket, point_unit, count, body_bytes, methods)
+            for (bucket, point_unit), (count, body_bytes, methods) in points.items()
+        ]
+        series.sort(key=lambda point: point[0])
+        return series
+
+    @classmethod
+    def _add(cls, totals):
+        """Upsert ``{(path_pk, unit, bucket, method): (count, bytes)}``."""
+        if not totals:
+            return
+
+        table = cls.__table__
+        dialect = db.session.get_bind().dialect
+        insert = postgresql_insert if dialect.name == "postgresql" else sqlite_insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                table.c.path_id,
+                table.c.unit,
+                table.c.bucket,
+                table.c.method,
+            ],
+            set_={
+                "count": table.c.count + statement.excluded.count,
+                "body_bytes": table.c.body_bytes + statement.excluded.body_bytes,
+            },
+        )
+        # Sorted, so concurrent writers lock rows in the same order
+        db.session.execute(
+            statement,
+            [
+                {
+                    "path_id": path_pk,
+                    "unit": unit,
+                    "bucket": bucket,
+                    "method": method,
+                    "count": count,
+                    "body_bytes": body_bytes,
+                }
+                for (path_pk, unit, bucket, method), (count, body_bytes) in sorted(
+                    totals.items()
+                )
+            ],
+        )
@@ -0,0 +1,170 @@
+"""Append-only segment files holding large request bodies."""
+
+import fcntl
+import mmap
+import os
+import re
+import threading
+
+import structlog
+
+logger = structlog.get_logger()
+
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{6})\.blob$")
+
+
+class BlobStore:
+    """Large bodies appended to numbered segment files and read through mmap.
+
+    A body is addressed by ``(segment, offset, length)``. Segments are only
+    ever appended to; once the newest one would grow past ``segment_size``
+    bytes the next one is started. Appends from all workers on a host are
+    serialized with a file lock. Reads slice a read-only memory map of the
+    segment, so only the requested bytes are copied into Python memory.
+
+    Space held by deleted bodies is reclaimed by rewriting sparse segments
+    (see ``RequestBody.compact_segments``) and removing the old file.
+    """
+
+    def __init__(self, directory, segment_size=256 * 1024 * 1024, fsync=True):
+        """Initialize a store keeping its segments in ``directory``."""
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.lock_path = os.path.join(directory, "segments.lock")
+
+        self._append_lock = threading.Lock()
+        self._maps_lock = threading.Lock()
+        self._maps = {}
+
+        self.appends = 0
+        self.bytes_appended = 0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a store configured from the application settings."""
+        return cls(
+            app.config["BODY_SPILL_DIR"],
+            segment_size=app.config["BODY_SEGMENT_SIZE"],
+        )
+
+    def segment_path(self, segment):
+        """Return the file path of a segment."""
+        return os.path.join(self.directory, f"segment-{segment:06d}.blob")
+
+    def segments(self):
+        """Return the numbers of the existing segments, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(match.group(1))
+            for match in map(SEGMENT_PATTERN.match, names)
+            if match is not None
+        )
+
+    def current_segment(self):
+        """Return the segment appends currently go to, or None if there is none."""
+        segments = self.segments()
+        return segments[-1] if segments else None
+
+    def segment_size_of(self, segment):
+        """Return the size of a segment file in bytes."""
+        return os.path.getsize(self.segment_path(segment))
+
+    def append(self, data):
+        """Append ``data`` to the current segment; returns (segment, offset)."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._append_lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            segment = self._segment_for(len(data))
+            fd = os.open(
+                self.segment_path(segment),
+                os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                0o644,
+            )
+            try:
+                offset = os.fstat(fd).st_size
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view) :]
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        self.appends += 1
+        self.bytes_appended += len(data)
+        return segment, offset
+
+    def read(self, segment, offset, length):
+        """Read ``length`` bytes at ``offset`` of a segment."""
+        end = offset + length
+        mapped = self._map(segment, end)
+        if len(mapped) < end:
+            raise ValueError(f"Segment {segment} is shorter than offset {end}")
+        return mapped[offset:end]
+
+    def iter_range(self, segment, offset, length, chunk_size=64 * 1024):
+        """Return an iterator over ``length`` bytes at ``offset`` of a segment.
+
+        The segment is mapped right away, so the iterator keeps working if
+        the segment is removed meanwhile. Only one chunk at a time is copied
+        out of the map.
+        """
+        end = offset + length
+        mapped = self._map(segment, end)
+        if len(mapped) < end:
+            raise ValueError(f"Segment {segment} is shorter than offset {end}")
+        return (
+            mapped[start : min(start + chunk_size, end)]
+            for start in range(offset, end, chunk_size)
+        )
+
+    def remove(self, segment):
+        """Delete a segment file; mappings still in use stay readable."""
+        with self._maps_lock:
+            self._maps.pop(segment, None)
+        try:
+            os.unlink(self.segment_path(segment))
+        except FileNotFoundError:
+            pass
+        logger.info("Body segment removed", segment=segment)
+
+    def stats(self):
+        """Return segment and append counters for the metrics endpoint."""
+        segments = self.segments()
+        return {
+            "directory": self.directory,
+            "segments": len(segments),
+            "bytes": sum(self.segment_size_of(segment) for segment in segments),
+            "appends": self.appends,
+            "bytes_appended": self.bytes_appended,
+        }
+
+    def _segment_for(self, length):
+        """Return the segment to append ``length`` bytes to (under the lock)."""
+        segment = self.current_segment() or 1
+        try:
+            size = self.segment_size_of(segment)
+        except FileNotFoundError:
+            return segment
+        if size and size + length > self.segment_size:
+            return segment + 1
+        return segment
+
+    def _map(self, segment, end):
+        """Return a read-only map of a segment covering at least ``end`` bytes.
+
+        Segments only grow, so a map is replaced when a read goes past its
+        end. Replaced maps are not closed: a concurrent reader may still be
+        slicing one, and it is released once the last reference goes away.
+        """
+        with self._maps_lock:
+            mapped = self._maps.get(segment)
+            if mapped is None or len(mapped) < end:
+                with open(self.segment_path(segment), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = mapped
+            return mapped
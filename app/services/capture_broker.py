@@ -0,0 +1,464 @@
+"""Broker delivering newly captured requests to live subscribers."""
+
+import collections
+import importlib
+import json
+import select
+import threading
+import time
+import uuid
+
+import structlog
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.utils.helpers import encode_cursor
+from app.utils.process import PerProcess
+
+logger = structlog.get_logger()
+
+NOTIFY_CHANNEL = "capture_events"
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when a worker already serves its maximum of subscribers."""
+
+
+class Subscription:
+    """Events for one path, buffered for one subscriber.
+
+    Holds at most ``maxsize`` events. A subscriber that falls further behind
+    is marked ``overflowed`` and gets no more events; it should reconnect and
+    catch up from the database.
+    """
+
+    def __init__(self, broker, path_id, maxsize):
+        """Initialize an empty subscription."""
+        self.broker = broker
+        self.path_id = path_id
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._events = collections.deque()
+        self._ready = threading.Condition()
+
+    def __enter__(self):
+        """Return the subscription; it is closed when the block exits."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the subscription."""
+        self.close()
+
+    def push(self, event):
+        """Buffer an event for the subscriber (called by the broker)."""
+        with self._ready:
+            if self.overflowed:
+                return False
+            if len(self._events) >= self.maxsize:
+                self.overflowed = True
+                self._events.clear()
+            else:
+                self._events.append(event)
+            self._ready.notify()
+            return not self.overflowed
+
+    def get(self, timeout=None):
+        """Return the next event, or None after ``timeout`` seconds or overflow."""
+        with self._ready:
+            if not self._events and not self.overflowed:
+                self._ready.wait(timeout)
+            if self._events:
+                return self._events.popleft()
+            return None
+
+    def close(self):
+        """Stop receiving events."""
+        self.broker.unsubscribe(self)
+
+
+class LocalBackend:
+    """Delivers events to subscribers of the publishing process only.
+
+    Enough for a single worker; with several gunicorn workers a subscriber
+    only sees captures handled by its own worker.
+    """
+
+    cross_process = False
+
+    def __init__(self, app=None):
+        """Initialize the backend."""
+        self._deliver = None
+
+    def start(self, deliver):
+        """Start delivering published events with ``deliver(path_id, event)``."""
+        self._deliver = deliver
+
+    def publish(self, path_id, event):
+        """Deliver an event right away."""
+        self._deliver(path_id, event)
+
+    def stop(self):
+        """Stop delivering events."""
+        self._deliver = None
+
+
+class PostgresBackend:
+    """Delivers events to every worker through PostgreSQL LISTEN/NOTIFY.
+
+    Publishing sends a NOTIFY on an autocommit connection from the pool;
+    each worker runs one thread LISTENing on its own connection and hands
+    notifications to its local subscribers. Events too large for a NOTIFY
+    payload are sent without their body.
+
+    Workers also announce on the channel the paths their subscribers
+    follow, when they change and every ``poll_interval`` seconds, and ask
+    the others for theirs when their listener connects. Announcements not
+    renewed for three intervals expire, so paths of a worker that exited
+    are forgotten. Captures of paths nobody follows are not published.
+    """
+
+    cross_process = True
+
+    def __init__(self, app, channel=NOTIFY_CHANNEL, poll_interval=5.0):
+        """Initialize the backend; the listener starts with ``start``."""
+        self.app = app
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._deliver = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._sender = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._local_paths = frozenset()
+        self._remote_paths = {}  # sender -> (paths, monotonic expiry)
+
+    def start(self, deliver):
+        """Start the listener thread of this process."""
+        self._deliver = deliver
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listen, name="capture-listener", daemon=True
+        )
+        self._thread.start()
+
+    def publish(self, path_id, event):
+        """Send an event to every worker, this one included."""
+        payload = json.dumps({"path_id": path_id, "event": event})
+        if len(payload) > NOTIFY_PAYLOAD_LIMIT:
+            request = dict(event["request"], body=None, body_encoding="omitted")
+            payload = json.dumps(
+                {"path_id": path_id, "event": dict(event, request=request)}
+            )
+        self._notify(payload)
+
+    def has_subscribers(self, path_id):
+        """Return whether a subscriber of any worker follows a path."""
+        now = time.monotonic()
+        with self._lock:
+            if path_id in self._local_paths:
+                return True
+            return any(
+                path_id in paths and expires > now
+                for paths, expires in self._remote_paths.values()
+            )
+
+    def subscriptions_changed(self, paths):
+        """Announce the paths followed by this worker's subscribers."""
+        with self._lock:
+            self._local_paths = frozenset(paths)
+        self._announce()
+
+    def stop(self):
+        """Stop the listener thread."""
+        self._stop.set()
+
+    def _announce(self):
+        """Tell the other workers which paths this one follows."""
+        with self._lock:
+            paths = sorted(self._local_paths)
+        self._notify(json.dumps({"sender": self._sender, "paths": paths}))
+
+    def _notify(self, payload):
+        """Send a NOTIFY payload on the channel."""
+        with self.app.app_context():
+            with db.engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as connection:
+                connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": self.channel, "payload": payload},
+                )
+
+    def _listen(self):
+        """Listener thread loop, reconnecting after connection failures."""
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    pooled = db.engine.raw_connection()
+                # Kept for as long as the thread listens, so not pooled
+                pooled.detach()
+                connection = pooled.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                self._notify(json.dumps({"sender": self._sender, "sync": True}))
+                try:
+                    self._receive(connection)
+                finally:
+                    connection.close()
+            except Exception as e:
+                logger.error("Capture listener failed, reconnecting", error=str(e))
+                self._stop.wait(1.0)
+
+    def _receive(self, connection):
+        """Hand notifications to subscribers until stopped."""
+        next_announce = 0.0
+        while not self._stop.is_set():
+            if self._local_paths and time.monotonic() >= next_announce:
+                self._announce()
+                next_announce = time.monotonic() + self.poll_interval
+            readable, _, _ = select.select([connection], [], [], self.poll_interval)
+            if not readable:
+                continue
+            connection.poll()
+            while connection.notifies:
+                notification = connection.notifies.pop(0)
+                self._handle(json.loads(notification.payload))
+
+    def _handle(self, message):
+        """Act on one notification: an event, an announcement or a sync."""
+        if "event" in message:
+            self._deliver(message["path_id"], message["event"])
+        elif message["sender"] == self._sender:
+            return
+        elif "paths" in message:
+            expires = time.monotonic() + 3 * self.poll_interval
+            with self._lock:
+                self._remote_paths[message["sender"]] = (
+                    frozenset(message["paths"]),
+                    expires,
+                )
+        elif self._local_paths:
+            self._announce()
+
+
+BACKENDS = {"local": LocalBackend, "postgres": PostgresBackend}
+
+
+class CaptureBroker:
+    """Fans captured requests out to the subscribers of their path.
+
+    Each worker keeps its own subscribers; the backend carries published
+    events to the workers (only the publishing one for ``local``). Events
+    are dictionaries with an ``id`` (a cursor usable to resume after the
+    request) and the serialized ``request``.
+    """
+
+    def __init__(
+        self, backend, max_subscribers=16, queue_size=1000, body_limit=64 * 1024
+    ):
+        """Initialize the broker; the backend starts on first use."""
+        self.backend = backend
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.body_limit = body_limit
+
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._backend = PerProcess(self._start_backend)
+
+        self.published = 0
+        self.delivered = 0
+        self.overflowed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a broker configured from the application settings.
+
+        ``CAPTURE_BROKER`` names a built-in backend or a ``module:Class``
+        implementing ``start(deliver)``, ``publish(path_id, event)`` and
+        ``stop()``, created with the app.
+        """
+        name = app.config["CAPTURE_BROKER"]
+        if name in BACKENDS:
+            backend_class = BACKENDS[name]
+        elif ":" in name:
+            module_name, class_name = name.split(":", 1)
+            backend_class = getattr(importlib.import_module(module_name), class_name)
+        else:
+            raise ValueError(f"Unknown capture broker: {name}")
+        return cls(
+            backend_class(app),
+            max_subscribers=app.config["STREAM_MAX_SUBSCRIBERS"],
+            queue_size=app.config["CAPTURE_BROKER_QUEUE_SIZE"],
+            body_limit=app.config["STREAM_BODY_LIMIT"],
+        )
+
+    def subscribe(self, path_id):
+        """Subscribe to the captures of a path.
+
+        Raises ``SubscriberLimitReached`` when this worker already serves
+        ``max_subscribers`` subscriptions.
+        """
+        self._ensure_started()
+        subscription = Subscription(self, path_id, self.queue_size)
+        with self._lock:
+            if self.subscriber_count() >= self.max_subscribers:
+                self.rejected += 1
+                raise SubscriberLimitReached(
+                    f"{self.max_subscribers} subscribers already connected"
+                )
+            new_path = path_id not in self._subscribers
+            self._subscribers.setdefault(path_id, set()).add(subscription)
+        if new_path:
+            self._subscriptions_changed()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription; safe to call more than once."""
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.path_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if subscriptions:
+                return
+            del self._subscribers[subscription.path_id]
+        self._subscriptions_changed()
+
+    def subscriber_count(self):
+        """Return the number of open subscriptions in this worker."""
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def publish(self, path_id, request_record):
+        """Publish a captured request to the subscribers of its path.
+
+        A no-op when nobody follows the path, in this worker or, for
+        backends that reach other workers and can tell (``has_subscribers``),
+        in any worker, so captures pay nothing for an idle broker.
+        """
+        if not self.backend.cross_process and path_id not in self._subscribers:
+            return
+        self._ensure_started()
+        has_subscribers = getattr(self.backend, "has_subscribers", None)
+        if has_subscribers is not None and not has_subscribers(path_id):
+            return
+        self.backend.publish(path_id, self.event_for(request_record))
+        self.published += 1
+
+    def event_for(self, request_record):
+        """Build the event announcing a captured request.
+
+        Bodies larger than ``body_limit`` are left out; they can be fetched
+        from the body endpoint.
+        """
+        include_body = (request_record.body_size or 0) <= self.body_limit
+        request = request_record.to_dict(include_body=include_body)
+        if not include_body:
+            request.update(body=None, body_encoding="omitted")
+        return {
+            "id": encode_cursor(request_record.timestamp, request["id"], "prev"),
+            "request": request,
+        }
+
+    def stats(self):
+        """Return subscriber and delivery counters for the metrics endpoint."""
+        with self._lock:
+            subscribers = self.subscriber_count()
+            paths = len(self._subscribers)
+        return {
+            "backend": type(self.backend).__name__,
+            "subscribers": subscribers,
+            "paths": paths,
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflowed": self.overflowed,
+            "rejected": self.rejected,
+        }
+
+    def _deliver(self, path_id, event):
+        """Hand an event to this worker's subscribers of a path."""
+        with self._lock:
+            subscriptions = list(self._subscribers.get(path_id, ()))
+        for subscription in subscriptions:
+            if subscription.push(event):
+                self.delivered += 1
+            elif subscription.overflowed:
+                self.overflowed += 1
+
+    def _subscriptions_changed(self):
+        """Tell a backend that supports it which paths are followed here."""
+        subscriptions_changed = getattr(self.backend, "subscriptions_changed", None)
+        if subscriptions_changed is None:
+            return
+        with self._lock:
+            paths = frozenset(self._subscribers)
+        try:
+            subscriptions_changed(paths)
+        except Exception as e:
+            logger.error("Announcing stream subscriptions failed", error=str(e))
+
+    def _ensure_started(self):
+        """Start the backend in this process if needed (see ``PerProcess``)."""
+        self._backend.get()
+
+    def _start_backend(self):
+        """Start the backend for this process's subscribers."""
+        self.backend.start(self._deliver)
+
+
+def get_capture_broker():
+    """Return the capture broker for the current app."""
+    return current_app.extensions["capture_broker"]
+
+
+def sse_event(event):
+    """Format a broker event as a Server-Sent Events message."""
+    return (
+        f"id: {event['id']}\nevent: request\n"
+        f"data: {json.dumps(event['request'], separators=(',', ':'))}\n\n"
+    )
+
+
+def sse_stream(subscription, backlog, live=True, heartbeat=15.0, max_duration=300.0):
+    """Yield SSE messages: ``backlog`` first, then live events.
+
+    Without ``live`` the stream ends after the backlog, so the client
+    reconnects for the rest of it. Live events for requests already in the
+    backlog are skipped. A comment
+    line is sent every ``heartbeat`` seconds without events. The stream ends
+    after ``max_duration`` seconds, or once the subscriber overflowed, and
+    the client reconnects with ``Last-Event-ID`` to pick up from there. The
+    subscription is closed when the stream ends or the client disconnects.
+    """
+    try:
+        # Reconnect quickly; the client resumes from its last event
+        yield "retry: 1000\n\n"
+        sent = set()
+        for event in backlog:
+            sent.add(event["request"]["id"])
+            yield sse_event(event)
+        if not live:
+            return
+
+        deadline = time.monotonic() + max_duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.get(timeout=min(heartbeat, remaining))
+            if event is not None:
+                if event["request"]["id"] not in sent:
+                    yield sse_event(event)
+            elif subscription.overflowed:
+                return
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        subscription.close()
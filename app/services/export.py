@@ -0,0 +1,431 @@
+"""Streaming bulk export of captured requests."""
+
+import csv
+import io
+import json
+import zlib
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.models.path import Path
+from app.models.request import Request, as_dict, serialize_body
+from app.models.request_body import RequestBody
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet", "arrow")
+# Formats written with pyarrow, which is an optional dependency
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+EXPORT_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Columns of exported records, in CSV order
+EXPORT_COLUMNS = [
+    "id",
+    "path_id",
+    "timestamp",
+    "method",
+    "content_type",
+    "charset",
+    "body_size",
+    "ip_address",
+    "user_agent",
+    "headers",
+    "query_params",
+    "body",
+    "body_encoding",
+]
+
+# Bytes collected before a chunk is handed to the WSGI server
+CHUNK_SIZE = 64 * 1024
+
+# Header and query parameter names given their own columnar column
+FLATTENED_KEYS = 20
+# Newest requests sampled to find the most common names
+KEY_SAMPLE_SIZE = 10000
+
+
+class ColumnarExportUnavailable(Exception):
+    """Raised for Parquet or Arrow exports when pyarrow is not installed."""
+
+
+def iter_export_records(
+    path, since=None, until=None, include_body=True, raw=False, batch_size=1000
+):
+    """Yield the requests of a path as export records, oldest first.
+
+    Rows are read through a server-side cursor ``batch_size`` at a time, with
+    their bodies joined in, so memory stays flat however many requests the
+    path has. Records are dictionaries with the ``EXPORT_COLUMNS`` keys; the
+    path is given by its public ``path_id``, so exports can be imported into
+    another instance. Without a path, the requests of every path are
+    exported. With ``raw``, timestamps are datetimes and bodies are bytes
+    (without ``body_encoding``), for typed formats. Must be consumed within
+    the application context.
+    """
+    requests = Request.__table__
+    bodies = RequestBody.__table__
+    paths = Path.__table__
+    columns = [
+        paths.c.path_id.label("public_path_id"),
+        requests.c.id,
+        requests.c.timestamp,
+        requests.c.method,
+        requests.c.content_type,
+        requests.c.charset,
+        requests.c.body_size,
+        requests.c.ip_address,
+        requests.c.user_agent,
+        requests.c.headers,
+        requests.c.query_params,
+        requests.c.body_digest,
+    ]
+    source = requests.join(paths, paths.c.id == requests.c.path_id)
+    if include_body:
+        columns += [
+            bodies.c.codec,
+            bodies.c.data,
+            bodies.c.segment,
+            bodies.c.segment_offset,
+            bodies.c.size,
+        ]
+        source = source.outerjoin(bodies, bodies.c.digest == requests.c.body_digest)
+
+    query = (
+        select(*columns)
+        .select_from(source)
+        .where(*_export_filters(path, since, until))
+        .order_by(requests.c.timestamp, requests.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    # Consecutive requests often share a body; decode it once for the run
+    last_body = None
+    for row in db.session.execute(query):
+        record = {
+            "id": row.id,
+            "path_id": row.public_path_id,
+            "timestamp": row.timestamp if raw else row.timestamp.isoformat(),
+            "method": row.method,
+            "content_type": row.content_type,
+            "charset": row.charset,
+            "body_size": row.body_size,
+            "ip_address": row.ip_address,
+            "user_agent": row.user_agent,
+            "headers": as_dict(row.headers),
+            "query_params": as_dict(row.query_params),
+        }
+        if include_body:
+            if last_body is None or last_body[:2] != (row.body_digest, row.charset):
+                body = None
+                if row.size is not None:
+                    body = RequestBody.read_stored(
+                        row.codec, row.data, row.segment, row.segment_offset, row.size
+                    )
+                last_body = (
+                    row.body_digest,
+                    row.charset,
+                    body if raw else serialize_body(body, row.charset),
+                )
+            if raw:
+                record["body"] = last_body[2]
+            else:
+                record["body"], record["body_encoding"] = last_body[2]
+        yield record
+
+
+def common_keys(path=None, since=None, until=None, limit=FLATTENED_KEYS):
+    """Return the most common header names and query parameter names.
+
+    Counted over the newest ``KEY_SAMPLE_SIZE`` requests of the export, so
+    finding them costs one bounded query. Returns two lists of at most
+    ``limit`` names, most common first.
+    """
+    requests = Request.__table__
+    query = (
+        select(requests.c.headers, requests.c.query_params)
+        .where(*_export_filters(path, since, until))
+        .order_by(requests.c.timestamp.desc())
+        .limit(KEY_SAMPLE_SIZE)
+    )
+    header_counts = Counter()
+    query_counts = Counter()
+    for headers, query_params in db.session.execute(query):
+        header_counts.update(as_dict(headers).keys())
+        query_counts.update(as_dict(query_params).keys())
+
+    def most_common(counts):
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [name for name, _ in ranked[:limit]]
+
+    return most_common(header_counts), most_common(query_counts)
+
+
+def columnar_batches(records, header_keys, query_keys, row_group_size=10000):
+    """Group records into column lists of ``row_group_size`` rows each.
+
+    Each batch maps column names to lists of values. The ``header_keys`` and
+    ``query_keys`` get a ``header.<name>`` and ``query.<name>`` column; the
+    complete headers and query parameters are kept as JSON text as well.
+    """
+    batch = None
+    for record in records:
+        if batch is None:
+            batch = {column: [] for column in record if column != "body_encoding"}
+            batch["headers"] = []
+            batch["query_params"] = []
+            for key in header_keys:
+                batch[f"header.{key}"] = []
+            for key in query_keys:
+                batch[f"query.{key}"] = []
+        headers = record["headers"]
+        query_params = record["query_params"]
+        for column, values in batch.items():
+            if column.startswith("header."):
+                values.append(_flat_value(headers.get(column[7:])))
+            elif column.startswith("query."):
+                values.append(_flat_value(query_params.get(column[6:])))
+            elif column in ("headers", "query_params"):
+                values.append(json.dumps(record[column]))
+            else:
+                values.append(record[column])
+        if len(batch["id"]) >= row_group_size:
+            yield batch
+            batch = None
+    if batch is not None:
+        yield batch
+
+
+def ndjson_chunks(records):
+    """Encode records as newline-delimited JSON, in chunks of about 64 KB."""
+    return _chunked(
+        json.dumps(record, separators=(",", ":")) + "\n" for record in records
+    )
+
+
+def csv_chunks(records, include_body=True):
+    """Encode records as CSV with a header row, in chunks of about 64 KB.
+
+    Headers and query parameters are JSON-encoded into one column each.
+    """
+    columns = EXPORT_COLUMNS if include_body else EXPORT_COLUMNS[:-2]
+
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for record in records:
+            record = dict(
+                record,
+                headers=json.dumps(record["headers"]),
+                query_params=json.dumps(record["query_params"]),
+            )
+            writer.writerow([record[column] for column in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    return _chunked(lines())
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of text chunks into a gzip stream on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def columnar_chunks(
+    path=None,
+    format="parquet",
+    since=None,
+    until=None,
+    include_body=True,
+    row_group_size=10000,
+    flattened_keys=FLATTENED_KEYS,
+):
+    """Return the bytes chunks of a Parquet file or Arrow IPC stream.
+
+    Requests are written one row group (one record batch for Arrow) of
+    ``row_group_size`` rows at a time, and each is handed out as a chunk as
+    soon as it is encoded. Raises ``ColumnarExportUnavailable`` right away,
+    before anything is read, when pyarrow is not installed.
+    """
+    if format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format: {format}")
+    pa = _pyarrow()
+    header_keys, query_keys = common_keys(path, since, until, limit=flattened_keys)
+    schema = _columnar_schema(pa, header_keys, query_keys, include_body)
+    records = iter_export_records(
+        path, since=since, until=until, include_body=include_body, raw=True
+    )
+    batches = columnar_batches(records, header_keys, query_keys, row_group_size)
+
+    def chunks():
+        sink = _ChunkSink()
+        if format == "parquet":
+            writer = pa.parquet.ParquetWriter(sink, schema)
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        for batch in batches:
+            writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    return chunks()
+
+
+def export_chunks(
+    path=None,
+    format="ndjson",
+    since=None,
+    until=None,
+    include_body=True,
+    row_group_size=None,
+):
+    """Return the chunks exporting the requests of a path, or of every path.
+
+    Chunks are text for NDJSON and CSV, and bytes for the columnar formats.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    if format in COLUMNAR_FORMATS:
+        return columnar_chunks(
+            path,
+            format=format,
+            since=since,
+            until=until,
+            include_body=include_body,
+            row_group_size=row_group_size
+            or current_app.config["EXPORT_ROW_GROUP_SIZE"],
+        )
+    records = iter_export_records(
+        path, since=since, until=until, include_body=include_body
+    )
+    if format == "csv":
+        return csv_chunks(records, include_body=include_body)
+    return ndjson_chunks(records)
+
+
+def export_path(path_id, format="ndjson", since=None, until=None, include_body=True):
+    """Return the chunks exporting a path, or None if it does not exist."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    path = Path.find_by_path_id(path_id)
+    if path is None:
+        return None
+    return export_chunks(
+        path, format=format, since=since, until=until, include_body=include_body
+    )
+
+
+def _chunked(pieces):
+    """Join small strings into chunks of at least ``CHUNK_SIZE`` characters."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _export_filters(path, since, until):
+    """Return the WHERE criteria selecting the requests to export."""
+    requests = Request.__table__
+    criteria = []
+    if path is not None:
+        criteria.append(requests.c.path_id == path.id)
+    if since is not None:
+        criteria.append(requests.c.timestamp >= since)
+    if until is not None:
+        criteria.append(requests.c.timestamp < until)
+    return criteria
+
+
+def _flat_value(value):
+    """Return a header or query value as text for a flattened column."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _pyarrow():
+    """Import pyarrow, which only the columnar formats need."""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ColumnarExportUnavailable(
+            "Parquet and Arrow exports require pyarrow (pip install pyarrow)"
+        ) from e
+    return pyarrow
+
+
+def _columnar_schema(pa, header_keys, query_keys, include_body):
+    """Return the Arrow schema of a columnar export."""
+    fields = [
+        pa.field("id", pa.string()),
+        pa.field("path_id", pa.string()),
+        pa.field("timestamp", pa.timestamp("us", tz="UTC")),
+        pa.field("method", pa.string()),
+        pa.field("content_type", pa.string()),
+        pa.field("charset", pa.string()),
+        pa.field("body_size", pa.int64()),
+        pa.field("ip_address", pa.string()),
+        pa.field("user_agent", pa.string()),
+        pa.field("headers", pa.string()),
+        pa.field("query_params", pa.string()),
+    ]
+    if include_body:
+        fields.append(pa.field("body", pa.binary()))
+    fields += [pa.field(f"header.{key}", pa.string()) for key in header_keys]
+    fields += [pa.field(f"query.{key}", pa.string()) for key in query_keys]
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what pyarrow writes, to stream it out."""
+
+    def __init__(self):
+        """Initialize an empty sink."""
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        """Return True: the sink accepts writes."""
+        return True
+
+    def write(self, data):
+        """Collect written bytes."""
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        """Return the number of bytes written so far."""
+        return self._position
+
+    def drain(self):
+        """Return and forget the bytes written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
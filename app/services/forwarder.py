@@ -0,0 +1,303 @@
+"""Forwarding of captured webhook requests to the upstream of their path."""
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+import structlog
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError, ReadTimeoutError
+
+from app.services.replay import HOP_BY_HOP_HEADERS
+from app.utils.process import PerProcess
+
+logger = structlog.get_logger()
+
+# Outcome of forwarding one request; status_code, headers and body are None
+# when no response was received, in which case error says why
+UpstreamResult = namedtuple(
+    "UpstreamResult", ["status_code", "headers", "body", "latency_ms", "error"]
+)
+
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECTION = "connection_error"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+ERROR_TOO_LARGE = "response_too_large"
+
+
+class CircuitBreaker:
+    """Stops calls to an upstream after consecutive failures.
+
+    While closed, calls go through. ``threshold`` failures in a row open the
+    breaker, which then rejects calls for ``reset_timeout`` seconds; after
+    that one trial call is let through (half-open), closing the breaker
+    again on success and reopening it on failure.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        """Initialize a closed breaker."""
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        """Get "closed", "open" or "half_open"."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial or self.retry_after() == 0:
+                return "half_open"
+            return "open"
+
+    def retry_after(self):
+        """Return the seconds until an open breaker lets a trial call through."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """Return whether a call may go through now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and self.retry_after() == 0:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Close the breaker after a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """Count a failed call, opening the breaker if needed."""
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                if self._opened_at is None or self._trial:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+class Forwarder:
+    """Relays captured requests to upstreams over pooled connections.
+
+    Requests are sent from a pool of ``max_workers`` threads, so the request
+    thread can commit the capture meanwhile. One HTTP session keeps up to
+    ``pool_size`` persistent connections per upstream, and each upstream
+    (scheme, host and port) has its own ``CircuitBreaker``. Responses count
+    as failures for the breaker when the upstream answers 5xx, times out
+    (``connect_timeout``, then ``timeout`` between bytes of the response)
+    or cannot be reached. Response bodies over ``max_response_bytes`` are
+    not read further and are reported as an error.
+    """
+
+    def __init__(
+        self,
+        max_workers=32,
+        pool_size=32,
+        timeout=10.0,
+        connect_timeout=3.0,
+        breaker_threshold=5,
+        breaker_reset=30.0,
+        max_response_bytes=16 * 1024 * 1024,
+    ):
+        """Initialize the forwarder; its threads start on first use."""
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.max_response_bytes = max_response_bytes
+
+        self._http = requests.Session()
+        # Not a browser: no cookies between senders, no proxies or .netrc
+        self._http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._http.trust_env = False
+        # Connection pools of the 16 most recently used upstreams are kept
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._executor = PerProcess(self._start_executor)
+        self._breakers = {}
+
+        self.forwarded = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a forwarder configured from the application settings."""
+        return cls(
+            max_workers=app.config["FORWARD_MAX_WORKERS"],
+            pool_size=app.config["FORWARD_POOL_SIZE"],
+            timeout=app.config["FORWARD_TIMEOUT"],
+            connect_timeout=app.config["FORWARD_CONNECT_TIMEOUT"],
+            breaker_threshold=app.config["FORWARD_BREAKER_THRESHOLD"],
+            breaker_reset=app.config["FORWARD_BREAKER_RESET"],
+            max_response_bytes=app.config["FORWARD_MAX_RESPONSE_BYTES"],
+        )
+
+    @staticmethod
+    def build_delivery(flask_request, forward_url):
+        """Rebuild an incoming request for the upstream at ``forward_url``.
+
+        Must be called on the request thread. The query string is appended
+        to that of ``forward_url``; hop-by-hop headers are dropped and the
+        usual X-Forwarded headers added.
+        """
+        url = forward_url
+        if flask_request.query_string:
+            separator = "&" if urlsplit(forward_url).query else "?"
+            url += separator + flask_request.query_string.decode("latin-1")
+
+        headers = {
+            key: value
+            for key, value in flask_request.headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS
+        }
+        forwarded_for = flask_request.headers.get("X-Forwarded-For")
+        remote_addr = flask_request.remote_addr or ""
+        headers["X-Forwarded-For"] = (
+            f"{forwarded_for}, {remote_addr}" if forwarded_for else remote_addr
+        )
+        headers["X-Forwarded-Proto"] = flask_request.scheme
+        headers["X-Forwarded-Host"] = flask_request.host
+        return {
+            "method": flask_request.method,
+            "url": url,
+            "headers": headers,
+            "data": flask_request.get_data(),
+        }
+
+    def submit(self, delivery):
+        """Start forwarding in the background; returns a future UpstreamResult."""
+        return self._executor.get().submit(self.forward, delivery)
+
+    def result(self, pending):
+        """Wait for a future from ``submit`` and return its UpstreamResult.
+
+        Waits at most ``connect_timeout`` plus ``timeout`` seconds, what a
+        forward takes once started, so a saturated pool never blocks the
+        request thread longer; then a timeout result is returned and the
+        forward is dropped if it has not started yet.
+        """
+        wait = self.connect_timeout + self.timeout
+        try:
+            return pending.result(timeout=wait)
+        except FutureTimeoutError:
+            pending.cancel()
+            with self._lock:
+                self.abandoned += 1
+            return UpstreamResult(None, None, None, int(wait * 1000), ERROR_TIMEOUT)
+
+    def forward(self, delivery):
+        """Send a delivery to its upstream and return the UpstreamResult."""
+        breaker = self.breaker(delivery["url"])
+        if not breaker.allow():
+            return UpstreamResult(None, None, None, 0, ERROR_CIRCUIT_OPEN)
+
+        started = time.monotonic()
+        error = None
+        response = None
+        try:
+            response = self._http.request(
+                timeout=(self.connect_timeout, self.timeout),
+                allow_redirects=False,
+                stream=True,
+                **delivery,
+            )
+            # Passed through as sent, compressed or not; reading it all
+            # returns the connection to the pool. One byte past the limit
+            # tells a body at the limit from a larger one
+            body = response.raw.read(self.max_response_bytes + 1, decode_content=False)
+            if len(body) > self.max_response_bytes:
+                error = ERROR_TOO_LARGE
+                logger.warning(
+                    "Upstream response too large",
+                    url=delivery["url"],
+                    limit=self.max_response_bytes,
+                )
+        except (requests.Timeout, ReadTimeoutError):
+            error = ERROR_TIMEOUT
+        except (requests.RequestException, HTTPError) as e:
+            error = ERROR_CONNECTION
+            logger.warning("Upstream request failed", url=delivery["url"], error=str(e))
+        finally:
+            if response is not None:
+                response.close()
+        latency_ms = int((time.monotonic() - started) * 1000)
+
+        if error is not None or response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        with self._lock:
+            self.forwarded += 1
+            if error is not None:
+                self.failed += 1
+
+        if error is not None:
+            return UpstreamResult(None, None, None, latency_ms, error)
+        headers = [
+            (key, value)
+            for key, value in response.headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS
+        ]
+        return UpstreamResult(response.status_code, headers, body, latency_ms, None)
+
+    def breaker(self, url):
+        """Return the circuit breaker of the upstream serving ``url``."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(
+                    self.breaker_threshold, self.breaker_reset
+                )
+        return breaker
+
+    def stats(self):
+        """Return forwarding counters for the metrics endpoint."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+            forwarded, failed, abandoned = self.forwarded, self.failed, self.abandoned
+        states = [breaker.state for breaker in breakers]
+        return {
+            "forwarded": forwarded,
+            "failed": failed,
+            "abandoned": abandoned,
+            "upstreams": len(breakers),
+            "open_circuits": sum(1 for state in states if state != "closed"),
+            "rejected": sum(breaker.rejected for breaker in breakers),
+        }
+
+    def _start_executor(self):
+        """Create the thread pool of this process (see ``PerProcess``)."""
+        return ThreadPoolExecutor(self.max_workers, thread_name_prefix="forward")
+
+
+def get_forwarder():
+    """Return the forwarder for the current app."""
+    return current_app.extensions["forwarder"]
@@ -0,0 +1,171 @@
+"""Bulk import of captured requests from NDJSON exports."""
+
+import json
+import time
+import uuid
+
+import structlog
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.models.path import Path
+from app.models.request import Request, deserialize_body
+from app.models.request_body import RequestBody
+from app.utils.helpers import parse_timestamp
+
+logger = structlog.get_logger()
+
+# Request ids looked up per query when skipping already imported requests
+LOOKUP_SIZE = 1000
+
+
+class RequestImporter:
+    """Loads requests from NDJSON lines, one committed batch at a time.
+
+    Lines are records in the NDJSON export format. Paths are matched by
+    their public ``path_id`` and created when missing. Each batch of
+    ``batch_size`` requests is stored with ``Request.bulk_insert``, through
+    COPY on PostgreSQL, so counters, body references and rollups stay
+    consistent. Requests whose id already exists are skipped, so an
+    interrupted import can be run again from the start. Lines that are not
+    valid records are counted and skipped.
+    """
+
+    def __init__(self, batch_size=5000, progress=None):
+        """Initialize an importer; ``progress(imported)`` runs after each batch."""
+        self.batch_size = batch_size
+        self.progress = progress
+        self._path_pks = {}
+
+        self.read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.paths_created = 0
+
+    def run(self, lines):
+        """Import every line; returns the run summary.
+
+        Must be called within an application context.
+        """
+        started = time.monotonic()
+        batch = []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            self.read += 1
+            try:
+                batch.append(self._parse(line))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.invalid += 1
+                logger.warning(
+                    "Skipping invalid import line", line=number, error=str(e)
+                )
+                continue
+            if len(batch) >= self.batch_size:
+                self._load(batch)
+                batch = []
+        self._load(batch)
+        seconds = time.monotonic() - started
+
+        result = {
+            "read": self.read,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+            "paths_created": self.paths_created,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.imported / seconds, 1) if seconds else 0.0,
+        }
+        logger.info("Request import finished", **result)
+        return result
+
+    def _parse(self, line):
+        """Turn one NDJSON record into a row for ``Request.bulk_insert``.
+
+        The body is kept raw under ``body`` until the row is loaded.
+        """
+        record = json.loads(line)
+        timestamp = parse_timestamp(record["timestamp"])
+        if timestamp is None:
+            raise ValueError("timestamp is required")
+        body = deserialize_body(
+            record.get("body"),
+            record.get("body_encoding", "text"),
+            record.get("charset"),
+        )
+        method = record["method"]
+        if not method or len(method) > 10:
+            raise ValueError(f"Invalid method: {method}")
+        body_size = record.get("body_size")
+        row = {
+            "id": record.get("id") or str(uuid.uuid4()),
+            "path_id": None,
+            "method": method,
+            "headers": record.get("headers") or {},
+            "body_digest": None,
+            "body_size": int(body_size if body_size is not None else len(body or b"")),
+            "content_type": record.get("content_type"),
+            "charset": record.get("charset"),
+            "query_params": record.get("query_params") or {},
+            "ip_address": record.get("ip_address"),
+            "user_agent": record.get("user_agent"),
+            "timestamp": timestamp,
+            "body": body or None,
+        }
+        # Resolved last, so invalid records never create a path
+        row["path_id"] = self._path_pk(record["path_id"])
+        return row
+
+    def _path_pk(self, path_id):
+        """Return the primary key of a path, creating the path if needed."""
+        if not isinstance(path_id, str) or not path_id:
+            raise ValueError("path_id is required")
+        path_pk = self._path_pks.get(path_id)
+        if path_pk is None:
+            ref = Path.resolve(path_id)
+            if ref is None:
+                ref = Path.create_new_path(path_id=path_id)
+                self.paths_created += 1
+            path_pk = self._path_pks[path_id] = ref.id
+        return path_pk
+
+    def _load(self, batch):
+        """Store a batch, leaving out requests that already exist."""
+        if not batch:
+            return
+
+        # The last record wins when an id repeats within the batch
+        rows = {row["id"]: row for row in batch}
+        table = Request.__table__
+        ids = list(rows)
+        for start in range(0, len(ids), LOOKUP_SIZE):
+            for request_id in db.session.execute(
+                select(table.c.id).where(
+                    table.c.id.in_(ids[start : start + LOOKUP_SIZE])
+                )
+            ).scalars():
+                del rows[request_id]
+        self.skipped += len(batch) - len(rows)
+        if not rows:
+            return
+
+        partitions = current_app.extensions.get("request_partitions")
+        if partitions is not None:
+            # Old requests go straight to their partition, not the default one
+            partitions.ensure(since=min(row["timestamp"] for row in rows.values()))
+
+        # Consecutive requests often share a body; prepare it once for the run
+        last_body = None
+        for row in rows.values():
+            raw = row["body"]
+            if raw is not None:
+                if last_body is None or last_body[0] != raw:
+                    last_body = (raw, RequestBody.prepare(raw))
+                row["body"] = last_body[1]
+                row["body_digest"] = last_body[1]["digest"]
+
+        self.imported += Request.bulk_insert(list(rows.values()), copy=True)
+        if self.progress is not None:
+            self.progress(self.imported)
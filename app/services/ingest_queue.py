@@ -0,0 +1,293 @@
+"""Write-behind ingest queue for captured webhook requests."""
+
+import atexit
+import queue
+import threading
+import time
+
+import structlog
+from flask import current_app
+
+from app import db
+from app.models.request import Request
+from app.utils.process import PerProcess
+
+logger = structlog.get_logger()
+
+DURABILITY_ENQUEUE = "enqueue"
+DURABILITY_FLUSH = "flush"
+
+
+class IngestError(Exception):
+    """Raised when a queued request could not be made durable."""
+
+
+class _PendingRow:
+    """A captured request waiting in the queue."""
+
+    __slots__ = ("row", "done", "error", "claimed", "withdrawn")
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+        self.claimed = False  # Taken by the writer; set under _claim_lock
+        self.withdrawn = False  # Given up by put; set under _claim_lock
+
+
+class IngestQueue:
+    """Per-worker bounded queue flushed to the database in batches.
+
+    Captured requests are appended to an in-memory queue and written by a
+    background thread using one multi-row INSERT per batch. A batch is flushed
+    as soon as ``batch_size`` rows are pending or ``flush_interval`` seconds
+    after its first row arrived, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        app,
+        maxsize=10000,
+        batch_size=500,
+        flush_interval=0.05,
+        durability=DURABILITY_FLUSH,
+        flush_timeout=5.0,
+    ):
+        """Initialize the queue; the writer thread starts on first use."""
+        if durability not in (DURABILITY_ENQUEUE, DURABILITY_FLUSH):
+            raise ValueError(f"Unknown ingest durability: {durability}")
+
+        self.app = app
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.flush_timeout = flush_timeout
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._flush_lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = PerProcess(self._start_writer, alive=threading.Thread.is_alive)
+        self._exit_hook = False
+
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._overflow = 0
+        self._flushed_rows = 0
+        self._flushed_batches = 0
+        self._failed_rows = 0
+        self._withdrawn = 0
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a queue configured from the application settings."""
+        return cls(
+            app,
+            maxsize=app.config["INGEST_QUEUE_MAXSIZE"],
+            batch_size=app.config["INGEST_BATCH_SIZE"],
+            flush_interval=app.config["INGEST_FLUSH_INTERVAL"],
+            durability=app.config["INGEST_DURABILITY"],
+            flush_timeout=app.config["INGEST_FLUSH_TIMEOUT"],
+        )
+
+    def put(self, request_record):
+        """Queue a built Request for writing.
+
+        Returns once the request is queued, or once its batch has been
+        committed when durability is ``flush``. If the queue is full the row
+        is written synchronously instead, so bursts degrade to the regular
+        one-commit-per-request path rather than dropping data.
+
+        Returns False when the commit was not confirmed within
+        ``flush_timeout`` but the row was already being written, so it may
+        still be stored; True otherwise. A row the writer had not taken yet
+        is withdrawn from the queue before ``IngestError`` is raised, so a
+        sender retrying after the error does not store it twice.
+        """
+        self._ensure_writer()
+        pending = _PendingRow(request_record.to_row())
+
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._stats_lock:
+                self._overflow += 1
+            logger.warning("Ingest queue full, writing synchronously")
+            Request.bulk_insert([pending.row])
+            return True
+
+        with self._stats_lock:
+            self._enqueued += 1
+
+        if self.durability == DURABILITY_FLUSH:
+            if not pending.done.wait(self.flush_timeout):
+                with self._claim_lock:
+                    pending.withdrawn = not pending.claimed
+                if pending.withdrawn:
+                    with self._stats_lock:
+                        self._withdrawn += 1
+                    raise IngestError("Timed out waiting for batch commit")
+                logger.warning(
+                    "Ingest batch commit not confirmed in time",
+                    request_id=pending.row.get("id"),
+                )
+                return False
+            if pending.error is not None:
+                raise IngestError(str(pending.error))
+        return True
+
+    def flush(self):
+        """Write every pending row now and return how many were written."""
+        written = 0
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the writer thread after flushing pending rows."""
+        self._stop.set()
+        thread = self._writer.value
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """Return queue depth and flush metrics."""
+        with self._stats_lock:
+            avg_flush_ms = (
+                self._total_flush_ms / self._flushed_batches
+                if self._flushed_batches
+                else 0.0
+            )
+            return {
+                "durability": self.durability,
+                "queue_depth": self._queue.qsize(),
+                "queue_maxsize": self.maxsize,
+                "enqueued": self._enqueued,
+                "overflow": self._overflow,
+                "flushed_rows": self._flushed_rows,
+                "flushed_batches": self._flushed_batches,
+                "failed_rows": self._failed_rows,
+                "withdrawn": self._withdrawn,
+                "last_batch_size": self._last_batch_size,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "avg_flush_ms": round(avg_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+            }
+
+    def _ensure_writer(self):
+        """Start the writer thread in this process if it is not running."""
+        self._writer.get()
+
+    def _start_writer(self):
+        """Start a writer thread for this process (see ``PerProcess``)."""
+        self._stop.clear()
+        thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        thread.start()
+        if not self._exit_hook:
+            atexit.register(self.stop)
+            self._exit_hook = True
+        return thread
+
+    def _run(self):
+        """Writer thread loop."""
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def _drain(self, block):
+        """Collect up to ``batch_size`` pending rows.
+
+        When blocking, waits up to one poll period for the first row and then
+        up to ``flush_interval`` for the batch to fill.
+        """
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=0.5))
+            else:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic() if block else 0
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Write a batch in one transaction, isolating bad rows on failure."""
+        with self._claim_lock:
+            batch = [pending for pending in batch if not pending.withdrawn]
+            for pending in batch:
+                pending.claimed = True
+        if not batch:
+            return 0
+
+        with self._flush_lock, self.app.app_context():
+            started = time.perf_counter()
+            try:
+                Request.bulk_insert([pending.row for pending in batch])
+                failed = []
+            except Exception as e:
+                db.session.rollback()
+                logger.error(
+                    "Ingest batch failed, retrying rows individually",
+                    batch_size=len(batch),
+                    error=str(e),
+                )
+                failed = self._write_individually(batch)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                db.session.remove()
+
+        for pending in batch:
+            pending.done.set()
+
+        written = len(batch) - len(failed)
+        with self._stats_lock:
+            self._flushed_rows += written
+            self._flushed_batches += 1
+            self._failed_rows += len(failed)
+            self._last_batch_size = len(batch)
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+        return written
+
+    def _write_individually(self, batch):
+        """Write rows one by one and return the ones that still fail."""
+        failed = []
+        for pending in batch:
+            try:
+                Request.bulk_insert([pending.row])
+            except Exception as e:
+                db.session.rollback()
+                pending.error = e
+                failed.append(pending)
+                logger.error(
+                    "Dropping captured request after failed write",
+                    request_id=pending.row.get("id"),
+                    error=str(e),
+                )
+        return failed
+
+
+def get_ingest_queue():
+    """Return the ingest queue for the current app, or None in sync mode."""
+    return current_app.extensions.get("ingest_queue")
@@ -0,0 +1,340 @@
+"""Daily or weekly range partitions of the requests table (PostgreSQL only)."""
+
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from app import db
+from app.models.path import Path
+from app.models.request import Request
+from app.models.request_body import RequestBody
+
+logger = structlog.get_logger()
+
+Partition = namedtuple("Partition", ["name", "start", "end"])
+
+GRANULARITIES = {"day": timedelta(days=1), "week": timedelta(weeks=1)}
+DEFAULT_PARTITION = "requests_default"
+UNPARTITIONED_TABLE = "requests_unpartitioned"
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def parse_bound(expression):
+    """Return (start, end) of a range partition bound, or None for DEFAULT."""
+    match = BOUND_PATTERN.search(expression or "")
+    if match is None:
+        return None
+    return tuple(datetime.fromisoformat(value) for value in match.groups())
+
+
+def _literal(moment):
+    """Render a partition boundary as an SQL timestamp literal."""
+    return f"'{moment:%Y-%m-%d %H:%M:%S}'"
+
+
+class RequestPartitions:
+    """Range partitions of ``requests`` by timestamp, one per day or week.
+
+    Rows outside every partition land in a DEFAULT partition, so ingest never
+    fails when pre-creation falls behind; ``ensure`` moves them into their
+    partition once it is created. Retention drops whole partitions instead
+    of deleting their rows, adjusting path counters and body references from
+    one aggregate scan of each partition.
+
+    DDL on the parent table waits at most ``lock_timeout`` for its lock; a
+    partition that cannot be dropped is retried on the next run.
+    """
+
+    def __init__(self, granularity="day", ahead=7, lock_timeout="5s"):
+        """Initialize with the partition size and how many to create ahead."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown partition granularity: {granularity}")
+        self.granularity = granularity
+        self.step = GRANULARITIES[granularity]
+        self.ahead = ahead
+        self.lock_timeout = lock_timeout
+
+    @classmethod
+    def from_config(cls, app):
+        """Create partitioning configured from the application settings."""
+        return cls(
+            app.config["REQUESTS_PARTITIONING"],
+            ahead=app.config["REQUESTS_PARTITIONS_AHEAD"],
+        )
+
+    def floor(self, moment):
+        """Return the start of the partition containing ``moment``."""
+        start = datetime(moment.year, moment.month, moment.day)
+        if self.granularity == "week":
+            start -= timedelta(days=start.weekday())
+        return start
+
+    def partition_name(self, start):
+        """Return the table name of the partition starting at ``start``."""
+        return f"requests_p{start:%Y%m%d}"
+
+    def is_partitioned(self):
+        """Return whether the requests table is partitioned."""
+        return db.session.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('requests'))"
+            )
+        ).scalar()
+
+    def partitions(self):
+        """Return the range partitions of requests, oldest first."""
+        rows = db.session.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass('requests')"
+            )
+        ).all()
+        partitions = []
+        for name, expression in rows:
+            bound = parse_bound(expression)
+            if bound is not None:
+                partitions.append(Partition(name, *bound))
+        return sorted(partitions, key=lambda partition: partition.start)
+
+    def missing(self, existing, now=None, since=None):
+        """Return the (start, end) ranges to create, given existing partitions.
+
+        Covers ``since`` (default: now) up to ``ahead`` partitions past now.
+        Ranges overlapping an existing partition, e.g. after switching from
+        days to weeks, are skipped.
+        """
+        now = now or datetime.utcnow()
+        start = self.floor(since or now)
+        last = self.floor(now) + self.step * self.ahead
+        ranges = []
+        while start <= last:
+            end = self.floor(start + self.step)
+            if not any(p.start < end and start < p.end for p in existing):
+                ranges.append((start, end))
+            start = end
+        return ranges
+
+    def ensure(self, now=None, since=None):
+        """Create missing partitions; returns the names of those created.
+
+        A partition that cannot be created is logged and retried on the next
+        call, so retention runs and imports carry on; its rows stay in the
+        DEFAULT partition meanwhile.
+        """
+        created = []
+        for start, end in self.missing(self.partitions(), now=now, since=since):
+            name = self.partition_name(start)
+            try:
+                self._create(start, end)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.warning(
+                    "Request partition not created, will retry",
+                    partition=name,
+                    error=str(e),
+                )
+                continue
+            created.append(name)
+        if created:
+            logger.info("Request partitions created", partitions=created)
+        return created
+
+    def drop_before(self, cutoff):
+        """Drop partitions holding only requests older than ``cutoff``.
+
+        Returns the number of requests dropped.
+        """
+        dropped = 0
+        for partition in self.partitions():
+            if partition.end > cutoff:
+                break
+            try:
+                dropped += self._drop(partition)
+            except OperationalError as e:
+                db.session.rollback()
+                logger.warning(
+                    "Request partition busy, will retry",
+                    partition=partition.name,
+                    error=str(e),
+                )
+        return dropped
+
+    def convert(self, batch_size=5000):
+        """Turn an unpartitioned requests table into a partitioned one.
+
+        The table is renamed and an empty partitioned ``requests`` takes its
+        place in one short transaction, so ingest carries on into the new
+        table. Existing rows are then copied over in committed batches;
+        listings miss the rows not yet copied until this returns. Returns the
+        number of rows copied.
+        """
+        if self.is_partitioned():
+            return 0
+
+        session = db.session
+        session.execute(text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'"))
+        session.execute(text(f"ALTER TABLE requests RENAME TO {UNPARTITIONED_TABLE}"))
+        # Index names are schema-wide, and the new table reuses them
+        for (index_name,) in session.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :table"),
+            {"table": UNPARTITIONED_TABLE},
+        ).all():
+            session.execute(
+                text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_old"')
+            )
+        session.execute(
+            text(
+                f"CREATE TABLE requests (LIKE {UNPARTITIONED_TABLE} "
+                "INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                'PARTITION BY RANGE ("timestamp")'
+            )
+        )
+        # The partition key must be part of the primary key
+        session.execute(
+            text(
+                "ALTER TABLE requests ADD CONSTRAINT requests_pkey "
+                'PRIMARY KEY (id, "timestamp")'
+            )
+        )
+        session.execute(
+            text(
+                "ALTER TABLE requests ADD CONSTRAINT requests_path_id_fkey "
+                "FOREIGN KEY (path_id) REFERENCES paths (id)"
+            )
+        )
+        for index in Request.__table__.indexes:
+            index.create(session.connection())
+        session.execute(
+            text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF requests DEFAULT")
+        )
+        session.commit()
+
+        oldest = session.execute(
+            text(f'SELECT MIN("timestamp") FROM {UNPARTITIONED_TABLE}')
+        ).scalar()
+        self.ensure(since=oldest)
+
+        copied = 0
+        last_id = ""
+        while True:
+            ids = (
+                session.execute(
+                    text(
+                        f"SELECT id FROM {UNPARTITIONED_TABLE} WHERE id > :last_id "
+                        "ORDER BY id LIMIT :batch_size"
+                    ),
+                    {"last_id": last_id, "batch_size": batch_size},
+                )
+                .scalars()
+                .all()
+            )
+            if not ids:
+                break
+
+            batch = {"last_id": last_id, "upto": ids[-1]}
+            # Paths deleted since the rename took only the rows of the new
+            # table with them: skip the rest and drop their body references
+            RequestBody.release(
+                dict(
+                    session.execute(
+                        text(
+                            "SELECT r.body_digest, COUNT(*) "
+                            f"FROM {UNPARTITIONED_TABLE} r "
+                            "WHERE r.id > :last_id AND r.id <= :upto "
+                            "AND r.body_digest IS NOT NULL AND NOT EXISTS "
+                            "(SELECT 1 FROM paths WHERE paths.id = r.path_id) "
+                            "GROUP BY r.body_digest"
+                        ),
+                        batch,
+                    ).all()
+                )
+            )
+            copied += session.execute(
+                text(
+                    f"INSERT INTO requests SELECT r.* FROM {UNPARTITIONED_TABLE} r "
+                    "JOIN paths ON paths.id = r.path_id "
+                    "WHERE r.id > :last_id AND r.id <= :upto"
+                ),
+                batch,
+            ).rowcount
+            session.commit()
+            last_id = ids[-1]
+
+        session.execute(text(f"DROP TABLE {UNPARTITIONED_TABLE}"))
+        session.commit()
+        RequestBody.collect_garbage()
+        logger.info("Requests table partitioned", copied=copied)
+        return copied
+
+    def _create(self, start, end):
+        """Create and attach one partition, moving its rows out of DEFAULT."""
+        name = self.partition_name(start)
+        bounds = f'"timestamp" >= {_literal(start)} AND "timestamp" < {_literal(end)}'
+
+        session = db.session
+        session.execute(text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'"))
+        # ATTACH scans DEFAULT for rows of the new range and fails on any;
+        # holding its lock from the start keeps rows from landing there
+        # between the move below and the ATTACH
+        session.execute(
+            text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE")
+        )
+        session.execute(
+            text(
+                f"CREATE TABLE {name} "
+                "(LIKE requests INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        session.execute(
+            text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {bounds}")
+        )
+        session.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {bounds}"))
+        # Matching indexes and the primary key are built by ATTACH
+        session.execute(
+            text(
+                f"ALTER TABLE requests ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+            )
+        )
+        session.commit()
+
+    def _drop(self, partition):
+        """Detach and drop one partition; returns its number of requests."""
+        session = db.session
+        session.execute(text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'"))
+
+        totals = {}
+        count = 0
+        for path_pk, path_count, body_bytes in session.execute(
+            text(
+                f"SELECT path_id, COUNT(*), SUM(body_size) FROM {partition.name} "
+                "GROUP BY path_id"
+            )
+        ).all():
+            totals[path_pk] = (-path_count, -(body_bytes or 0), None)
+            count += path_count
+        references = dict(
+            session.execute(
+                text(
+                    f"SELECT body_digest, COUNT(*) FROM {partition.name} "
+                    "WHERE body_digest IS NOT NULL GROUP BY body_digest"
+                )
+            ).all()
+        )
+
+        session.execute(text(f"ALTER TABLE requests DETACH PARTITION {partition.name}"))
+        session.execute(text(f"DROP TABLE {partition.name}"))
+        Path.add_to_counters(totals)
+        RequestBody.release(references)
+        session.commit()
+
+        logger.info(
+            "Request partition dropped", partition=partition.name, requests=count
+        )
+        return count
@@ -0,0 +1,162 @@
+"""Per-worker filter that rejects unknown webhook paths without a query."""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import structlog
+
+from app.models.path import Path
+from app.utils.bloom import BloomFilter
+from app.utils.cache import LRUCache
+
+logger = structlog.get_logger()
+
+# Margin applied to incremental refreshes so paths committed late, or by a
+# worker whose clock runs slightly behind ours, are still picked up
+CLOCK_SKEW = timedelta(seconds=5)
+
+
+class PathFilter:
+    """Bloom filter of existing path_ids plus a short-TTL negative cache.
+
+    The filter is built from the paths table on first use in each worker,
+    refreshed incrementally with newly created paths every
+    ``refresh_interval`` seconds, and rebuilt from scratch every
+    ``rebuild_interval`` seconds so deleted paths eventually drop out.
+    A path created by another worker can therefore be rejected here for at
+    most ``refresh_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        error_rate=0.01,
+        refresh_interval=1.0,
+        rebuild_interval=300.0,
+        negative_cache_size=10000,
+        negative_cache_ttl=2.0,
+        clock=time.monotonic,
+    ):
+        """Initialize an empty filter; it is built on first use."""
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.negative_cache = LRUCache(
+            maxsize=negative_cache_size, ttl=negative_cache_ttl, clock=clock
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._refreshed_since = None
+
+        self.bloom_rejections = 0
+        self.negative_hits = 0
+        self.db_misses = 0
+        self.rebuilds = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a filter configured from the application settings."""
+        return cls(
+            error_rate=app.config["PATH_FILTER_ERROR_RATE"],
+            refresh_interval=app.config["PATH_FILTER_REFRESH_INTERVAL"],
+            rebuild_interval=app.config["PATH_FILTER_REBUILD_INTERVAL"],
+            negative_cache_size=app.config["PATH_NEGATIVE_CACHE_SIZE"],
+            negative_cache_ttl=app.config["PATH_NEGATIVE_CACHE_TTL"],
+        )
+
+    def rejects(self, path_id):
+        """Return True if path_id is known not to exist."""
+        if self.negative_cache.get(path_id) is not None:
+            self.negative_hits += 1
+            return True
+
+        bloom = self._current_bloom()
+        if bloom is not None and not bloom.might_contain(path_id):
+            self.bloom_rejections += 1
+            return True
+        return False
+
+    def remember_missing(self, path_id):
+        """Record a path_id that the database reported as missing."""
+        self.db_misses += 1
+        self.negative_cache.set(path_id, True)
+
+    def add(self, path_id):
+        """Record a newly created path."""
+        self.negative_cache.invalidate(path_id)
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(path_id)
+
+    def discard(self, path_id):
+        """Record a deleted path.
+
+        Bloom filters cannot remove items, so the path stays in the filter
+        until the next rebuild; the negative cache covers it until then.
+        """
+        self.negative_cache.set(path_id, True)
+
+    def stats(self):
+        """Return rejection counters and filter size."""
+        bloom = self._bloom
+        return {
+            "rejected_without_db": self.bloom_rejections + self.negative_hits,
+            "bloom_rejections": self.bloom_rejections,
+            "negative_cache_hits": self.negative_hits,
+            "db_misses": self.db_misses,
+            "bloom_items": bloom.count if bloom is not None else 0,
+            "bloom_capacity": bloom.capacity if bloom is not None else 0,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+            "negative_cache": self.negative_cache.stats(),
+        }
+
+    def _current_bloom(self):
+        """Return an up-to-date Bloom filter, or None if it cannot be built."""
+        now = self._clock()
+        bloom = self._bloom
+        if bloom is not None and now - self._refreshed_at < self.refresh_interval:
+            return bloom
+
+        with self._lock:
+            now = self._clock()
+            try:
+                if (
+                    self._bloom is None
+                    or now - self._built_at >= self.rebuild_interval
+                    or self._bloom.count > self._bloom.capacity
+                ):
+                    self._rebuild(now)
+                elif now - self._refreshed_at >= self.refresh_interval:
+                    self._refresh(now)
+            except Exception as e:
+                # Never reject on a stale or missing filter; fall back to the DB
+                logger.error("Path filter refresh failed", error=str(e))
+                self._bloom = None
+                return None
+        return self._bloom
+
+    def _rebuild(self, now):
+        """Build a new filter from every path in the database."""
+        since = datetime.utcnow()
+        path_ids = Path.load_path_ids()
+        capacity = max(1024, len(path_ids) * 2)
+        self._bloom = BloomFilter.from_items(path_ids, capacity, self.error_rate)
+        self._built_at = self._refreshed_at = now
+        self._refreshed_since = since
+        self.rebuilds += 1
+        logger.info("Path filter rebuilt", paths=len(path_ids), capacity=capacity)
+
+    def _refresh(self, now):
+        """Add paths created since the last refresh."""
+        since = datetime.utcnow()
+        created_since = self._refreshed_since - CLOCK_SKEW
+        for path_id in Path.load_path_ids(created_since=created_since):
+            self._bloom.add(path_id)
+        self._refreshed_at = now
+        self._refreshed_since = since
+        self.refreshes += 1
@@ -0,0 +1,448 @@
+"""Replay engine re-sending captured requests to a target URL."""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+import structlog
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from sqlalchemy import tuple_, update
+
+from app import db
+from app.models.replay import ReplayJob
+from app.models.request import Request
+from app.models.request_body import RequestBody
+
+logger = structlog.get_logger()
+
+# Responses worth another attempt; other errors are final
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Connection-specific headers never forwarded (RFC 9110, section 7.6.1)
+HOP_BY_HOP_HEADERS = frozenset(
+    {
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "proxy-connection",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+        "content-length",
+        "host",
+    }
+)
+
+# Header telling the target which captured request it is receiving
+REPLAY_HEADER = "X-Replay-Request-Id"
+
+
+class ReplayLimitReached(Exception):
+    """Raised when a worker already runs its maximum of replay jobs."""
+
+
+def build_delivery(request_record, target_url, with_body=True):
+    """Rebuild a captured request as keyword arguments for ``requests``.
+
+    Method, headers, query parameters and the raw body are sent as they were
+    captured, except for hop-by-hop headers. Query parameters are added to
+    those of ``target_url``. Without ``with_body`` the data is left None, for
+    callers that read the body only when sending.
+    """
+    headers = {
+        key: value
+        for key, value in request_record.headers_dict.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
+    headers[REPLAY_HEADER] = request_record.id
+    return {
+        "method": request_record.method,
+        "url": target_url,
+        "params": request_record.query_params_dict,
+        "headers": headers,
+        "data": request_record.body if with_body else None,
+    }
+
+
+def backoff_delay(attempt, base, cap, retry_after=None):
+    """Return the pause before retry ``attempt`` (1 for the first retry).
+
+    Exponential with jitter, so retries of concurrent requests spread out.
+    A ``Retry-After`` in seconds from the target is honoured up to ``cap``.
+    """
+    if retry_after is not None:
+        return min(retry_after, cap)
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class RateLimiter:
+    """Spaces out calls to at most ``rate`` per second, across threads."""
+
+    def __init__(self, rate=None):
+        """Initialize the limiter; no ``rate`` means no limit."""
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, stop):
+        """Wait for the next slot; returns False if ``stop`` was set meanwhile."""
+        if not self.interval:
+            return not stop.is_set()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        return not stop.wait(slot - now)
+
+
+class ReplayManager:
+    """Runs replay jobs of this worker, each on its own thread.
+
+    A job loads the selected requests oldest first in batches of
+    ``batch_size`` and sends them through a pool of ``concurrency`` threads
+    sharing one HTTP session, so connections to the target are reused.
+    Requests are started in capture order; with ``ordered`` they are sent one
+    at a time, each only once the previous one finished, retries included.
+    Outcomes are written to the database every ``progress_interval``
+    seconds, when the runner also checks whether the job was cancelled.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_jobs=4,
+        max_concurrency=32,
+        batch_size=200,
+        backoff_base=0.5,
+        backoff_max=30.0,
+        progress_interval=1.0,
+    ):
+        """Initialize the manager; jobs start with ``start``."""
+        self.app = app
+        self.max_jobs = max_jobs
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.progress_interval = progress_interval
+
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+        self.started = 0
+        self.delivered = 0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a manager configured from the application settings."""
+        return cls(
+            app,
+            max_jobs=app.config["REPLAY_MAX_JOBS"],
+            max_concurrency=app.config["REPLAY_MAX_CONCURRENCY"],
+            batch_size=app.config["REPLAY_BATCH_SIZE"],
+            backoff_base=app.config["REPLAY_BACKOFF_BASE"],
+            backoff_max=app.config["REPLAY_BACKOFF_MAX"],
+        )
+
+    def running_count(self):
+        """Return the number of jobs running in this worker."""
+        with self._lock:
+            return sum(1 for thread, _ in self._jobs.values() if thread.is_alive())
+
+    def start(self, job_id):
+        """Run a pending job on a new thread.
+
+        Raises ``ReplayLimitReached`` when ``max_jobs`` are already running.
+        """
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self.run, args=(job_id, stop), name="replay", daemon=True
+        )
+        with self._lock:
+            running = sum(1 for other, _ in self._jobs.values() if other.is_alive())
+            if running >= self.max_jobs:
+                raise ReplayLimitReached(f"{self.max_jobs} replays already running")
+            self._jobs = {
+                key: value for key, value in self._jobs.items() if value[0].is_alive()
+            }
+            self._jobs[job_id] = (thread, stop)
+            self.started += 1
+        thread.start()
+        return thread
+
+    def cancel(self, job_id):
+        """Stop a job right away if this worker runs it.
+
+        Jobs of other workers stop at their next progress update, once
+        ``ReplayJob.request_cancel`` has marked them.
+        """
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is not None:
+            entry[1].set()
+
+    def fail_interrupted(self):
+        """Fail the jobs of workers that exited; returns how many.
+
+        Jobs run on threads of the worker that created them, so they end
+        with it, e.g. when gunicorn recycles it after ``max_requests``.
+        Called when a worker starts and on each retention pass.
+        """
+        with self.app.app_context():
+            try:
+                count = ReplayJob.fail_interrupted()
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Failing interrupted replays failed", error=str(e))
+                return 0
+        if count:
+            logger.warning("Interrupted replays marked failed", count=count)
+        return count
+
+    def stats(self):
+        """Return job counters for the metrics endpoint."""
+        return {
+            "running": self.running_count(),
+            "max_jobs": self.max_jobs,
+            "started": self.started,
+            "delivered": self.delivered,
+        }
+
+    def run(self, job_id, stop=None):
+        """Run a job to the end, in an application context of its own."""
+        stop = stop or threading.Event()
+        with self.app.app_context():
+            try:
+                status = self._run(job_id, stop)
+                if status is not None:
+                    ReplayJob.finish(job_id, status)
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Replay failed", job_id=job_id, error=str(e))
+                ReplayJob.finish(job_id, "failed", error=str(e))
+            finally:
+                db.session.remove()
+
+    def _run(self, job_id, stop):
+        """Send every selected request; returns the final status."""
+        job = db.session.get(ReplayJob, job_id)
+        if job is None:
+            return None
+        selection = {
+            "path_pk": job.path_id,
+            "method": job.method,
+            "since": job.since,
+            "until": job.until,
+        }
+        target_url = job.target_url
+        settings = {
+            "job_id": job_id,
+            "timeout": job.timeout,
+            "max_retries": job.max_retries,
+        }
+        concurrency = 1 if job.ordered else min(job.concurrency, self.max_concurrency)
+        limiter = RateLimiter(job.rate_limit)
+
+        total = self._selection(**selection).count()
+        started = db.session.execute(
+            update(ReplayJob.__table__)
+            .where(ReplayJob.__table__.c.id == job_id)
+            .where(ReplayJob.__table__.c.status == "pending")
+            .values(
+                status="running",
+                total=total,
+                started_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            )
+        ).rowcount
+        db.session.commit()
+        if not started:
+            return "cancelled"
+        logger.info("Replay started", job_id=job_id, total=total)
+
+        slots = threading.BoundedSemaphore(concurrency)
+        results = []
+        results_lock = threading.Lock()
+
+        def collect(future):
+            slots.release()
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                logger.error(
+                    "Replay delivery failed",
+                    job_id=job_id,
+                    error=str(future.exception()),
+                )
+            elif future.result() is not None:
+                with results_lock:
+                    results.append(future.result())
+
+        def flush():
+            with results_lock:
+                batch = results[:]
+                del results[:]
+            status = ReplayJob.record_results(job_id, batch)
+            self.delivered += len(batch)
+            if status != "running":
+                stop.set()
+            return status
+
+        http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        http.mount("http://", adapter)
+        http.mount("https://", adapter)
+        executor = ThreadPoolExecutor(concurrency, thread_name_prefix="replay-send")
+        try:
+            sequence = 0
+            position = None
+            next_flush = time.monotonic() + self.progress_interval
+            while not stop.is_set():
+                records = self._load(selection, position)
+                if not records:
+                    break
+                position = (records[-1].timestamp, records[-1].id)
+                # Bodies are read one at a time just before sending, so at
+                # most ``concurrency`` of them are held at once
+                deliveries = [
+                    (
+                        record.id,
+                        record.body_digest,
+                        build_delivery(record, target_url, with_body=False),
+                    )
+                    for record in records
+                ]
+                # Nothing is held open while the requests are sent
+                db.session.close()
+
+                for request_id, body_digest, delivery in deliveries:
+                    while not slots.acquire(timeout=self.progress_interval):
+                        flush()
+                        next_flush = time.monotonic() + self.progress_interval
+                    if time.monotonic() >= next_flush:
+                        flush()
+                        next_flush = time.monotonic() + self.progress_interval
+                    if stop.is_set():
+                        slots.release()
+                        break
+                    sequence += 1
+                    executor.submit(
+                        self._send,
+                        http,
+                        request_id,
+                        sequence,
+                        dict(delivery, data=self._read_body(body_digest)),
+                        settings,
+                        limiter,
+                        stop,
+                    ).add_done_callback(collect)
+        finally:
+            # Queued requests are dropped only when the job is stopping
+            executor.shutdown(wait=True, cancel_futures=stop.is_set())
+            http.close()
+
+        status = flush()
+        if status is None:
+            return None
+        return "completed" if status == "running" else "cancelled"
+
+    def _selection(self, path_pk, method=None, since=None, until=None):
+        """Return the query selecting the requests a job replays."""
+        query = Request.query.filter(Request.path_id == path_pk)
+        if method:
+            query = query.filter(Request.method == method)
+        if since is not None:
+            query = query.filter(Request.timestamp >= since)
+        if until is not None:
+            query = query.filter(Request.timestamp < until)
+        return query
+
+    def _load(self, selection, position):
+        """Load the next batch of requests after ``position``, oldest first."""
+        query = self._selection(**selection)
+        if position is not None:
+            query = query.filter(
+                Request.timestamp >= position[0],
+                tuple_(Request.timestamp, Request.id) > tuple_(*position),
+            )
+        return (
+            query.order_by(Request.timestamp, Request.id).limit(self.batch_size).all()
+        )
+
+    @staticmethod
+    def _read_body(body_digest):
+        """Read a stored body without keeping the session open."""
+        if body_digest is None:
+            return None
+        try:
+            record = db.session.get(RequestBody, body_digest)
+            return record.read() if record is not None else None
+        finally:
+            db.session.close()
+
+    def _send(self, http, request_id, sequence, delivery, settings, limiter, stop):
+        """Send one request with retries; returns its outcome, or None if stopped."""
+        started = time.monotonic()
+        attempts = 0
+        status_code = None
+        error = None
+        while True:
+            if not limiter.wait(stop):
+                if attempts == 0:
+                    return None
+                break
+            attempts += 1
+            retry_after = None
+            try:
+                response = http.request(
+                    timeout=settings["timeout"], allow_redirects=False, **delivery
+                )
+                status_code = response.status_code
+                response.close()
+                if status_code < 400:
+                    error = None
+                    break
+                error = f"HTTP {status_code}"
+                if status_code not in RETRY_STATUSES:
+                    break
+                retry_after = _retry_after(response)
+            except requests.RequestException as e:
+                status_code = None
+                error = str(e)[:1000]
+            if attempts > settings["max_retries"]:
+                break
+            delay = backoff_delay(
+                attempts, self.backoff_base, self.backoff_max, retry_after
+            )
+            if stop.wait(delay):
+                break
+
+        return {
+            "job_id": settings["job_id"],
+            "request_id": request_id,
+            "sequence": sequence,
+            "status": "succeeded" if error is None else "failed",
+            "status_code": status_code,
+            "attempts": attempts,
+            "duration_ms": int((time.monotonic() - started) * 1000),
+            "error": error,
+            "finished_at": datetime.utcnow(),
+        }
+
+
+def _retry_after(response):
+    """Return a Retry-After header given in seconds, or None."""
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+def get_replay_manager():
+    """Return the replay manager for the current app."""
+    return current_app.extensions["replay_manager"]
@@ -0,0 +1,162 @@
+"""Retention worker deleting expired requests on a schedule."""
+
+import atexit
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import structlog
+
+from app.services.webhook_service import RequestService
+
+logger = structlog.get_logger()
+
+
+class RetentionWorker:
+    """Deletes requests older than ``days`` in throttled batches.
+
+    ``run_once`` makes one pass and can be called from the ``flask retention``
+    commands. ``start`` runs passes every ``interval`` seconds on a background
+    thread; every gunicorn worker may start it, but only the one holding the
+    lock file runs passes, and another takes over if that worker exits.
+    """
+
+    def __init__(
+        self,
+        app,
+        days=30,
+        interval=3600.0,
+        batch_size=1000,
+        pause=0.1,
+        lock_path=None,
+    ):
+        """Initialize the worker; the scheduler thread starts with ``start``."""
+        self.app = app
+        self.days = days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lock_path = lock_path
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a worker configured from the application settings."""
+        lock_path = app.config["RETENTION_LOCK_PATH"]
+        if not lock_path:
+            # One scheduler per database, so separate deployments never mix
+            database_key = hashlib.sha1(
+                app.config["SQLALCHEMY_DATABASE_URI"].encode("utf-8")
+            ).hexdigest()[:12]
+            lock_path = os.path.join(
+                tempfile.gettempdir(),
+                f"callback-listener-retention-{database_key}.lock",
+            )
+        return cls(
+            app,
+            days=app.config["RETENTION_DAYS"],
+            interval=app.config["RETENTION_INTERVAL"],
+            batch_size=app.config["RETENTION_BATCH_SIZE"],
+            pause=app.config["RETENTION_BATCH_PAUSE"],
+            lock_path=lock_path,
+        )
+
+    def run_once(self, days=None, batch_size=None, pause=None, progress=None):
+        """Delete expired requests once; returns the run summary.
+
+        Must be called within an application context.
+        """
+        days = self.days if days is None else days
+        started = time.monotonic()
+        deleted = RequestService.delete_old_requests(
+            days_old=days,
+            batch_size=batch_size or self.batch_size,
+            pause=self.pause if pause is None else pause,
+            progress=progress,
+        )
+        seconds = time.monotonic() - started
+        self.app.extensions["replay_manager"].fail_interrupted()
+
+        result = {
+            "days": days,
+            "deleted": deleted,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(deleted / seconds, 1) if seconds else 0.0,
+            "finished_at": time.time(),
+        }
+        self.runs += 1
+        self.last_run = result
+        logger.info("Retention run finished", **result)
+        return result
+
+    def run_forever(self):
+        """Run passes every ``interval`` seconds until ``stop`` is called."""
+        while not self._stop.is_set():
+            if self._acquire():
+                with self.app.app_context():
+                    try:
+                        self.run_once()
+                    except Exception as e:
+                        self.failures += 1
+                        logger.error("Retention run failed", error=str(e))
+            self._stop.wait(self.interval)
+        self._release()
+
+    def start(self):
+        """Start the scheduler thread in this process."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run_forever, name="retention", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        """Stop the scheduler thread, waiting up to ``timeout`` for a run."""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Return scheduler state for the metrics endpoint."""
+        return {
+            "days": self.days,
+            "interval": self.interval,
+            "scheduler_running": self._thread is not None and self._thread.is_alive(),
+            "holds_lock": self._lock_file is not None,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+        }
+
+    def _acquire(self):
+        """Take the scheduler lock if no other process holds it."""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("Retention scheduler lock acquired", pid=os.getpid())
+        return True
+
+    def _release(self):
+        """Give up the scheduler lock."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,200 @@
+"""Dashboard statistics computed with SQL aggregates and shared as a snapshot."""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import structlog
+from flask import current_app
+from sqlalchemy import case, distinct, func
+
+from app import db
+from app.models.path import Path
+from app.models.request import Request
+
+logger = structlog.get_logger()
+
+
+def compute_dashboard_stats(recent_limit=10):
+    """Compute dashboard statistics with aggregate queries.
+
+    Totals come from the denormalized path counters, so the cost depends on
+    the number of paths rather than the number of captured requests.
+    """
+    total_webhooks, active_webhooks, total_requests = db.session.query(
+        func.count(Path.id),
+        func.count(case((Path.request_count > 0, 1))),
+        func.coalesce(func.sum(Path.request_count), 0),
+    ).one()
+
+    since = datetime.utcnow() - timedelta(hours=24)
+    requests_last_24h, active_webhooks_last_24h = (
+        db.session.query(func.count(Request.id), func.count(distinct(Request.path_id)))
+        .filter(Request.timestamp >= since)
+        .one()
+    )
+
+    recent_requests = Request.get_recent_requests(limit=recent_limit)
+
+    return {
+        "total_webhooks": total_webhooks,
+        "total_requests": int(total_requests),
+        "active_webhooks": active_webhooks,
+        "requests_last_24h": requests_last_24h,
+        "active_webhooks_last_24h": active_webhooks_last_24h,
+        "recent_requests": [req.to_dict(include_body=False) for req in recent_requests],
+    }
+
+
+class StatsSnapshot:
+    """Dashboard statistics snapshot shared by all workers on a host.
+
+    The snapshot is a JSON file written atomically. Readers serve it as-is;
+    once it is older than ``ttl`` seconds, the first worker to take the file
+    lock recomputes it on a background thread while everyone keeps serving
+    the previous snapshot. Only a missing snapshot, or ``ttl`` of 0, is
+    computed on the request thread.
+    """
+
+    def __init__(self, app, path, ttl=5.0, compute=compute_dashboard_stats):
+        """Initialize the snapshot stored at ``path``."""
+        self.app = app
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.ttl = ttl
+        self.compute = compute
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._cached = None
+        self._cached_mtime = None
+
+        self.refreshes = 0
+        self.failures = 0
+
+    @classmethod
+    def from_config(cls, app):
+        """Create a snapshot configured from the application settings."""
+        path = app.config["DASHBOARD_STATS_PATH"]
+        if not path:
+            # One snapshot per database, so separate deployments never mix
+            database_key = hashlib.sha1(
+                app.config["SQLALCHEMY_DATABASE_URI"].encode("utf-8")
+            ).hexdigest()[:12]
+            path = os.path.join(
+                tempfile.gettempdir(), f"callback-listener-stats-{database_key}.json"
+            )
+        return cls(app, path, ttl=app.config["DASHBOARD_STATS_TTL"])
+
+    def get(self):
+        """Return the current statistics, refreshing them if stale."""
+        if self.ttl <= 0:
+            return self._with_age(self._build())
+
+        snapshot = self._read()
+        if snapshot is None:
+            snapshot = self._build()
+            self._write(snapshot)
+        elif time.time() - snapshot["generated_at"] >= self.ttl:
+            self._refresh_in_background()
+
+        return self._with_age(snapshot)
+
+    def stats(self):
+        """Return refresh counters for the metrics endpoint."""
+        return {
+            "path": self.path,
+            "ttl": self.ttl,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+    def _build(self):
+        """Compute a fresh snapshot."""
+        data = self.compute()
+        data["generated_at"] = time.time()
+        return data
+
+    def _with_age(self, snapshot):
+        """Add snapshot timing fields to a copy of the statistics."""
+        data = dict(snapshot)
+        generated_at = data.pop("generated_at")
+        data["generated_at"] = datetime.utcfromtimestamp(generated_at).isoformat()
+        data["age_seconds"] = round(max(0.0, time.time() - generated_at), 3)
+        return data
+
+    def _read(self):
+        """Read the snapshot file, reusing the parsed copy while unchanged."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        if mtime != self._cached_mtime:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._cached = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._cached_mtime = mtime
+        return self._cached
+
+    def _write(self, snapshot):
+        """Atomically replace the snapshot file."""
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def _refresh_in_background(self):
+        """Start a refresh thread unless one is already running here."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        threading.Thread(
+            target=self._refresh, name="stats-snapshot", daemon=True
+        ).start()
+
+    def _refresh(self):
+        """Recompute the snapshot if no other worker is already doing so."""
+        try:
+            with open(self.lock_path, "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+
+                # Another worker may have refreshed while we waited
+                snapshot = self._read()
+                if snapshot and time.time() - snapshot["generated_at"] < self.ttl:
+                    return
+
+                with self.app.app_context():
+                    try:
+                        self._write(self._build())
+                    finally:
+                        db.session.remove()
+                self.refreshes += 1
+        except Exception as e:
+            self.failures += 1
+            logger.error("Dashboard stats refresh failed", error=str(e))
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def get_stats_snapshot():
+    """Return the dashboard statistics snapshot for the current app."""
+    return current_app.extensions["stats_snapshot"]
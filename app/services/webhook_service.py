@@ -1,13 +1,38 @@
 """Service layer for business logic."""
 
+import time
+from datetime import datetime, timedelta
+
 import structlog
+from flask import current_app
+from sqlalchemy import case, func, select, tuple_
 
 from app import db
 from app.models.path import Path
 from app.models.request import Request
+from app.models.request_body import RequestBody
+from app.models.request_rollup import RequestRollup
+from app.utils.helpers import encode_cursor
+from app.utils.sql import as_datetime
 
 logger = structlog.get_logger()
 
+# Body size buckets as (label, exclusive upper bound in bytes)
+BODY_SIZE_BUCKETS = [
+    ("empty", 1),
+    ("<1KB", 1024),
+    ("1KB-64KB", 64 * 1024),
+    ("64KB-1MB", 1024 * 1024),
+    (">=1MB", None),
+]
+
+# Time series resolution picked for windows up to the given length
+TIMESERIES_RESOLUTIONS = [
+    ("minute", timedelta(hours=6)),
+    ("hour", timedelta(days=14)),
+    ("day", None),
+]
+
 
 class PathService:
     """Service for path-related operations."""
@@ -29,29 +54,144 @@ class PathService:
         return Path.find_by_path_id(path_id)
 
     @staticmethod
-    def get_path_statistics(path_id):
-        """Get statistics for a path."""
+    def get_path_statistics(path_id, since=None, until=None):
+        """Get statistics for a path, optionally within a time window.
+
+        Method, content type and body size counts come from one GROUP BY
+        pass over the window, and hourly counts from the rollups. Without a
+        window, totals come straight from the path counters and the
+        breakdowns cover the last PATH_STATS_WINDOW_HOURS hours, reported in
+        breakdown_since, so paths with millions of requests are never
+        scanned in full.
+        """
         path = Path.find_by_path_id(path_id)
         if not path:
             return None
 
-        total_requests = len(path.requests) if path.requests else 0
+        windowed = since is not None or until is not None
+        breakdown_since, breakdown_until = since, until
+        if not windowed:
+            breakdown_since = datetime.utcnow() - timedelta(
+                hours=current_app.config["PATH_STATS_WINDOW_HOURS"]
+            )
+
+        query = Request.query.filter(Request.path_id == path.id)
+        if breakdown_since is not None:
+            query = query.filter(Request.timestamp >= breakdown_since)
+        if breakdown_until is not None:
+            query = query.filter(Request.timestamp < breakdown_until)
+
+        size_bucket = case(
+            *[
+                (Request.body_size < upper, label)
+                for label, upper in BODY_SIZE_BUCKETS
+                if upper is not None
+            ],
+            else_=BODY_SIZE_BUCKETS[-1][0],
+        )
+        groups = query.with_entities(
+            Request.method,
+            Request.content_type,
+            size_bucket,
+            func.count(Request.id),
+            func.coalesce(func.sum(Request.body_size), 0),
+            func.max(Request.timestamp),
+        ).group_by(Request.method, Request.content_type, size_bucket)
 
-        # Count by method
         method_counts = {}
-        if path.requests:
-            for request in path.requests:
-                method = request.method
-                method_counts[method] = method_counts.get(method, 0) + 1
+        content_type_counts = {}
+        body_size_buckets = {label: 0 for label, _ in BODY_SIZE_BUCKETS}
+        total_requests = total_body_bytes = 0
+        last_request = None
+        for method, content_type, bucket, count, body_bytes, latest in groups:
+            content_type = content_type or "unknown"
+            method_counts[method] = method_counts.get(method, 0) + count
+            content_type_counts[content_type] = (
+                content_type_counts.get(content_type, 0) + count
+            )
+            body_size_buckets[bucket] += count
+            total_requests += count
+            total_body_bytes += int(body_bytes)
+            latest = as_datetime(latest)
+            if last_request is None or latest > last_request:
+                last_request = latest
+
+        if not windowed:
+            total_requests = path.request_count
+            total_body_bytes = path.total_body_bytes
+            last_request = path.last_request_at
+
+        # Older buckets may only be kept per day; their unit says so
+        requests_per_hour = [
+            {"hour": bucket.isoformat(), "resolution": unit, "count": count}
+            for bucket, unit, count, _, _ in RequestRollup.series(
+                path.id, breakdown_since, breakdown_until, "hour"
+            )
+        ]
 
         return {
             "path_id": path.path_id,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+            "breakdown_since": (
+                breakdown_since.isoformat() if breakdown_since else None
+            ),
+            "breakdown_until": (
+                breakdown_until.isoformat() if breakdown_until else None
+            ),
             "total_requests": total_requests,
+            "total_body_bytes": int(total_body_bytes or 0),
             "method_counts": method_counts,
+            "content_type_counts": content_type_counts,
+            "body_size_buckets": body_size_buckets,
+            "requests_per_hour": requests_per_hour,
             "created_at": path.created_at.isoformat() if path.created_at else None,
-            "last_request": path.requests[0].timestamp.isoformat()
-            if path.requests
-            else None,
+            "last_request": last_request.isoformat() if last_request else None,
+        }
+
+    @staticmethod
+    def get_path_timeseries(
+        path_id, since=None, until=None, resolution=None, method=None
+    ):
+        """Get request counts and body bytes over time for a path.
+
+        Served from the rollups only, never from the requests table. The
+        window defaults to the last 24 hours and the resolution to one
+        suited to its length. Older data may only be kept in coarser buckets,
+        which are returned at their own resolution.
+        """
+        path = Path.find_by_path_id(path_id)
+        if not path:
+            return None
+
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=1)
+        if resolution is None:
+            resolution = next(
+                unit
+                for unit, longest in TIMESERIES_RESOLUTIONS
+                if longest is None or until - since <= longest
+            )
+
+        points = [
+            {
+                "bucket": bucket.isoformat(),
+                "resolution": unit,
+                "count": count,
+                "body_bytes": int(body_bytes),
+                "method_counts": method_counts,
+            }
+            for bucket, unit, count, body_bytes, method_counts in RequestRollup.series(
+                path.id, since, until, resolution, method=method
+            )
+        ]
+        return {
+            "path_id": path.path_id,
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "resolution": resolution,
+            "method": method,
+            "points": points,
         }
 
 
@@ -62,7 +202,7 @@ class RequestService:
     def capture_request(flask_request, path_id):
         """Capture a webhook request."""
         try:
-            path = Path.find_by_path_id(path_id)
+            path = Path.resolve(path_id)
             if not path:
                 raise ValueError(f"Path {path_id} not found")
 
@@ -82,7 +222,7 @@ class RequestService:
     @staticmethod
     def get_requests_for_path(path_id, limit=100, offset=0, method_filter=None):
         """Get requests for a path with optional filtering."""
-        path = Path.find_by_path_id(path_id)
+        path = Path.resolve(path_id)
         if not path:
             return []
 
@@ -103,17 +243,142 @@ class RequestService:
         return Request.get_by_id_and_path(request_id, path_id)
 
     @staticmethod
-    def delete_old_requests(days_old=30):
-        """Delete requests older than specified days."""
-        from datetime import datetime, timedelta
+    def get_capture_events(path_id, after, broker, limit=1000):
+        """Get broker events for requests of a path captured after a cursor.
 
-        cutoff_date = datetime.utcnow() - timedelta(days=days_old)
+        ``after`` is the id of the last event a subscriber received. Returns
+        (events oldest first, whether every later request is included); at
+        most ``limit`` events are built.
+        """
+        events = []
+        cursor = after
+        while cursor and len(events) < limit:
+            page = Request.get_page_by_path_id(
+                path_id,
+                limit=min(100, limit - len(events)),
+                cursor=cursor,
+                include_body=True,
+            )
+            events.extend(broker.event_for(request) for request in page.requests[::-1])
+            cursor = page.prev_cursor
+        return events, cursor is None
+
+    @staticmethod
+    def wait_for_request(path_id, after, timeout, broker):
+        """Wait for the first request of a path captured after another one.
+
+        Without ``after``, the first request ever captured for the path is
+        returned. A stored request is returned right away; otherwise the
+        capture is awaited on the broker for up to ``timeout`` seconds,
+        without querying the database in between. With a backend that only
+        reaches this worker, the database is checked once more at the end
+        for captures handled by other workers.
+
+        Returns the request as serialized in broker events, or None after
+        the timeout. Raises LookupError if ``after`` is not a request of the
+        path, and SubscriberLimitReached if the worker is full.
+        """
+        with broker.subscribe(path_id) as subscription:
+            # Subscribed first, so a capture landing meanwhile is not missed
+            if after is None:
+                cursor = encode_cursor(datetime.min, "", "prev")
+            else:
+                previous = Request.get_by_id_and_path(after, path_id)
+                if previous is None:
+                    raise LookupError(f"Unknown request: {after}")
+                cursor = encode_cursor(previous.timestamp, previous.id, "prev")
+
+            def stored():
+                page = Request.get_page_by_path_id(
+                    path_id, limit=1, cursor=cursor, include_body=True
+                )
+                if not page.requests:
+                    return None
+                return broker.event_for(page.requests[0])["request"]
+
+            found = stored()
+            # Do not hold a database connection while waiting
+            db.session.close()
+            if found is not None:
+                return found
+
+            event = subscription.get(timeout=timeout)
+            if event is not None:
+                return event["request"]
+            if subscription.overflowed or not broker.backend.cross_process:
+                return stored()
+            return None
+
+    @staticmethod
+    def delete_old_requests(days_old=30, batch_size=1000, pause=0.0, progress=None):
+        """Delete expired requests, oldest first, in batches.
+
+        Requests older than ``days_old`` days are deleted, except on paths
+        with their own ``max_age``, which are expired by it instead. Paths
+        over ``max_requests`` or ``max_bytes`` are then trimmed to their
+        limits the same way.
+
+        Each batch of at most ``batch_size`` requests is deleted in its own
+        short transaction, sleeping ``pause`` seconds in between so ingest is
+        not held up. An interrupted run loses at most one batch and the next
+        run carries on from the oldest request left. ``progress`` is called
+        with the running total after each batch.
+        """
+        now = datetime.utcnow()
+        cutoff_date = now - timedelta(days=days_old)
 
         try:
-            deleted_count = Request.query.filter(
-                Request.timestamp < cutoff_date
-            ).delete()
-            db.session.commit()
+            deleted_count = 0
+            partitions = current_app.extensions.get("request_partitions")
+            if partitions is not None:
+                # Whole partitions go first, but only once no path keeps them
+                partitions.ensure()
+                oldest_kept = min(
+                    [cutoff_date]
+                    + [
+                        now - timedelta(seconds=max_age)
+                        for max_age in RequestService._path_max_ages().values()
+                    ]
+                )
+                deleted_count = partitions.drop_before(oldest_kept)
+
+            with_own_age = select(Path.id).where(Path.max_age.isnot(None))
+
+            def passes():
+                yield [
+                    Request.timestamp < cutoff_date,
+                    ~Request.path_id.in_(with_own_age),
+                ]
+                for path_pk, max_age in RequestService._path_max_ages().items():
+                    yield [
+                        Request.path_id == path_pk,
+                        Request.timestamp < now - timedelta(seconds=max_age),
+                    ]
+                # Ring-buffer paths that grew past their limits between
+                # trims, measured once expiry has run
+                for path_pk, last in Request.trim_positions(slack=0).items():
+                    yield [
+                        Request.path_id == path_pk,
+                        tuple_(Request.timestamp, Request.id) <= tuple_(*last),
+                    ]
+
+            for criteria in passes():
+                position = None
+                while True:
+                    selected, deleted, position = RequestService._delete_expired_batch(
+                        criteria, position, batch_size
+                    )
+                    deleted_count += deleted
+                    if progress is not None:
+                        progress(deleted_count)
+                    if selected < batch_size:
+                        break
+                    if pause:
+                        time.sleep(pause)
+
+            RequestBody.collect_garbage()
+            RequestBody.compact_segments()
+            RequestRollup.coarsen()
             logger.info(
                 "Old requests deleted",
                 count=deleted_count,
@@ -124,3 +389,40 @@ class RequestService:
             db.session.rollback()
             logger.error("Error deleting old requests", error=str(e))
             raise
+
+    @staticmethod
+    def _path_max_ages():
+        """Map the primary key of each path with its own max_age to it."""
+        return dict(
+            db.session.query(Path.id, Path.max_age).filter(Path.max_age.isnot(None))
+        )
+
+    @staticmethod
+    def _delete_expired_batch(criteria, after, batch_size):
+        """Delete the oldest requests matching ``criteria`` past ``after``.
+
+        Runs in one transaction. Seeks by (timestamp, id) so each batch
+        starts past the index entries of the previous one instead of
+        rescanning them. Returns (rows selected, rows deleted, position of
+        the last selected row).
+        """
+        expired = Request.query.filter(*criteria)
+        if after is not None:
+            expired = expired.filter(
+                Request.timestamp >= after[0],
+                tuple_(Request.timestamp, Request.id) > tuple_(*after),
+            )
+        batch = (
+            expired.with_entities(Request.timestamp, Request.id)
+            .order_by(Request.timestamp, Request.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return 0, 0, after
+
+        deleted = Request.delete_by_ids([row.id for row in batch])
+        db.session.commit()
+
+        last = batch[-1]
+        return len(batch), deleted, (last.timestamp, last.id)
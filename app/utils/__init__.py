@@ -1,6 +1,9 @@
 """Utils package initialization."""
 
+from app.utils.cache import LRUCache
 from app.utils.helpers import (
+    decode_cursor,
+    encode_cursor,
     format_headers,
     format_timestamp,
     get_client_ip,
@@ -8,6 +11,7 @@ from app.utils.helpers import (
     is_valid_uuid,
     mask_sensitive_headers,
     parse_content_type,
+    parse_timestamp,
     safe_json_loads,
     sanitize_path_id,
     truncate_string,
@@ -15,13 +19,17 @@ from app.utils.helpers import (
 )
 
 __all__ = [
+    "LRUCache",
     "is_valid_uuid",
     "sanitize_path_id",
     "format_headers",
     "parse_content_type",
+    "parse_timestamp",
     "truncate_string",
     "get_client_ip",
     "format_timestamp",
+    "encode_cursor",
+    "decode_cursor",
     "validate_pagination_params",
     "is_json_content_type",
     "safe_json_loads",
@@ -0,0 +1,70 @@
+"""Bloom filter for fast set-membership checks."""
+
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """Space-efficient probabilistic set.
+
+    ``might_contain`` never returns False for an added item, and returns True
+    for an item that was never added with probability close to
+    ``error_rate`` while fewer than ``capacity`` items have been added.
+    Items cannot be removed; rebuild the filter instead.
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.01):
+        """Size the filter for ``capacity`` items at the given error rate."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        )
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def from_items(
+        cls, items: Iterable[str], capacity: int, error_rate: float = 0.01
+    ) -> "BloomFilter":
+        """Build a filter pre-populated with items."""
+        bloom = cls(capacity=capacity, error_rate=error_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item: str):
+        """Yield the bit positions for an item using double hashing."""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        """Add an item to the filter."""
+        # Re-adding an item leaves the bits unchanged, so keep the count of
+        # distinct items (approximately) rather than of calls
+        if self.might_contain(item):
+            return
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, item: str) -> bool:
+        """Return False if the item was definitely never added."""
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def __contains__(self, item: str) -> bool:
+        """Alias for ``might_contain``."""
+        return self.might_contain(item)
@@ -0,0 +1,76 @@
+"""Body compression codecs, identified by a one-byte codec id."""
+
+import lzma
+import zlib
+from collections import namedtuple
+from typing import Callable, Dict, Optional, Tuple
+
+Codec = namedtuple("Codec", ["id", "name", "compress", "decompress"])
+
+# Codec ids are stored alongside each body; never renumber existing entries
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+
+
+def _identity(data: bytes, level: Optional[int] = None) -> bytes:
+    """Return data unchanged."""
+    return data
+
+
+def _zlib_compress(data: bytes, level: Optional[int] = None) -> bytes:
+    """Compress with zlib (default level 6)."""
+    return zlib.compress(data, 6 if level is None else level)
+
+
+def _lzma_compress(data: bytes, level: Optional[int] = None) -> bytes:
+    """Compress with LZMA (default preset 0, favouring speed)."""
+    return lzma.compress(data, preset=0 if level is None else level)
+
+
+CODECS: Dict[int, Codec] = {
+    CODEC_NONE: Codec(CODEC_NONE, "none", _identity, bytes),
+    CODEC_ZLIB: Codec(CODEC_ZLIB, "zlib", _zlib_compress, zlib.decompress),
+    CODEC_LZMA: Codec(CODEC_LZMA, "lzma", _lzma_compress, lzma.decompress),
+}
+CODECS_BY_NAME: Dict[str, Codec] = {codec.name: codec for codec in CODECS.values()}
+
+
+def get_codec(name: str) -> Codec:
+    """Return the codec registered under name."""
+    try:
+        return CODECS_BY_NAME[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec: {name}") from None
+
+
+def compress(
+    data: Optional[bytes],
+    codec: str = "zlib",
+    threshold: int = 1024,
+    level: Optional[int] = None,
+) -> Tuple[int, Optional[bytes]]:
+    """Compress data if it is at least threshold bytes and compression helps.
+
+    Returns (codec id, stored bytes); the codec id is CODEC_NONE when the data
+    is kept as-is.
+    """
+    selected = get_codec(codec)
+    if not data or selected.id == CODEC_NONE or len(data) < threshold:
+        return CODEC_NONE, data
+
+    compressed = selected.compress(data, level)
+    if len(compressed) >= len(data):
+        return CODEC_NONE, data
+    return selected.id, compressed
+
+
+def decompress(codec_id: Optional[int], data: Optional[bytes]) -> Optional[bytes]:
+    """Restore data stored with the given codec id."""
+    if data is None:
+        return None
+    try:
+        decoder: Callable[[bytes], bytes] = CODECS[codec_id or CODEC_NONE].decompress
+    except KeyError:
+        raise ValueError(f"Unknown compression codec id: {codec_id}") from None
+    return decoder(bytes(data))
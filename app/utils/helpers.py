@@ -1,8 +1,10 @@
 """Utility functions for the application."""
 
+import base64
+import json
 import re
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 
@@ -92,6 +94,45 @@ def format_timestamp(dt: datetime) -> str:
     return dt.isoformat() + "Z" if dt else ""
 
 
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp into a naive UTC datetime.
+
+    Raises ValueError for malformed input; returns None for empty input.
+    """
+    if not value:
+        return None
+
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def encode_cursor(timestamp: datetime, row_id: str, direction: str = "next") -> str:
+    """Encode a keyset position into an opaque, URL-safe pagination cursor."""
+    payload = json.dumps([timestamp.isoformat(), row_id, direction])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor into (timestamp, row_id, direction).
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id, direction = json.loads(
+            base64.urlsafe_b64decode(padded.encode("ascii"))
+        )
+        timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(row_id, str) or direction not in ("next", "prev"):
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id, direction
+
+
 def validate_pagination_params(limit: Any, offset: Any) -> tuple:
     """Validate and sanitize pagination parameters."""
     try:
@@ -0,0 +1,39 @@
+"""Per-process state for services that run background threads."""
+
+import os
+import threading
+
+
+class PerProcess:
+    """Lazily creates a value once in each process that uses it.
+
+    Gunicorn preloads the app in the master and forks workers, and threads
+    do not survive a fork, so services start their background threads
+    through this on first use rather than when the app is created. ``get``
+    calls ``start`` the first time it is used in a process, and again when
+    ``alive``, if given, reports that the current value has stopped.
+    """
+
+    def __init__(self, start, alive=None):
+        """Initialize with the factory of the value; nothing starts yet."""
+        self._start = start
+        self._alive = alive
+        self._lock = threading.Lock()
+        self._pid = None
+        self.value = None
+
+    def get(self):
+        """Return the value of this process, creating it if needed."""
+        if self._current():
+            return self.value
+        with self._lock:
+            if not self._current():
+                self.value = self._start()
+                self._pid = os.getpid()
+        return self.value
+
+    def _current(self):
+        """Return whether the value was created in this process and runs."""
+        if self._pid != os.getpid():
+            return False
+        return self._alive is None or self._alive(self.value)
@@ -0,0 +1,11 @@
+"""SQL result helpers that differ between PostgreSQL and SQLite."""
+
+from datetime import datetime
+from typing import Any, Optional
+
+
+def as_datetime(value: Any) -> Optional[datetime]:
+    """Normalize a timestamp returned by either dialect to a datetime."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
@@ -10,7 +10,10 @@ backlog = 2048
 
 # Worker processes
 workers = min(multiprocessing.cpu_count() * 2 + 1, 8)
-worker_class = "sync"
+# Threaded workers: a live stream (/api/paths/<id>/stream) holds one thread,
+# so keep STREAM_MAX_SUBSCRIBERS well below the thread count
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 32))
 worker_connections = 1000
 timeout = 120
 keepalive = 2
@@ -83,7 +86,12 @@ def post_fork(server, worker):
 
 def post_worker_init(worker):
     """Called just after a worker has initialized the application."""
-    pass
+    # Every worker starts the scheduler; only the one holding its lock runs it
+    app = worker.wsgi
+    # Replays run by a worker that exited are not resumed
+    app.extensions["replay_manager"].fail_interrupted()
+    if app.config.get("RETENTION_SCHEDULER"):
+        app.extensions["retention_worker"].start()
 
 
 def worker_abort(worker):
@@ -0,0 +1,56 @@
+"""Initial schema: paths and requests.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases bootstrapped with db.create_all() already have these tables;
+    # adopt them instead of failing so later revisions can be applied
+    existing = sa.inspect(op.get_bind()).get_table_names()
+
+    if "paths" not in existing:
+        op.create_table(
+            "paths",
+            sa.Column("id", sa.String(length=36), nullable=False),
+            sa.Column("path_id", sa.String(length=255), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_paths_path_id", "paths", ["path_id"], unique=True)
+
+    if "requests" not in existing:
+        op.create_table(
+            "requests",
+            sa.Column("id", sa.String(length=36), nullable=False),
+            sa.Column("path_id", sa.String(length=36), nullable=False),
+            sa.Column("method", sa.String(length=10), nullable=False),
+            sa.Column("headers", sa.Text(), nullable=False),
+            sa.Column("body", sa.Text(), nullable=True),
+            sa.Column("query_params", sa.Text(), nullable=False),
+            sa.Column("ip_address", sa.String(length=45), nullable=True),
+            sa.Column("user_agent", sa.Text(), nullable=True),
+            sa.Column("timestamp", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["path_id"], ["paths.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_requests_path_id", "requests", ["path_id"])
+        op.create_index("ix_requests_timestamp", "requests", ["timestamp"])
+
+
+def downgrade():
+    op.drop_table("requests")
+    op.drop_table("paths")
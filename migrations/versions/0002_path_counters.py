@@ -0,0 +1,98 @@
+"""Denormalized request counters on paths.
+
+Adds requests.body_size and paths.request_count / last_request_at /
+total_body_bytes, then backfills them from existing rows.
+
+Revision ID: 0002_path_counters
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:00:01
+
+"""
+from contextlib import nullcontext
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_path_counters"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    # Constant server defaults make these metadata-only changes on PostgreSQL
+    op.add_column(
+        "requests",
+        sa.Column("body_size", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "paths",
+        sa.Column("request_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("paths", sa.Column("last_request_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "paths",
+        sa.Column(
+            "total_body_bytes", sa.BigInteger(), nullable=False, server_default="0"
+        ),
+    )
+
+    bind = op.get_bind()
+    online = bind.dialect.name == "postgresql"
+    if online:
+        byte_length = "octet_length(body)"
+    else:
+        byte_length = "length(CAST(body AS BLOB))"
+
+    # Backfill body sizes in batches. On PostgreSQL each batch commits on its
+    # own, outside the migration transaction, so the ADD COLUMN locks are
+    # released first and captures keep being written between batches
+    with op.get_context().autocommit_block() if online else nullcontext():
+        while True:
+            result = bind.execute(
+                sa.text(
+                    f"""
+                    UPDATE requests SET body_size = {byte_length}
+                    WHERE id IN (
+                        SELECT id FROM requests
+                        WHERE body IS NOT NULL AND body <> '' AND body_size = 0
+                        LIMIT :batch_size
+                    )
+                    """
+                ),
+                {"batch_size": BATCH_SIZE},
+            )
+            if result.rowcount < BATCH_SIZE:
+                break
+
+    bind.execute(
+        sa.text(
+            """
+            UPDATE paths SET
+                request_count = (
+                    SELECT COUNT(*) FROM requests WHERE requests.path_id = paths.id
+                ),
+                total_body_bytes = (
+                    SELECT COALESCE(SUM(body_size), 0) FROM requests
+                    WHERE requests.path_id = paths.id
+                ),
+                last_request_at = (
+                    SELECT MAX(timestamp) FROM requests
+                    WHERE requests.path_id = paths.id
+                )
+            """
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("paths") as batch_op:
+        batch_op.drop_column("total_body_bytes")
+        batch_op.drop_column("last_request_at")
+        batch_op.drop_column("request_count")
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("body_size")
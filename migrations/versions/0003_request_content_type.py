@@ -0,0 +1,64 @@
+"""Add requests.content_type for grouping statistics.
+
+Revision ID: 0003_request_content_type
+Revises: 0002_path_counters
+Create Date: 2026-10-17 00:00:02
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_request_content_type"
+down_revision = "0002_path_counters"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade():
+    op.add_column(
+        "requests", sa.Column("content_type", sa.String(length=255), nullable=True)
+    )
+
+    # Backfill from the stored headers, walking the table in primary key order
+    bind = op.get_bind()
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, headers FROM requests WHERE id > :last_id "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for request_id, headers in rows:
+            try:
+                headers = json.loads(headers) if headers else {}
+            except ValueError:
+                headers = {}
+            for key, value in headers.items():
+                if key.lower() == "content-type" and value:
+                    media_type = value.split(";")[0].strip().lower()[:255]
+                    updates.append({"id": request_id, "content_type": media_type})
+                    break
+
+        if updates:
+            bind.execute(
+                sa.text("UPDATE requests SET content_type = :content_type WHERE id = :id"),
+                updates,
+            )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("content_type")
@@ -0,0 +1,50 @@
+"""Index requests on (path_id, timestamp DESC, id DESC) for keyset pagination.
+
+Revision ID: 0004_requests_keyset_index
+Revises: 0003_request_content_type
+Create Date: 2026-10-17 00:00:03
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_requests_keyset_index"
+down_revision = "0003_request_content_type"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_requests_path_id_timestamp_id"
+
+
+def _create_index(name, columns):
+    """Create an index, without blocking writes on PostgreSQL."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(name, "requests", columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, "requests", columns)
+
+
+def _drop_index(name):
+    """Drop an index, without blocking writes on PostgreSQL."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name="requests", postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name="requests")
+
+
+def upgrade():
+    _create_index(
+        INDEX_NAME,
+        [sa.text("path_id"), sa.text('"timestamp" DESC'), sa.text("id DESC")],
+    )
+    # The new index leads with path_id, so the single-column one is redundant
+    _drop_index("ix_requests_path_id")
+
+
+def downgrade():
+    _create_index("ix_requests_path_id", ["path_id"])
+    _drop_index(INDEX_NAME)
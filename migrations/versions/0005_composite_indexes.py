@@ -0,0 +1,55 @@
+"""Index requests by (path_id, method, timestamp) and paths by created_at.
+
+Revision ID: 0005_composite_indexes
+Revises: 0004_requests_keyset_index
+Create Date: 2026-10-17 00:00:04
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_composite_indexes"
+down_revision = "0004_requests_keyset_index"
+branch_labels = None
+depends_on = None
+
+
+def _create_index(name, table, columns):
+    """Create an index, without blocking writes on PostgreSQL."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns)
+
+
+def _drop_index(name, table):
+    """Drop an index, without blocking writes on PostgreSQL."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name=table)
+
+
+def upgrade():
+    # /logs?method=... newest first, and keyset pagination within a method
+    _create_index(
+        "ix_requests_path_id_method_timestamp_id",
+        "requests",
+        [
+            sa.text("path_id"),
+            sa.text("method"),
+            sa.text('"timestamp" DESC'),
+            sa.text("id DESC"),
+        ],
+    )
+    # Path listings and incremental path filter refreshes
+    _create_index("ix_paths_created_at", "paths", ["created_at"])
+
+
+def downgrade():
+    _drop_index("ix_paths_created_at", "paths")
+    _drop_index("ix_requests_path_id_method_timestamp_id", "requests")
@@ -0,0 +1,124 @@
+"""Store requests.headers and query_params as JSONB (JSON on SQLite).
+
+On PostgreSQL the new JSONB columns are added and filled in batches outside
+the migration transaction, each batch committed on its own, so captures keep
+being written meanwhile. A last pass then copies the rows written since,
+under a lock blocking writes, and the new columns replace the old ones.
+Rows that do not hold valid JSON become ``{}``.
+
+Revision ID: 0006_requests_jsonb
+Revises: 0005_composite_indexes
+Create Date: 2026-10-17 00:00:05
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_requests_jsonb"
+down_revision = "0005_composite_indexes"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+COLUMNS = ("headers", "query_params")
+
+
+def _as_document(value):
+    """Parse a stored JSON string, falling back to an empty object."""
+    try:
+        document = json.loads(value) if value else {}
+    except ValueError:
+        return "{}"
+    return json.dumps(document if isinstance(document, dict) else {})
+
+
+def _copy_pending_rows(bind):
+    """Copy rows whose JSONB columns are still empty, walking by primary key."""
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, headers, query_params FROM requests "
+                "WHERE id > :last_id AND headers_jsonb IS NULL "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        bind.execute(
+            sa.text(
+                "UPDATE requests SET headers_jsonb = CAST(:headers AS jsonb), "
+                "query_params_jsonb = CAST(:query_params AS jsonb) WHERE id = :id"
+            ),
+            [
+                {
+                    "id": request_id,
+                    "headers": _as_document(headers),
+                    "query_params": _as_document(query_params),
+                }
+                for request_id, headers, query_params in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table("requests") as batch_op:
+            for column in COLUMNS:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.Text(),
+                    type_=sa.JSON(),
+                    existing_nullable=False,
+                )
+        return
+
+    # Every statement commits on its own: ADD COLUMN only holds its lock
+    # briefly, and ingest carries on between batches
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.add_column(
+                "requests",
+                sa.Column(f"{column}_jsonb", postgresql.JSONB(), nullable=True),
+            )
+        _copy_pending_rows(bind)
+        # Pick up rows written while the first pass was running
+        _copy_pending_rows(bind)
+
+    # Back in the migration transaction: block writes until the columns are
+    # swapped, so no row is left behind; reads carry on
+    op.execute("LOCK TABLE requests IN EXCLUSIVE MODE")
+    _copy_pending_rows(bind)
+
+    for column in COLUMNS:
+        op.drop_column("requests", column)
+        op.alter_column(
+            "requests",
+            f"{column}_jsonb",
+            new_column_name=column,
+            nullable=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table("requests") as batch_op:
+        for column in COLUMNS:
+            batch_op.alter_column(
+                column,
+                existing_type=(
+                    postgresql.JSONB() if bind.dialect.name == "postgresql" else sa.JSON()
+                ),
+                type_=sa.Text(),
+                existing_nullable=False,
+                postgresql_using=f"{column}::text",
+            )
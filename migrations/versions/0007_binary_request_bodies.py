@@ -0,0 +1,95 @@
+"""Store request bodies as raw bytes and record the declared charset.
+
+On PostgreSQL the new bytea column is added and filled in batches outside
+the migration transaction, each batch committed on its own, so captures keep
+being written meanwhile. A last pass then copies the rows written since,
+under a lock blocking writes, and the new column replaces the old one.
+Existing text bodies are encoded as UTF-8.
+
+Revision ID: 0007_binary_request_bodies
+Revises: 0006_requests_jsonb
+Create Date: 2026-10-17 00:00:06
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_binary_request_bodies"
+down_revision = "0006_requests_jsonb"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def _copy_pending_rows(bind):
+    """Encode text bodies into body_bytes, walking by primary key."""
+    last_id = ""
+    while True:
+        copied = bind.execute(
+            sa.text(
+                "UPDATE requests SET body_bytes = convert_to(body, 'UTF8') "
+                "WHERE id IN ("
+                "  SELECT id FROM requests"
+                "  WHERE id > :last_id AND body IS NOT NULL AND body_bytes IS NULL"
+                "  ORDER BY id LIMIT :batch_size"
+                ") RETURNING id"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).fetchall()
+        if not copied:
+            break
+        last_id = max(row[0] for row in copied)
+
+
+def upgrade():
+    op.add_column("requests", sa.Column("charset", sa.String(length=40), nullable=True))
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table("requests") as batch_op:
+            batch_op.alter_column(
+                "body", existing_type=sa.Text(), type_=sa.LargeBinary()
+            )
+        # SQLite keeps the storage class of existing values; make them blobs
+        op.execute("UPDATE requests SET body = CAST(body AS BLOB) WHERE body IS NOT NULL")
+        return
+
+    # Every statement commits on its own, as in 0006_requests_jsonb
+    with op.get_context().autocommit_block():
+        op.add_column(
+            "requests", sa.Column("body_bytes", sa.LargeBinary(), nullable=True)
+        )
+        _copy_pending_rows(bind)
+        # Pick up rows written while the first pass was running
+        _copy_pending_rows(bind)
+
+    # Copy the last rows with writes blocked until the columns are swapped
+    op.execute("LOCK TABLE requests IN EXCLUSIVE MODE")
+    _copy_pending_rows(bind)
+    op.drop_column("requests", "body")
+    op.alter_column("requests", "body_bytes", new_column_name="body")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        # Bodies that are not valid UTF-8 cannot go back to text
+        op.alter_column(
+            "requests",
+            "body",
+            existing_type=sa.LargeBinary(),
+            type_=sa.Text(),
+            postgresql_using="convert_from(body, 'UTF8')",
+        )
+    else:
+        op.execute("UPDATE requests SET body = CAST(body AS TEXT) WHERE body IS NOT NULL")
+        with op.batch_alter_table("requests") as batch_op:
+            batch_op.alter_column(
+                "body", existing_type=sa.LargeBinary(), type_=sa.Text()
+            )
+
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("charset")
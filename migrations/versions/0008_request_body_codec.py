@@ -0,0 +1,61 @@
+"""Add requests.body_codec recording how each stored body is compressed.
+
+Existing bodies are left uncompressed (codec 0).
+
+Revision ID: 0008_request_body_codec
+Revises: 0007_binary_request_bodies
+Create Date: 2026-10-17 00:00:07
+
+"""
+import lzma
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_request_body_codec"
+down_revision = "0007_binary_request_bodies"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+DECOMPRESSORS = {1: zlib.decompress, 2: lzma.decompress}
+
+
+def upgrade():
+    op.add_column(
+        "requests",
+        sa.Column("body_codec", sa.SmallInteger(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    # Restore compressed bodies first; they are unreadable without their codec
+    bind = op.get_bind()
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, body, body_codec FROM requests "
+                "WHERE id > :last_id AND body_codec <> 0 "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        bind.execute(
+            sa.text("UPDATE requests SET body = :body, body_codec = 0 WHERE id = :id")
+            .bindparams(sa.bindparam("body", type_=sa.LargeBinary())),
+            [
+                {"id": request_id, "body": DECOMPRESSORS[codec](bytes(body))}
+                for request_id, body, codec in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("body_codec")
@@ -0,0 +1,160 @@
+"""Move request bodies into the content-addressed request_bodies table.
+
+Each distinct body is stored once, keyed by the SHA-256 digest of its raw
+bytes, with a count of the requests referencing it. Existing bodies are
+moved in batches, keeping their compression. On PostgreSQL each batch is
+committed on its own outside the migration transaction, so captures keep
+being written meanwhile; a last pass then moves the rows written since,
+under a lock blocking writes, before the old columns are dropped.
+
+Revision ID: 0009_request_bodies
+Revises: 0008_request_body_codec
+Create Date: 2026-10-17 00:00:08
+
+"""
+import hashlib
+import lzma
+import zlib
+from contextlib import nullcontext
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0009_request_bodies"
+down_revision = "0008_request_body_codec"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+DECOMPRESSORS = {0: bytes, 1: zlib.decompress, 2: lzma.decompress}
+
+
+def _move_pending_bodies(bind, commit_batches=False):
+    """Move bodies not yet in request_bodies, walking by primary key.
+
+    With ``commit_batches`` the connection must be in autocommit mode; each
+    batch then runs in a transaction of its own, so a body's reference is
+    never counted without the request pointing at it.
+    """
+    upsert = sa.text(
+        "INSERT INTO request_bodies (digest, codec, size, refcount, data, created_at) "
+        "VALUES (:digest, :codec, :size, :refcount, :data, :created_at) "
+        "ON CONFLICT (digest) DO UPDATE "
+        "SET refcount = request_bodies.refcount + excluded.refcount"
+    ).bindparams(sa.bindparam("data", type_=sa.LargeBinary()))
+
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, body, body_codec FROM requests "
+                "WHERE id > :last_id AND body IS NOT NULL AND body_digest IS NULL "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        bodies = {}
+        digests = []
+        for request_id, data, codec in rows:
+            data = bytes(data)
+            raw = DECOMPRESSORS[codec](data)
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest in bodies:
+                bodies[digest]["refcount"] += 1
+            else:
+                bodies[digest] = {
+                    "digest": digest,
+                    "codec": codec,
+                    "size": len(raw),
+                    "refcount": 1,
+                    "data": data,
+                    "created_at": datetime.utcnow(),
+                }
+            digests.append({"id": request_id, "digest": digest})
+
+        if commit_batches:
+            bind.execute(sa.text("BEGIN"))
+        # Sorted, so concurrent writers lock body rows in the same order
+        bind.execute(upsert, [bodies[digest] for digest in sorted(bodies)])
+        bind.execute(
+            sa.text("UPDATE requests SET body_digest = :digest WHERE id = :id"),
+            digests,
+        )
+        if commit_batches:
+            bind.execute(sa.text("COMMIT"))
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    bind = op.get_bind()
+    online = bind.dialect.name == "postgresql"
+    with op.get_context().autocommit_block() if online else nullcontext():
+        op.create_table(
+            "request_bodies",
+            sa.Column("digest", sa.String(length=64), nullable=False),
+            sa.Column("codec", sa.SmallInteger(), nullable=False, server_default="0"),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("refcount", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("digest"),
+        )
+        op.add_column(
+            "requests", sa.Column("body_digest", sa.String(length=64), nullable=True)
+        )
+        _move_pending_bodies(bind, commit_batches=online)
+
+    if online:
+        # Move the last rows with writes blocked until the columns are dropped
+        op.execute("LOCK TABLE requests IN EXCLUSIVE MODE")
+        _move_pending_bodies(bind)
+
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("body")
+        batch_op.drop_column("body_codec")
+
+
+def downgrade():
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.add_column(sa.Column("body", sa.LargeBinary(), nullable=True))
+        batch_op.add_column(
+            sa.Column(
+                "body_codec", sa.SmallInteger(), nullable=False, server_default="0"
+            )
+        )
+
+    bind = op.get_bind()
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT requests.id, request_bodies.data, request_bodies.codec "
+                "FROM requests JOIN request_bodies "
+                "ON request_bodies.digest = requests.body_digest "
+                "WHERE requests.id > :last_id ORDER BY requests.id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        bind.execute(
+            sa.text(
+                "UPDATE requests SET body = :body, body_codec = :codec WHERE id = :id"
+            ).bindparams(sa.bindparam("body", type_=sa.LargeBinary())),
+            [
+                {"id": request_id, "body": bytes(data), "codec": codec}
+                for request_id, data, codec in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("body_digest")
+    op.drop_table("request_bodies")
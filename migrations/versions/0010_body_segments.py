@@ -0,0 +1,57 @@
+"""Let request bodies live in blob store segment files.
+
+Adds the segment and offset of spilled bodies, with a partial index over
+spilled rows only, and makes the inline data nullable.
+
+Revision ID: 0010_body_segments
+Revises: 0009_request_bodies
+Create Date: 2026-10-17 00:00:09
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010_body_segments"
+down_revision = "0009_request_bodies"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("request_bodies") as batch_op:
+        batch_op.add_column(sa.Column("segment", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("segment_offset", sa.BigInteger(), nullable=True))
+        batch_op.alter_column("data", existing_type=sa.LargeBinary(), nullable=True)
+
+    # Every row has a NULL segment here, so the index is empty and quick to build
+    op.create_index(
+        "ix_request_bodies_segment",
+        "request_bodies",
+        ["segment"],
+        postgresql_where=sa.text("segment IS NOT NULL"),
+        sqlite_where=sa.text("segment IS NOT NULL"),
+    )
+
+
+def downgrade():
+    # Spilled bodies cannot be restored without the segment files
+    spilled = (
+        op.get_bind()
+        .execute(
+            sa.text("SELECT COUNT(*) FROM request_bodies WHERE segment IS NOT NULL")
+        )
+        .scalar()
+    )
+    if spilled:
+        raise RuntimeError(
+            f"{spilled} request bodies are stored in segment files and would be "
+            "lost; delete them before downgrading"
+        )
+
+    op.drop_index("ix_request_bodies_segment", table_name="request_bodies")
+    with op.batch_alter_table("request_bodies") as batch_op:
+        batch_op.alter_column("data", existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.drop_column("segment_offset")
+        batch_op.drop_column("segment")
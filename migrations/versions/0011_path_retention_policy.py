@@ -0,0 +1,33 @@
+"""Add per-path retention policies.
+
+Adds the optional request, age and byte limits of a path; NULL means the
+global retention applies.
+
+Revision ID: 0011_path_retention_policy
+Revises: 0010_body_segments
+Create Date: 2026-10-17 00:00:10
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0011_path_retention_policy"
+down_revision = "0010_body_segments"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("paths") as batch_op:
+        batch_op.add_column(sa.Column("max_requests", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("max_age", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("max_bytes", sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("paths") as batch_op:
+        batch_op.drop_column("max_bytes")
+        batch_op.drop_column("max_age")
+        batch_op.drop_column("max_requests")
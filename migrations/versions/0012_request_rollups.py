@@ -0,0 +1,51 @@
+"""Add per-minute, hourly and daily request rollups.
+
+Creates request_rollups and seeds it from the requests already stored, in
+hour buckets, so time series cover history captured before the upgrade.
+
+Revision ID: 0012_request_rollups
+Revises: 0011_path_retention_policy
+Create Date: 2026-10-17 00:00:11
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0012_request_rollups"
+down_revision = "0011_path_retention_policy"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "request_rollups",
+        sa.Column("path_id", sa.String(length=36), nullable=False),
+        sa.Column("unit", sa.String(length=6), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("method", sa.String(length=10), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("body_bytes", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(["path_id"], ["paths.id"]),
+        sa.PrimaryKeyConstraint("path_id", "unit", "bucket", "method"),
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        hour = "date_trunc('hour', timestamp)"
+    else:
+        # Same text form as the DateTime values SQLAlchemy writes
+        hour = "strftime('%Y-%m-%d %H:00:00.000000', timestamp)"
+    op.execute(
+        "INSERT INTO request_rollups "
+        "(path_id, unit, bucket, method, count, body_bytes) "
+        f"SELECT path_id, 'hour', {hour}, method, COUNT(*), "
+        "COALESCE(SUM(body_size), 0) FROM requests "
+        f"GROUP BY path_id, {hour}, method"
+    )
+
+
+def downgrade():
+    op.drop_table("request_rollups")
@@ -0,0 +1,75 @@
+"""Add replay jobs and their per-request results.
+
+Revision ID: 0013_replay_jobs
+Revises: 0012_request_rollups
+Create Date: 2026-10-17 00:00:12
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0013_replay_jobs"
+down_revision = "0012_request_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "replay_jobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("path_id", sa.String(length=36), nullable=False),
+        sa.Column("target_url", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(length=12), nullable=False),
+        sa.Column("method", sa.String(length=10), nullable=True),
+        sa.Column("since", sa.DateTime(), nullable=True),
+        sa.Column("until", sa.DateTime(), nullable=True),
+        sa.Column("concurrency", sa.Integer(), nullable=False),
+        sa.Column("rate_limit", sa.Float(), nullable=True),
+        sa.Column("ordered", sa.Boolean(), nullable=False),
+        sa.Column("max_retries", sa.Integer(), nullable=False),
+        sa.Column("timeout", sa.Float(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("sent", sa.Integer(), nullable=False),
+        sa.Column("succeeded", sa.Integer(), nullable=False),
+        sa.Column("failed", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["path_id"], ["paths.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_replay_jobs_path_id"), "replay_jobs", ["path_id"], unique=False
+    )
+    op.create_table(
+        "replay_results",
+        sa.Column("job_id", sa.String(length=36), nullable=False),
+        sa.Column("request_id", sa.String(length=36), nullable=False),
+        sa.Column("sequence", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("duration_ms", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["replay_jobs.id"]),
+        sa.PrimaryKeyConstraint("job_id", "request_id"),
+    )
+    op.create_index(
+        "ix_replay_results_job_id_sequence",
+        "replay_results",
+        ["job_id", "sequence"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_replay_results_job_id_sequence", table_name="replay_results")
+    op.drop_table("replay_results")
+    op.drop_index(op.f("ix_replay_jobs_path_id"), table_name="replay_jobs")
+    op.drop_table("replay_jobs")
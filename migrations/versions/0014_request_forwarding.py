@@ -0,0 +1,40 @@
+"""Add path upstreams and the forwarding outcome of requests.
+
+Adds the optional upstream URL of a path and, on requests, the status,
+latency and error of forwarding them there; NULL means not forwarded.
+
+Revision ID: 0014_request_forwarding
+Revises: 0013_replay_jobs
+Create Date: 2026-10-17 00:00:13
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0014_request_forwarding"
+down_revision = "0013_replay_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("paths", sa.Column("forward_url", sa.Text(), nullable=True))
+    # Nullable columns without a default: no table rewrite on PostgreSQL
+    op.add_column("requests", sa.Column("upstream_status", sa.Integer(), nullable=True))
+    op.add_column(
+        "requests", sa.Column("upstream_latency_ms", sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        "requests", sa.Column("upstream_error", sa.String(length=20), nullable=True)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("requests") as batch_op:
+        batch_op.drop_column("upstream_error")
+        batch_op.drop_column("upstream_latency_ms")
+        batch_op.drop_column("upstream_status")
+    with op.batch_alter_table("paths") as batch_op:
+        batch_op.drop_column("forward_url")
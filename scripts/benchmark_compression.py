@@ -0,0 +1,198 @@
+"""Benchmark body compression codecs against realistic webhook payloads.
+
+For each codec and level, prints the overall compression ratio and the CPU
+time spent compressing and decompressing, per payload and per MB.
+
+Usage:
+    python scripts/benchmark_compression.py [--repeat 20] [FILE ...]
+
+Each line of every FILE (e.g. a JSON Lines export) is used as an extra
+payload, alongside generated GitHub, Stripe and Slack style events.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.compression import CODECS, CODEC_NONE  # noqa: E402
+
+LEVELS = {"zlib": [1, 6, 9], "lzma": [0, 1, 6]}
+
+
+def github_push(rng):
+    """Generate a GitHub push event with a handful of commits."""
+    commits = [
+        {
+            "id": "%040x" % rng.getrandbits(160),
+            "message": f"Fix issue #{rng.randint(1, 5000)} in module {i}",
+            "timestamp": "2025-06-14T19:44:43Z",
+            "author": {"name": "Jane Doe", "email": "jane@example.com"},
+            "added": [f"src/feature_{i}.py"],
+            "removed": [],
+            "modified": ["README.md", f"tests/test_feature_{i}.py"],
+        }
+        for i in range(rng.randint(1, 20))
+    ]
+    repository = {
+        "id": rng.randint(1, 10**8),
+        "full_name": "example/callback-listener",
+        "private": False,
+        "html_url": "https://github.com/example/callback-listener",
+        **{
+            f"{name}_url": f"https://api.github.com/repos/example/{name}"
+            for name in (
+                "branches",
+                "tags",
+                "commits",
+                "issues",
+                "pulls",
+                "releases",
+                "deployments",
+                "hooks",
+                "events",
+                "forks",
+                "keys",
+                "labels",
+            )
+        },
+    }
+    return {
+        "ref": "refs/heads/main",
+        "before": "%040x" % rng.getrandbits(160),
+        "after": "%040x" % rng.getrandbits(160),
+        "repository": repository,
+        "pusher": {"name": "jane", "email": "jane@example.com"},
+        "commits": commits,
+        "head_commit": commits[-1],
+    }
+
+
+def stripe_event(rng):
+    """Generate a Stripe payment event."""
+    return {
+        "id": f"evt_{rng.getrandbits(64):x}",
+        "object": "event",
+        "api_version": "2024-06-20",
+        "created": rng.randint(1_700_000_000, 1_800_000_000),
+        "type": "payment_intent.succeeded",
+        "data": {
+            "object": {
+                "id": f"pi_{rng.getrandbits(64):x}",
+                "object": "payment_intent",
+                "amount": rng.randint(100, 100000),
+                "currency": "usd",
+                "customer": f"cus_{rng.getrandbits(48):x}",
+                "metadata": {"order_id": str(rng.randint(1, 10**6))},
+                "payment_method_types": ["card"],
+                "status": "succeeded",
+                "charges": {
+                    "object": "list",
+                    "data": [
+                        {
+                            "id": f"ch_{rng.getrandbits(64):x}",
+                            "amount": 2999,
+                            "billing_details": {
+                                "address": {"city": "Berlin", "country": "DE"},
+                                "email": "customer@example.com",
+                            },
+                            "outcome": {"network_status": "approved_by_network"},
+                        }
+                    ],
+                },
+            }
+        },
+    }
+
+
+def slack_event(rng):
+    """Generate a small Slack message event."""
+    return {
+        "token": "XXYYZZ",
+        "team_id": "T123ABC456",
+        "event": {
+            "type": "message",
+            "channel": "C123ABC456",
+            "user": "U123ABC456",
+            "text": "Deploy finished " + " ".join(["ok"] * rng.randint(1, 30)),
+            "ts": f"{rng.randint(1_700_000_000, 1_800_000_000)}.000200",
+        },
+        "type": "event_callback",
+    }
+
+
+def build_payloads(files, seed=1):
+    """Return the payloads to benchmark as bytes."""
+    rng = random.Random(seed)
+    payloads = []
+    for generator in (github_push, stripe_event, slack_event):
+        payloads += [
+            json.dumps(generator(rng), indent=2).encode("utf-8") for _ in range(50)
+        ]
+    for path in files:
+        with open(path, "rb") as f:
+            payloads += [line for line in f if line.strip()]
+    return payloads
+
+
+def benchmark(payloads, codec, level, repeat):
+    """Return (ratio, compress seconds, decompress seconds) over all payloads."""
+    compressed = [codec.compress(payload, level) for payload in payloads]
+
+    start = time.process_time()
+    for _ in range(repeat):
+        for payload in payloads:
+            codec.compress(payload, level)
+    compress_time = (time.process_time() - start) / repeat
+
+    start = time.process_time()
+    for _ in range(repeat):
+        for data in compressed:
+            codec.decompress(data)
+    decompress_time = (time.process_time() - start) / repeat
+
+    raw = sum(len(payload) for payload in payloads)
+    stored = sum(len(data) for data in compressed)
+    return raw / stored, compress_time, decompress_time
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.files)
+    raw_mb = sum(len(payload) for payload in payloads) / 1e6
+    sizes = sorted(len(payload) for payload in payloads)
+    print(
+        f"{len(payloads)} payloads, {raw_mb * 1000:.0f} KB, "
+        f"median {sizes[len(sizes) // 2]} bytes, max {sizes[-1]} bytes\n"
+    )
+    print(
+        f"{'codec':<6} {'level':>5} {'ratio':>6} {'comp us':>8} {'comp ms/MB':>11} "
+        f"{'decomp us':>10} {'decomp ms/MB':>13}"
+    )
+    for codec in CODECS.values():
+        if codec.id == CODEC_NONE:
+            continue
+        for level in LEVELS[codec.name]:
+            ratio, compress_time, decompress_time = benchmark(
+                payloads, codec, level, args.repeat
+            )
+            print(
+                f"{codec.name:<6} {level:>5} {ratio:>6.2f} "
+                f"{compress_time / len(payloads) * 1e6:>8.1f} "
+                f"{compress_time / raw_mb * 1e3:>11.2f} "
+                f"{decompress_time / len(payloads) * 1e6:>10.1f} "
+                f"{decompress_time / raw_mb * 1e3:>13.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Benchmark the /logs endpoint with and without the composite request indexes.
+
+Seeds a scratch database, then for each index layout prints the query plan
+of the listing queries and the median latency of /api/paths/<path_id>/logs
+at increasing depths, paging by offset and by cursor.
+
+The "before" layout is the original single-column index on path_id; the
+"after" layout is the composite indexes declared on the Request model.
+
+Usage:
+    python scripts/benchmark_logs.py [--requests 100000] [--database-url URL]
+
+Without --database-url a temporary SQLite file is used. A PostgreSQL URL must
+point at an empty, throwaway database: the script creates the tables, drops
+and recreates indexes, and drops everything again when it is done.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+METHODS = ["POST", "POST", "POST", "GET", "PUT", "DELETE"]
+PAGE_SIZE = 50
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--other-paths", type=int, default=9)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    return parser.parse_args()
+
+
+def seed(db, Path, Request, total, other_paths):
+    """Create the benchmarked path plus noise paths, sharing ``total`` rows."""
+    from app.models.request_body import RequestBody
+
+    body = RequestBody.prepare(b'{"event": "benchmark"}')
+    paths = [Path.create_new_path(path_id="benchmark-target")]
+    paths += [
+        Path.create_new_path(path_id=f"benchmark-noise-{i}") for i in range(other_paths)
+    ]
+
+    start = datetime.utcnow() - timedelta(days=30)
+    rows = []
+    for i in range(total):
+        # Half of all traffic goes to the benchmarked path
+        path = paths[0] if i % 2 == 0 else paths[1 + i % other_paths]
+        rows.append(
+            {
+                "id": str(uuid.uuid4()),
+                "path_id": path.id,
+                "method": METHODS[i % len(METHODS)],
+                "headers": {"Content-Type": "application/json"},
+                "body_digest": body["digest"],
+                "body": body,
+                "body_size": body["size"],
+                "content_type": "application/json",
+                "query_params": {},
+                "ip_address": "127.0.0.1",
+                "user_agent": "benchmark",
+                "timestamp": start + timedelta(seconds=i),
+            }
+        )
+        if len(rows) == 5000:
+            Request.bulk_insert(rows)
+            rows = []
+    Request.bulk_insert(rows)
+    return paths[0]
+
+
+def use_layout(db, Request, layout):
+    """Switch the requests table to the "before" or "after" index layout."""
+    from sqlalchemy import Index
+
+    table = Request.__table__
+    composite = [index for index in table.indexes if len(index.expressions) > 1]
+    legacy = Index("ix_requests_path_id", table.c.path_id)
+
+    with db.engine.begin() as connection:
+        for index in composite + [legacy]:
+            index.drop(connection, checkfirst=True)
+        for index in composite if layout == "after" else [legacy]:
+            index.create(connection)
+        connection.exec_driver_sql("ANALYZE")
+
+
+def explain(db, statement):
+    """Return the query plan for a statement as text."""
+    dialect = db.engine.dialect
+    compiled = statement.compile(dialect=dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    prefix = (
+        "EXPLAIN ANALYZE " if dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    )
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    return "\n".join(f"    {row[-1]}" for row in rows)
+
+
+def median_ms(client, url, repeat):
+    """Return the median latency of GET ``url`` in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.data
+    return statistics.median(timings)
+
+
+def run_layout(db, Request, client, target, depths, repeat):
+    """Print plans and latencies for the current index layout."""
+    from sqlalchemy import select, tuple_
+
+    from app.utils.helpers import encode_cursor
+
+    newest_first = (Request.timestamp.desc(), Request.id.desc())
+    by_path = select(Request).where(Request.path_id == target.id)
+    deepest = depths[-1]
+    boundary = db.session.execute(
+        by_path.order_by(*newest_first).offset(deepest).limit(1)
+    ).scalar_one()
+
+    plans = {
+        "latest page": by_path.order_by(*newest_first).limit(PAGE_SIZE + 1),
+        f"offset {deepest}": by_path.order_by(*newest_first)
+        .offset(deepest)
+        .limit(PAGE_SIZE + 1),
+        f"cursor at {deepest}": by_path.where(
+            tuple_(Request.timestamp, Request.id)
+            < tuple_(boundary.timestamp, boundary.id)
+        )
+        .order_by(*newest_first)
+        .limit(PAGE_SIZE + 1),
+        "method=GET": by_path.where(Request.method == "GET")
+        .order_by(*newest_first)
+        .limit(PAGE_SIZE + 1),
+    }
+    for name, statement in plans.items():
+        print(f"  plan ({name}):")
+        print(explain(db, statement))
+
+    base = f"/api/paths/{target.path_id}/logs?limit={PAGE_SIZE}&include_body=false"
+    print(f"  {'depth':>8} {'offset ms':>10} {'cursor ms':>10}")
+    for depth in depths:
+        row = db.session.execute(
+            by_path.order_by(*newest_first).offset(max(depth - 1, 0)).limit(1)
+        ).scalar_one()
+        cursor = encode_cursor(row.timestamp, row.id, "next")
+        offset_ms = median_ms(client, f"{base}&offset={depth}", repeat)
+        cursor_url = f"{base}&cursor={cursor}" if depth else base
+        cursor_ms = median_ms(client, cursor_url, repeat)
+        print(f"  {depth:>8} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+    db.session.remove()
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+
+    scratch = None
+    database_url = args.database_url
+    if not database_url:
+        fd, scratch = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{scratch}"
+    # Read by the configuration classes at import time
+    os.environ["DATABASE_URL"] = database_url
+
+    from sqlalchemy import inspect
+
+    from app import create_app, db
+    from app.models.path import Path
+    from app.models.request import Request
+
+    app = create_app("production")
+
+    with app.app_context():
+        if not scratch and inspect(db.engine).has_table("paths"):
+            sys.exit("Refusing to run: the database already has a paths table")
+
+    try:
+        with app.app_context():
+            db.create_all()
+            print(f"Seeding {args.requests} requests into {db.engine.url!r}...")
+            start = time.perf_counter()
+            target = seed(db, Path, Request, args.requests, args.other_paths)
+            print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+            per_path = target.request_count
+            depths = [0, per_path // 10, per_path // 2, per_path - PAGE_SIZE]
+            client = app.test_client()
+
+            for layout in ("before", "after"):
+                use_layout(db, Request, layout)
+                print(f"\n== {layout} ==")
+                run_layout(db, Request, client, target, depths, args.repeat)
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+        if scratch:
+            os.unlink(scratch)
+
+
+if __name__ == "__main__":
+    main()
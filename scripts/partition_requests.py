@@ -0,0 +1,61 @@
+"""Convert the requests table to daily or weekly partitions and maintain them.
+
+Commands:
+    convert  Replace an unpartitioned requests table with a partitioned one,
+             copying existing rows over in batches
+    ensure   Create the partitions for today and REQUESTS_PARTITIONS_AHEAD more
+    list     Show the partitions and their ranges
+
+Usage:
+    REQUESTS_PARTITIONING=day python scripts/partition_requests.py convert
+
+PostgreSQL only. Back up the database before converting; set
+REQUESTS_PARTITIONING for the application as well, so retention drops
+partitions and pre-creates new ones.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import create_app, db  # noqa: E402
+from app.services.partitions import RequestPartitions  # noqa: E402
+
+
+def main():
+    """Run a partition command."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["convert", "ensure", "list"])
+    parser.add_argument("--granularity", choices=["day", "week"], default=None)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = create_app()
+    granularity = args.granularity or app.config["REQUESTS_PARTITIONING"]
+    if granularity == "none":
+        sys.exit("Set REQUESTS_PARTITIONING or pass --granularity day|week")
+
+    partitions = RequestPartitions(
+        granularity, ahead=app.config["REQUESTS_PARTITIONS_AHEAD"]
+    )
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            sys.exit("Partitioning requires PostgreSQL")
+
+        if args.command == "convert":
+            copied = partitions.convert(batch_size=args.batch_size)
+            print(f"Copied {copied} requests into the partitioned table")
+        elif args.command == "ensure":
+            if not partitions.is_partitioned():
+                sys.exit("The requests table is not partitioned; run convert")
+            for name in partitions.ensure():
+                print(f"Created {name}")
+        else:
+            for partition in partitions.partitions():
+                print(f"{partition.name}  {partition.start} .. {partition.end}")
+
+
+if __name__ == "__main__":
+    main()
@@ -102,6 +102,7 @@ def seed_development_data():
                     method=req_data["method"],
                     headers=req_data["headers"],
                     body=req_data["body"],
+                    body_size=len((req_data["body"] or "").encode("utf-8")),
                     query_params=req_data["query_params"],
                     ip_address=req_data["ip_address"],
                     user_agent=req_data["user_agent"],
@@ -111,6 +112,7 @@ def seed_development_data():
                 db.session.add(request)
 
         db.session.commit()
+        Path.recalculate_counters()
 
         # Print summary
         total_paths = Path.query.count()
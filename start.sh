@@ -11,23 +11,6 @@ if [[ "$DATABASE_URL" == postgresql* ]] || [[ "$DATABASE_URL" == mysql* ]]; then
     sleep 10
 fi
 
-# Initialize database if it doesn't exist
-echo "🗄️  Initializing database..."
-python -c "
-from app import create_app, db
-import os
-
-app = create_app()
-with app.app_context():
-    try:
-        # Try to create tables if they don't exist
-        db.create_all()
-        print('✅ Database initialized successfully')
-    except Exception as e:
-        print(f'⚠️  Database initialization warning: {e}')
-        # Continue anyway as tables might already exist
-"
-
 # Run database migrations if migrations directory exists
 if [ -d "migrations" ]; then
     echo "🔄 Running database migrations..."
@@ -46,6 +29,23 @@ with app.app_context():
 "
 fi
 
+# Create any tables the migrations did not (no-op on a migrated database)
+echo "🗄️  Initializing database..."
+python -c "
+from app import create_app, db
+import os
+
+app = create_app()
+with app.app_context():
+    try:
+        # Try to create tables if they don't exist
+        db.create_all()
+        print('✅ Database initialized successfully')
+    except Exception as e:
+        print(f'⚠️  Database initialization warning: {e}')
+        # Continue anyway as tables might already exist
+"
+
 echo "✅ Startup checks completed"
 echo "🌐 Starting Gunicorn server..."
 
@@ -1,10 +1,14 @@
 """Test configuration and fixtures."""
 
 import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
 
 import pytest
 
 from app import create_app, db
+from app.config import TestingConfig
 from app.models.path import Path
 from app.models.request import Request
 
@@ -26,6 +30,44 @@ def app():
         db.drop_all()
 
 
+@pytest.fixture(scope="function")
+def make_app(monkeypatch, tmp_path):
+    """Factory for applications with configuration overrides.
+
+    Background threads cannot share an in-memory SQLite database with the
+    test thread, so these applications use a temporary database file.
+    """
+    apps = []
+
+    def _make_app(create_tables=True, **overrides):
+        monkeypatch.setattr(
+            TestingConfig,
+            "SQLALCHEMY_DATABASE_URI",
+            f"sqlite:///{tmp_path / 'test.db'}",
+        )
+        for key, value in overrides.items():
+            monkeypatch.setattr(TestingConfig, key, value, raising=False)
+
+        app = create_app("testing")
+        if create_tables:
+            with app.app_context():
+                db.create_all()
+        apps.append(app)
+        return app
+
+    yield _make_app
+
+    for app in apps:
+        ingest_queue = app.extensions.get("ingest_queue")
+        if ingest_queue is not None:
+            ingest_queue.stop()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.session.execute(db.text("DROP TABLE IF EXISTS alembic_version"))
+            db.engine.dispose()
+
+
 @pytest.fixture(scope="function")
 def client(app):
     """Create test client."""
@@ -64,10 +106,12 @@ def sample_request(db_session, sample_path):
     """Create a sample request for testing."""
     from datetime import datetime
 
+    body = '{"test": "data"}'
     request = Request(
         path_id=sample_path.id,
         method="POST",
-        body='{"test": "data"}',
+        body=body,
+        body_size=len(body),
         ip_address="127.0.0.1",
         user_agent="Test Client",
         timestamp=datetime.utcnow(),
@@ -80,6 +124,7 @@ def sample_request(db_session, sample_path):
     request.query_params_dict = {"param1": "value1"}
 
     db_session.add(request)
+    Path.add_to_counters({sample_path.id: (1, request.body_size, request.timestamp)})
     db_session.commit()
     return request
 
@@ -88,3 +133,75 @@ def sample_request(db_session, sample_path):
 def auth_headers():
     """Headers for authenticated requests."""
     return {"Content-Type": "application/json", "Accept": "application/json"}
+
+
+class TargetServer:
+    """Local HTTP server standing in for a replay or forwarding target.
+
+    Records every request it receives in ``received``. ``respond`` may be
+    set to a function taking the recorded request and returning a status
+    code, (status, headers) or (status, headers, body); every request gets
+    an empty 200 by default.
+    """
+
+    def __init__(self):
+        """Start the server on a free port."""
+        self.received = []
+        self.respond = None
+        self._lock = threading.Lock()
+        target = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle_one_request(self):
+                self.raw_requestline = self.rfile.readline(65537)
+                if not self.raw_requestline:
+                    self.close_connection = True
+                    return
+                if not self.parse_request():
+                    return
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                record = {
+                    "method": self.command,
+                    "path": url.path,
+                    "query": dict(parse_qsl(url.query)),
+                    "headers": dict(self.headers),
+                    "body": self.rfile.read(length),
+                }
+                with target._lock:
+                    target.received.append(record)
+                status, headers, body = 200, {}, b""
+                if target.respond is not None:
+                    status = target.respond(record)
+                    if isinstance(status, tuple):
+                        status, headers, body = (status + (b"",))[:3]
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def target_server():
+    """Local HTTP server recording the requests sent to it."""
+    server = TargetServer()
+    yield server
+    server.close()
@@ -1,9 +1,17 @@
 """Tests for API endpoints."""
 
+import csv
+import gzip
+import io
 import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
 
 import pytest
 
+from app import db
 from app.models.path import Path
 from app.models.request import Request
 
@@ -33,6 +41,26 @@ class TestPathsAPI:
         data = json.loads(response.data)
         assert data["data"]["path_id"] == custom_id
 
+    def test_create_path_with_retention_policy(self, client, auth_headers):
+        """Test path creation with size and age limits."""
+        policy = {"max_requests": 100, "max_age": 3600, "max_bytes": 1048576}
+        response = client.post(
+            "/api/paths", headers=auth_headers, data=json.dumps(policy)
+        )
+
+        assert response.status_code == 201
+        data = json.loads(response.data)["data"]
+        assert {key: data[key] for key in policy} == policy
+
+    def test_create_path_invalid_retention_policy(self, client, auth_headers):
+        """Test that non-positive limits are rejected."""
+        response = client.post(
+            "/api/paths", headers=auth_headers, data=json.dumps({"max_requests": 0})
+        )
+
+        assert response.status_code == 400
+        assert "max_requests" in json.loads(response.data)["details"]
+
     def test_get_path_logs_success(self, client, sample_path, sample_request):
         """Test retrieving path logs."""
         response = client.get(f"/api/paths/{sample_path.path_id}/logs")
@@ -66,6 +94,71 @@ class TestPathsAPI:
         assert data["data"]["pagination"]["limit"] == 10
         assert data["data"]["pagination"]["offset"] == 0
 
+    def test_get_path_logs_cursor_pagination(self, client, db_session, sample_path):
+        """Test following next_cursor through the logs."""
+        for i in range(3):
+            db_session.add(
+                Request(path_id=sample_path.id, method="POST", body=f"body-{i}")
+            )
+        db_session.commit()
+
+        url = f"/api/paths/{sample_path.path_id}/logs?limit=2"
+        data = json.loads(client.get(url).data)["data"]
+        assert len(data["requests"]) == 2
+        assert data["pagination"]["prev_cursor"] is None
+        next_cursor = data["pagination"]["next_cursor"]
+        assert next_cursor
+
+        response = client.get(f"{url}&cursor={next_cursor}")
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert len(data["requests"]) == 1
+        assert data["pagination"]["offset"] is None
+        assert data["pagination"]["next_cursor"] is None
+        assert data["pagination"]["prev_cursor"]
+
+    def test_get_path_logs_method_filter(self, client, db_session, sample_path):
+        """Test filtering logs by method while paging with cursors."""
+        for method in ["POST", "GET", "POST", "GET", "GET"]:
+            db_session.add(Request(path_id=sample_path.id, method=method))
+        db_session.commit()
+
+        url = f"/api/paths/{sample_path.path_id}/logs?limit=2&method=get"
+        data = json.loads(client.get(url).data)["data"]
+        assert [r["method"] for r in data["requests"]] == ["GET", "GET"]
+        assert data["pagination"]["total"] is None
+
+        cursor = data["pagination"]["next_cursor"]
+        data = json.loads(client.get(f"{url}&cursor={cursor}").data)["data"]
+        assert [r["method"] for r in data["requests"]] == ["GET"]
+        assert data["pagination"]["next_cursor"] is None
+
+    def test_get_path_logs_since_filter(self, client, sample_path, sample_request):
+        """Test filtering logs by timestamp."""
+        base = f"/api/paths/{sample_path.path_id}/logs"
+
+        data = json.loads(client.get(f"{base}?since=2000-01-01T00:00:00Z").data)
+        assert len(data["data"]["requests"]) == 1
+        data = json.loads(client.get(f"{base}?since=2999-01-01T00:00:00Z").data)
+        assert data["data"]["requests"] == []
+        assert client.get(f"{base}?since=soon").status_code == 400
+
+    def test_get_path_logs_header_projection(self, client, sample_path, sample_request):
+        """Test returning only selected header keys."""
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/logs?headers=content-type"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert data["requests"][0]["headers"] == {"Content-Type": "application/json"}
+
+    def test_get_path_logs_invalid_cursor(self, client, sample_path):
+        """Test that a malformed cursor returns 400."""
+        response = client.get(f"/api/paths/{sample_path.path_id}/logs?cursor=bogus")
+
+        assert response.status_code == 400
+
     def test_get_specific_request(self, client, sample_path, sample_request):
         """Test retrieving specific request."""
         response = client.get(
@@ -89,6 +182,298 @@ class TestPathsAPI:
         data = json.loads(response.data)
         assert data["success"] is False
 
+    def test_get_request_body(self, client, sample_path, sample_request):
+        """Test streaming the raw body with its content type and ETag."""
+        url = f"/api/paths/{sample_path.path_id}/logs/{sample_request.id}/body"
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert response.data == b'{"test": "data"}'
+        assert response.headers["Content-Type"] == "application/json"
+        assert response.headers["Accept-Ranges"] == "bytes"
+        etag = response.headers["ETag"]
+        assert etag == f'"{sample_request.body_digest}"'
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_get_request_body_range(self, client, sample_path, sample_request):
+        """Test serving byte ranges of a body."""
+        url = f"/api/paths/{sample_path.path_id}/logs/{sample_request.id}/body"
+
+        response = client.get(url, headers={"Range": "bytes=2-5"})
+        assert response.status_code == 206
+        assert response.data == b"test"
+        assert response.headers["Content-Range"] == "bytes 2-5/16"
+
+        response = client.get(url, headers={"Range": "bytes=-6"})
+        assert response.data == b'data"}'
+
+        response = client.get(url, headers={"Range": "bytes=100-"})
+        assert response.status_code == 416
+        assert response.headers["Content-Range"] == "bytes */16"
+
+        # A stale If-Range gets the whole, current body
+        response = client.get(
+            url, headers={"Range": "bytes=2-5", "If-Range": '"stale"'}
+        )
+        assert response.status_code == 200
+        assert response.data == b'{"test": "data"}'
+
+    def test_get_request_body_not_found(self, client, sample_path):
+        """Test streaming the body of a non-existent request."""
+        response = client.get(f"/api/paths/{sample_path.path_id}/logs/missing/body")
+        assert response.status_code == 404
+
+    def test_stream_path_requests(self, app, client, sample_path):
+        """Test that a stream pushes new captures and resumes after an event."""
+        app.config.update(STREAM_HEARTBEAT=0.01, STREAM_MAX_DURATION=0.05)
+
+        response = client.get(f"/api/paths/{sample_path.path_id}/stream")
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        client.post(f"/webhook/{sample_path.path_id}", data="first")
+        body = response.get_data(as_text=True)
+
+        events = [
+            message for message in body.split("\n\n") if message.startswith("id:")
+        ]
+        assert len(events) == 1
+        event_id = events[0].split("\n")[0][len("id: ") :]
+        assert json.loads(events[0].split("data: ")[1])["body"] == "first"
+
+        client.post(f"/webhook/{sample_path.path_id}", data="second")
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/stream",
+            headers={"Last-Event-ID": event_id},
+        )
+        body = response.get_data(as_text=True)
+        assert '"body":"second"' in body
+        assert '"body":"first"' not in body
+
+    def test_stream_path_requests_limits(self, app, client, sample_path):
+        """Test stream errors: unknown path, bad resume id, full worker."""
+        assert client.get("/api/paths/missing/stream").status_code == 404
+
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/stream",
+            headers={"Last-Event-ID": "garbage"},
+        )
+        assert response.status_code == 400
+
+        app.extensions["capture_broker"].max_subscribers = 0
+        response = client.get(f"/api/paths/{sample_path.path_id}/stream")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+    def test_wait_returns_stored_requests(self, client, sample_path, sample_request):
+        """Test that waits return already captured requests right away."""
+        url = f"/api/paths/{sample_path.path_id}/logs/wait"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert json.loads(response.data)["data"]["id"] == sample_request.id
+
+        response = client.get(f"{url}?after={sample_request.id}&timeout=0.05")
+        assert response.status_code == 204
+
+    def test_wait_is_woken_by_capture(self, make_app):
+        """Test that a waiter gets a capture made while it waits."""
+        app = make_app()
+        with app.app_context():
+            Path.create_new_path("waited")
+
+        def capture():
+            time.sleep(0.2)
+            app.test_client().post("/webhook/waited", data="awaited")
+
+        capturer = threading.Thread(target=capture)
+        capturer.start()
+        started = time.monotonic()
+        response = app.test_client().get("/api/paths/waited/logs/wait?timeout=10")
+        capturer.join()
+
+        assert response.status_code == 200
+        assert json.loads(response.data)["data"]["body"] == "awaited"
+        assert time.monotonic() - started < 5
+        assert app.extensions["capture_broker"].stats()["subscribers"] == 0
+
+    def test_wait_errors(self, client, sample_path):
+        """Test wait errors: unknown path or request, invalid timeout."""
+        url = f"/api/paths/{sample_path.path_id}/logs/wait"
+        assert client.get("/api/paths/missing/logs/wait").status_code == 404
+        assert client.get(f"{url}?after=missing").status_code == 404
+        assert client.get(f"{url}?timeout=0").status_code == 400
+        assert client.get(f"{url}?timeout=soon").status_code == 400
+        assert client.get(f"{url}?timeout=3600").status_code == 400
+
+    def test_export_ndjson(self, client, db_session, sample_path, sample_request):
+        """Test that an NDJSON export holds every request, oldest first."""
+        db_session.add(
+            Request(
+                path_id=sample_path.id,
+                method="PUT",
+                body=b"\xff\xfe",
+                body_size=2,
+                timestamp=sample_request.timestamp - timedelta(minutes=1),
+            )
+        )
+        db_session.commit()
+
+        response = client.get(f"/api/paths/{sample_path.path_id}/export")
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert "test-path-123.ndjson" in response.headers["Content-Disposition"]
+        records = [json.loads(line) for line in response.data.splitlines()]
+        assert [record["method"] for record in records] == ["PUT", "POST"]
+        assert records[0]["body"] == "//4="
+        assert records[0]["body_encoding"] == "base64"
+        assert records[1]["path_id"] == sample_path.path_id
+        assert records[1]["body"] == '{"test": "data"}'
+        assert records[1]["headers"] == sample_request.headers_dict
+
+    def test_export_csv_gzip(self, client, sample_path, sample_request):
+        """Test a gzip-encoded CSV export within a time window."""
+        url = f"/api/paths/{sample_path.path_id}/export?format=csv&include_body=false"
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        rows = list(
+            csv.DictReader(io.StringIO(gzip.decompress(response.data).decode()))
+        )
+        assert len(rows) == 1
+        assert rows[0]["id"] == sample_request.id
+        assert "body" not in rows[0]
+        assert json.loads(rows[0]["query_params"]) == {"param1": "value1"}
+
+        since = (datetime.utcnow() + timedelta(days=1)).isoformat()
+        response = client.get(f"{url}&since={since}")
+        assert response.data.decode().splitlines()[1:] == []
+
+    def test_export_parquet(self, client, sample_path, sample_request):
+        """Test a Parquet export with the common headers flattened."""
+        parquet = pytest.importorskip("pyarrow.parquet")
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/export?format=parquet",
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/vnd.apache.parquet"
+        assert "Content-Encoding" not in response.headers
+        table = parquet.read_table(io.BytesIO(response.data))
+        rows = table.to_pylist()
+        assert len(rows) == 1
+        assert rows[0]["id"] == sample_request.id
+        assert rows[0]["body"] == b'{"test": "data"}'
+        assert rows[0]["header.User-Agent"] == "Test Client"
+        assert rows[0]["query.param1"] == "value1"
+
+    def test_export_columnar_without_pyarrow(self, client, sample_path, monkeypatch):
+        """Test that columnar exports fail cleanly when pyarrow is missing."""
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+        response = client.get(f"/api/paths/{sample_path.path_id}/export?format=arrow")
+
+        assert response.status_code == 501
+        assert "pyarrow" in json.loads(response.data)["error"]
+
+    def test_export_errors(self, client, sample_path):
+        """Test export errors: unknown path, format or window."""
+        url = f"/api/paths/{sample_path.path_id}/export"
+        assert client.get("/api/paths/missing/export").status_code == 404
+        assert client.get(f"{url}?format=xml").status_code == 400
+        assert client.get(f"{url}?since=2025-02-01&until=2025-01-01").status_code == 400
+
+    def test_get_path_stats(self, client, sample_path):
+        """Test the path statistics endpoint."""
+        client.post(f"/webhook/{sample_path.path_id}", json={"event": "test"})
+        response = client.get(f"/api/paths/{sample_path.path_id}/stats")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert data["total_requests"] == 1
+        assert data["method_counts"] == {"POST": 1}
+        assert len(data["requests_per_hour"]) == 1
+
+    def test_get_path_stats_window(self, client, sample_path, sample_request):
+        """Test that the window excludes requests outside it."""
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/stats"
+            "?since=2000-01-01T00:00:00Z&until=2000-01-02T00:00:00Z"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert data["total_requests"] == 0
+        assert data["last_request"] is None
+
+    def test_get_path_stats_invalid_window(self, client, sample_path):
+        """Test that malformed or inverted windows are rejected."""
+        base = f"/api/paths/{sample_path.path_id}/stats"
+
+        assert client.get(f"{base}?since=yesterday").status_code == 400
+        assert (
+            client.get(f"{base}?since=2024-01-02&until=2024-01-01").status_code == 400
+        )
+
+    def test_get_path_stats_not_found(self, client):
+        """Test statistics for a non-existent path."""
+        assert client.get("/api/paths/non-existent/stats").status_code == 404
+
+    def test_get_path_timeseries(self, client, sample_path):
+        """Test that captures show up in the path time series."""
+        for method in ("POST", "POST", "PUT"):
+            client.open(f"/webhook/{sample_path.path_id}", method=method, data="x")
+
+        response = client.get(f"/api/paths/{sample_path.path_id}/timeseries")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert data["resolution"] == "hour"
+        assert len(data["points"]) == 1
+        point = data["points"][0]
+        assert point["count"] == 3
+        assert point["body_bytes"] == 3
+        assert point["method_counts"] == {"POST": 2, "PUT": 1}
+
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/timeseries?resolution=minute&method=put"
+        )
+        points = json.loads(response.data)["data"]["points"]
+        assert [point["count"] for point in points] == [1]
+
+    def test_get_path_timeseries_invalid(self, client, sample_path):
+        """Test that an unknown resolution is rejected."""
+        response = client.get(
+            f"/api/paths/{sample_path.path_id}/timeseries?resolution=week"
+        )
+        assert response.status_code == 400
+
+    def test_get_path_timeseries_not_found(self, client):
+        """Test time series of a missing path."""
+        response = client.get("/api/paths/missing/timeseries")
+        assert response.status_code == 404
+
+    def test_dashboard_stats(self, client, sample_path, sample_request):
+        """Test dashboard statistics computed from aggregates."""
+        Path.create_new_path("idle-path")
+
+        response = client.get("/api/dashboard/stats")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert data["total_webhooks"] == 2
+        assert data["total_requests"] == 1
+        assert data["active_webhooks"] == 1
+        assert data["requests_last_24h"] == 1
+        assert data["active_webhooks_last_24h"] == 1
+        assert len(data["recent_requests"]) == 1
+        assert "body" not in data["recent_requests"][0]
+        assert "generated_at" in data
+
 
 class TestWebhooksAPI:
     """Test cases for webhook capture endpoints."""
@@ -104,6 +489,19 @@ class TestWebhooksAPI:
         assert "data" in data
         assert data["data"]["method"] == "GET"
 
+    def test_capture_trims_ring_buffer_path(self, app, client, db_session):
+        """Test that a path capped by max_requests keeps its newest requests."""
+        app.config["PATH_LIMIT_SLACK"] = 0
+        path = Path.create_new_path(path_id="ring", max_requests=3)
+
+        for number in range(5):
+            client.post(f"/webhook/ring?n={number}", data="x")
+
+        db_session.refresh(path)
+        assert path.request_count == 3
+        kept = Request.query.filter_by(path_id=path.id).all()
+        assert sorted(request.query_params["n"] for request in kept) == ["2", "3", "4"]
+
     def test_capture_post_request_with_data(self, client, sample_path):
         """Test capturing a POST request with JSON data."""
         test_data = {"key": "value", "number": 42}
@@ -147,6 +545,117 @@ class TestWebhooksAPI:
         assert data["success"] is False
         assert "error" in data
 
+    def test_unknown_path_rejected_without_query(self, client, sample_path):
+        """Test that repeated hits to an unknown path skip the database."""
+        for _ in range(3):
+            assert client.post("/webhook/typo-path").status_code == 404
+
+        metrics = json.loads(client.get("/health/metrics").data)["metrics"]
+        assert metrics["path_filter"]["rejected_without_db"] == 3
+        assert metrics["path_filter"]["db_misses"] == 0
+
+    def test_capture_binary_body(self, client, sample_path):
+        """Test that non-text bodies are stored as raw bytes."""
+        import base64
+        import gzip
+
+        payload = gzip.compress(b'{"event": "compressed"}')
+        client.post(
+            f"/webhook/{sample_path.path_id}",
+            data=payload,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+
+        saved = Request.query.filter_by(path_id=sample_path.id).one()
+        assert saved.body == payload
+        assert saved.body_size == len(payload)
+
+        logs = json.loads(client.get(f"/api/paths/{sample_path.path_id}/logs").data)
+        logged = logs["data"]["requests"][0]
+        assert logged["body_encoding"] == "base64"
+        assert base64.b64decode(logged["body"]) == payload
+
+    def test_capture_compresses_large_body(self, app, client, sample_path):
+        """Test that bodies over the threshold are stored compressed."""
+        payload = json.dumps({"items": [{"id": i, "ok": True} for i in range(200)]})
+        client.post(
+            f"/webhook/{sample_path.path_id}",
+            data=payload,
+            headers={"Content-Type": "application/json"},
+        )
+
+        saved = Request.query.filter_by(path_id=sample_path.id).one()
+        assert saved.body_record.codec != 0
+        assert len(saved.body_record.data) < len(payload)
+        assert saved.body_size == len(payload)
+
+        logs = json.loads(client.get(f"/api/paths/{sample_path.path_id}/logs").data)
+        assert logs["data"]["requests"][0]["body"] == payload
+
+    def test_capture_spills_large_body(self, make_app, tmp_path):
+        """Test that large bodies go to segment files and are served from them."""
+        import base64
+
+        from app.models.request_body import RequestBody
+
+        app = make_app(BODY_SPILL_THRESHOLD=1024, BODY_SPILL_DIR=str(tmp_path))
+        client = app.test_client()
+        with app.app_context():
+            path_id = Path.create_new_path().path_id
+
+        payload = bytes(range(256)) * 8
+        client.post(f"/webhook/{path_id}", data=payload)
+
+        with app.app_context():
+            stored = RequestBody.query.one()
+            assert stored.data is None
+            assert (stored.segment, stored.segment_offset) == (1, 0)
+        assert (tmp_path / "segment-000001.blob").read_bytes() == payload
+
+        logs = json.loads(client.get(f"/api/paths/{path_id}/logs").data)
+        logged = logs["data"]["requests"][0]
+        assert base64.b64decode(logged["body"]) == payload
+
+        response = client.get(
+            f"/api/paths/{path_id}/logs/{logged['id']}/body",
+            headers={"Range": "bytes=256-"},
+        )
+        assert response.status_code == 206
+        assert response.headers["Content-Type"] == "application/octet-stream"
+        assert response.data == payload[256:]
+
+    def test_capture_deduplicates_bodies(self, client, sample_path):
+        """Test that identical bodies are stored once and counted."""
+        from app.models.request_body import RequestBody
+
+        for _ in range(3):
+            client.post(f"/webhook/{sample_path.path_id}", data='{"same": true}')
+
+        stored = RequestBody.query.one()
+        assert stored.refcount == 3
+        assert Request.query.filter_by(body_digest=stored.digest).count() == 3
+        assert stored.read() == b'{"same": true}'
+
+    def test_capture_body_with_charset(self, client, sample_path):
+        """Test that text bodies are decoded with their declared charset."""
+        client.post(
+            f"/webhook/{sample_path.path_id}",
+            data="café".encode("latin-1"),
+            headers={"Content-Type": "text/plain; charset=ISO-8859-1"},
+        )
+
+        saved = Request.query.filter_by(path_id=sample_path.id).one()
+        assert saved.charset == "iso-8859-1"
+        assert saved.body_text == "café"
+        assert saved.to_dict()["body_encoding"] == "text"
+
+    def test_capture_form_body(self, client, sample_path):
+        """Test that form-encoded bodies are captured verbatim."""
+        client.post(f"/webhook/{sample_path.path_id}", data={"a": "1", "b": "2"})
+
+        saved = Request.query.filter_by(path_id=sample_path.id).one()
+        assert saved.body == b"a=1&b=2"
+
     def test_capture_request_saves_to_database(self, client, sample_path, db_session):
         """Test that captured requests are saved to database."""
         initial_count = Request.query.filter_by(path_id=sample_path.id).count()
@@ -170,8 +679,257 @@ class TestWebhooksAPI:
             .first()
         )
         assert saved_request.method == "POST"
-        assert saved_request.body == "test body content"
+        assert saved_request.body == b"test body content"
         assert "Custom-Header" in saved_request.headers
+        assert saved_request.content_type is None
+
+        # Verify the path counters were updated in the same transaction
+        db_session.refresh(sample_path)
+        assert sample_path.request_count == final_count
+        assert sample_path.total_body_bytes == len("test body content")
+        assert sample_path.last_request_at == saved_request.timestamp
+
+
+class TestQueuedWebhooksAPI:
+    """Test cases for webhook capture through the write-behind queue."""
+
+    def test_capture_waits_for_flush(self, make_app):
+        """Test that flush durability acknowledges after the batch commits."""
+        app = make_app(INGEST_MODE="queued", INGEST_DURABILITY="flush")
+        with app.app_context():
+            path = Path.create_new_path("queued-path")
+            path_id = path.id
+
+        client = app.test_client()
+        response = client.post("/webhook/queued-path", data="queued body")
+
+        assert response.status_code == 200
+        request_id = json.loads(response.data)["data"]["request_id"]
+        with app.app_context():
+            saved = db.session.get(Request, request_id)
+            assert saved is not None
+            assert saved.path_id == path_id
+            assert saved.body == b"queued body"
+            assert db.session.get(Path, path_id).request_count == 1
+
+    def test_capture_acknowledges_on_enqueue(self, make_app):
+        """Test that enqueue durability acknowledges before the write."""
+        app = make_app(
+            INGEST_MODE="queued",
+            INGEST_DURABILITY="enqueue",
+            INGEST_FLUSH_INTERVAL=0.01,
+        )
+        with app.app_context():
+            Path.create_new_path("queued-path")
+
+        client = app.test_client()
+        for _ in range(5):
+            assert client.post("/webhook/queued-path", data="x").status_code == 200
+
+        app.extensions["ingest_queue"].stop()
+        with app.app_context():
+            assert Request.query.count() == 5
+
+        stats = json.loads(client.get("/health/metrics").data)["metrics"]
+        assert stats["ingest_queue"]["enqueued"] == 5
+        assert stats["ingest_queue"]["flushed_rows"] == 5
+        assert stats["ingest_queue"]["queue_depth"] == 0
+
+
+class TestReplaysAPI:
+    """Test cases for replay endpoints."""
+
+    def test_replay_to_target(self, make_app, target_server):
+        """Test a replay from creation to per-request outcomes."""
+        app = make_app()
+        with app.app_context():
+            Path.create_new_path("replayed")
+        client = app.test_client()
+        for body in ("first", "second"):
+            client.post("/webhook/replayed?source=test", data=body)
+        client.get("/webhook/replayed")
+
+        response = client.post(
+            "/api/paths/replayed/replays",
+            json={"target_url": f"{target_server.url}/in", "method": "post"},
+        )
+        assert response.status_code == 202
+        job = json.loads(response.data)["data"]
+        assert job["method"] == "POST"
+        url = f"/api/paths/replayed/replays/{job['id']}"
+
+        deadline = time.monotonic() + 10
+        while job["status"] != "completed" and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job = json.loads(client.get(url).data)["data"]
+        assert (job["total"], job["succeeded"], job["failed"]) == (2, 2, 0)
+        assert sorted(record["body"] for record in target_server.received) == [
+            b"first",
+            b"second",
+        ]
+        assert target_server.received[0]["query"] == {"source": "test"}
+
+        data = json.loads(client.get(f"{url}/results?status=succeeded").data)["data"]
+        assert data["pagination"]["total"] == 2
+        assert data["results"][0]["status_code"] == 200
+        listed = json.loads(client.get("/api/paths/replayed/replays").data)["data"]
+        assert [replay["id"] for replay in listed] == [job["id"]]
+        assert client.post(f"{url}/cancel").status_code == 409
+
+        metrics = json.loads(client.get("/health/metrics").data)["metrics"]
+        assert metrics["replays"]["started"] == 1
+        assert client.delete("/api/paths/replayed").status_code == 200
+
+    def test_replay_errors(self, client, sample_path):
+        """Test replay errors: unknown path or job, invalid settings."""
+        url = f"/api/paths/{sample_path.path_id}/replays"
+        target = {"target_url": "http://localhost:9/hook"}
+        assert client.post("/api/paths/missing/replays", json=target).status_code == 404
+        assert client.get(f"{url}/missing").status_code == 404
+        assert client.post(f"{url}/missing/cancel").status_code == 404
+        assert client.get(f"{url}/missing/results?limit=0").status_code == 400
+        for invalid in (
+            {},
+            {"target_url": "ftp://localhost/hook"},
+            dict(target, concurrency=1000),
+            dict(target, rate_limit=0),
+            dict(target, since="2025-02-01", until="2025-01-01"),
+        ):
+            response = client.post(url, json=invalid)
+            assert response.status_code == 400, invalid
+
+        response = client.post(url, json=dict(target, until="tomorrow"))
+        assert json.loads(response.data)["details"] == {
+            "until": ["Invalid ISO datetime."]
+        }
+
+
+class TestForwardingAPI:
+    """Test cases for paths forwarding captured requests to an upstream."""
+
+    def test_forward_to_upstream(self, client, db_session, target_server):
+        """Test that the upstream response is returned and its outcome stored."""
+        target_server.respond = lambda record: (
+            201,
+            {"Content-Type": "application/json", "X-Upstream": "yes"},
+            b'{"accepted": true}',
+        )
+        response = client.post(
+            "/api/paths",
+            json={"path_id": "tap", "forward_url": f"{target_server.url}/in?key=1"},
+        )
+        assert json.loads(response.data)["data"]["forward_url"].endswith("key=1")
+
+        response = client.post(
+            "/webhook/tap?source=test",
+            data="payload",
+            headers={"X-Custom": "value", "Keep-Alive": "timeout=5"},
+        )
+        assert response.status_code == 201
+        assert response.data == b'{"accepted": true}'
+        assert response.headers["Content-Type"] == "application/json"
+        assert response.headers["X-Upstream"] == "yes"
+        request_id = response.headers["X-Webhook-Request-Id"]
+
+        (received,) = target_server.received
+        assert received["path"] == "/in"
+        assert received["query"] == {"key": "1", "source": "test"}
+        assert received["body"] == b"payload"
+        assert received["headers"]["X-Custom"] == "value"
+        assert "X-Forwarded-For" in received["headers"]
+        assert "timeout=5" not in received["headers"].values()
+
+        data = json.loads(client.get(f"/api/paths/tap/logs/{request_id}").data)
+        assert data["data"]["body"] == "payload"
+        assert data["data"]["upstream_status"] == 201
+        assert data["data"]["upstream_latency_ms"] >= 0
+        assert data["data"]["upstream_error"] is None
+
+    def test_forward_failures(self, make_app, target_server):
+        """Test timeouts, unreachable upstreams and the circuit breaker."""
+        app = make_app(FORWARD_TIMEOUT=0.2, FORWARD_BREAKER_THRESHOLD=2)
+        with app.app_context():
+            Path.create_new_path("slow", forward_url=target_server.url)
+            Path.create_new_path("down", forward_url="http://127.0.0.1:9/hook")
+        target_server.respond = lambda record: time.sleep(0.5) or 200
+        client = app.test_client()
+
+        response = client.post("/webhook/down")
+        assert response.status_code == 502
+        assert json.loads(response.data)["error"] == "Upstream request failed"
+
+        response = client.post("/webhook/slow", data="late")
+        assert response.status_code == 504
+        request_id = json.loads(response.data)["request_id"]
+        assert client.post("/webhook/slow").status_code == 504
+
+        # The circuit is open: the upstream is not called, the request is kept
+        response = client.post("/webhook/slow")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        assert len(target_server.received) == 2
+
+        with app.app_context():
+            saved = db.session.get(Request, request_id)
+            assert saved.body == b"late"
+            assert saved.upstream_status is None
+            assert saved.upstream_error == "timeout"
+            errors = [r.upstream_error for r in Request.query.order_by("timestamp")]
+            assert errors == [
+                "connection_error",
+                "timeout",
+                "timeout",
+                "circuit_open",
+            ]
+
+        metrics = json.loads(client.get("/health/metrics").data)["metrics"]
+        assert metrics["forwarding"]["open_circuits"] == 1
+        assert metrics["forwarding"]["rejected"] == 1
+
+    def test_forward_with_queued_ingest(self, make_app, target_server):
+        """Test that queued captures store the upstream outcome in the row."""
+        target_server.respond = lambda record: 202
+        for durability in ("flush", "enqueue"):
+            app = make_app(
+                INGEST_MODE="queued",
+                INGEST_DURABILITY=durability,
+                INGEST_FLUSH_INTERVAL=0.01,
+            )
+            with app.app_context():
+                Path.create_new_path("tap", forward_url=target_server.url)
+
+            response = app.test_client().post("/webhook/tap", data=durability)
+            assert response.status_code == 202
+            app.extensions["ingest_queue"].stop()
+            with app.app_context():
+                saved = db.session.get(
+                    Request, response.headers["X-Webhook-Request-Id"]
+                )
+                assert saved.body == durability.encode()
+                assert saved.upstream_status == 202
+                db.session.remove()
+                db.drop_all()
+
+    def test_update_path(self, client, sample_path, target_server):
+        """Test changing the upstream and retention policy of a path."""
+        url = f"/api/paths/{sample_path.path_id}"
+        response = client.patch(
+            url, json={"forward_url": target_server.url, "max_requests": 10}
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)["data"]
+        assert (data["forward_url"], data["max_requests"]) == (target_server.url, 10)
+        assert client.post(f"/webhook/{sample_path.path_id}").status_code == 200
+        assert len(target_server.received) == 1
+
+        response = client.patch(url, json={"forward_url": None})
+        data = json.loads(response.data)["data"]
+        assert (data["forward_url"], data["max_requests"]) == (None, 10)
+        client.post(f"/webhook/{sample_path.path_id}")
+        assert len(target_server.received) == 1
+
+        assert client.patch(url, json={"forward_url": "ftp://x/"}).status_code == 400
+        assert client.patch("/api/paths/missing", json={}).status_code == 404
 
 
 class TestHealthAPI:
@@ -202,3 +960,13 @@ class TestHealthAPI:
         assert response.status_code == 200
         data = json.loads(response.data)
         assert data["status"] == "alive"
+
+    def test_metrics(self, client):
+        """Test per-worker metrics endpoint."""
+        response = client.get("/health/metrics")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["metrics"]["ingest_mode"] == "sync"
+        assert "hits" in data["metrics"]["path_cache"]
+        assert "ingest_queue" not in data["metrics"]
@@ -6,6 +6,8 @@ import pytest
 
 from app import db
 from app.models.path import Path
+from app.models.request import Request
+from app.models.request_rollup import RequestRollup
 
 
 class TestPathModel:
@@ -89,3 +91,317 @@ class TestPathModel:
         assert len(sample_path.requests) == 1
         assert sample_path.requests[0] == sample_request
         assert sample_request.path == sample_path
+
+    def test_resolve_uses_cache(self, app, sample_path):
+        """Test that resolving a path twice only queries the database once."""
+        cache = app.extensions["path_cache"]
+        cache.clear()
+
+        first = Path.resolve("test-path-123")
+        second = Path.resolve("test-path-123")
+
+        assert first == second
+        assert first.id == sample_path.id
+        assert first.created_at == sample_path.created_at
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_resolve_not_found(self, db_session):
+        """Test resolving a path that does not exist."""
+        assert Path.resolve("non-existent") is None
+
+    def test_delete_invalidates_cache(self, app, sample_path):
+        """Test that deleting a path evicts it from the cache."""
+        assert Path.resolve("test-path-123") is not None
+
+        sample_path.delete()
+
+        assert "test-path-123" not in app.extensions["path_cache"]._entries
+        assert Path.resolve("test-path-123") is None
+
+    def test_create_new_path_primes_cache(self, app, db_session):
+        """Test that a created path is resolved without a query."""
+        path = Path.create_new_path("primed-path")
+        cache = app.extensions["path_cache"]
+        misses = cache.stats()["misses"]
+
+        assert Path.resolve("primed-path") == path.ref
+        assert cache.stats()["misses"] == misses
+
+    def test_path_counters(self, sample_path, sample_request):
+        """Test that counters reflect captured requests without loading them."""
+        path_dict = sample_path.to_dict()
+
+        assert path_dict["request_count"] == 1
+        assert path_dict["total_body_bytes"] == len('{"test": "data"}')
+        assert path_dict["last_request_at"] == sample_request.timestamp.isoformat()
+
+    def test_add_to_counters_keeps_latest_timestamp(self, db_session, sample_path):
+        """Test that out-of-order totals never move last_request_at back."""
+        later = datetime(2024, 1, 2)
+        earlier = datetime(2024, 1, 1)
+
+        Path.add_to_counters({sample_path.id: (2, 10, later)})
+        Path.add_to_counters({sample_path.id: (1, 5, earlier)})
+        db_session.commit()
+        db_session.refresh(sample_path)
+
+        assert sample_path.request_count == 3
+        assert sample_path.total_body_bytes == 15
+        assert sample_path.last_request_at == later
+
+    def test_recalculate_counters(self, db_session, sample_path, sample_request):
+        """Test rebuilding counters from the requests table."""
+        Path.add_to_counters({sample_path.id: (10, 100, None)})
+        db_session.commit()
+
+        Path.recalculate_counters()
+        db_session.refresh(sample_path)
+
+        assert sample_path.request_count == 1
+        assert sample_path.total_body_bytes == sample_request.body_size
+
+    def test_delete_removes_requests(self, db_session, sample_path, sample_request):
+        """Test that deleting a path bulk-deletes its requests."""
+        from app.models.request import Request
+
+        sample_path.delete()
+
+        assert Request.query.count() == 0
+
+    def test_delete_releases_bodies(self, db_session, sample_path, sample_request):
+        """Test that deleting a path removes bodies no other request uses."""
+        from app.models.request_body import RequestBody
+
+        other = Path.create_new_path()
+        db_session.add(Request(path_id=other.id, method="POST", body="shared"))
+        db_session.add(Request(path_id=sample_path.id, method="POST", body="shared"))
+        db_session.commit()
+
+        sample_path.delete()
+
+        stored = RequestBody.query.one()
+        assert stored.read() == b"shared"
+        assert stored.refcount == 1
+
+
+class TestRequestModel:
+    """Test cases for Request model."""
+
+    def test_get_page_by_path_id_cursor(self, db_session, sample_path):
+        """Test walking pages forwards and backwards with cursors."""
+        base = datetime(2024, 1, 1, 12, 0, 0)
+        for i in range(5):
+            db_session.add(
+                Request(
+                    id=f"00000000-0000-0000-0000-00000000000{i}",
+                    path_id=sample_path.id,
+                    method="POST",
+                    # Two requests share a timestamp, so id breaks the tie
+                    timestamp=base.replace(minute=min(i, 3)),
+                )
+            )
+        db_session.commit()
+        newest_first = [
+            f"00000000-0000-0000-0000-00000000000{i}" for i in (4, 3, 2, 1, 0)
+        ]
+
+        first = Request.get_page_by_path_id(sample_path.path_id, limit=2)
+        assert [r.id for r in first.requests] == newest_first[:2]
+        assert first.prev_cursor is None
+
+        second = Request.get_page_by_path_id(
+            sample_path.path_id, limit=2, cursor=first.next_cursor
+        )
+        assert [r.id for r in second.requests] == newest_first[2:4]
+
+        last = Request.get_page_by_path_id(
+            sample_path.path_id, limit=2, cursor=second.next_cursor
+        )
+        assert [r.id for r in last.requests] == newest_first[4:]
+        assert last.next_cursor is None
+
+        back = Request.get_page_by_path_id(
+            sample_path.path_id, limit=2, cursor=second.prev_cursor
+        )
+        assert [r.id for r in back.requests] == newest_first[:2]
+        assert back.prev_cursor is None
+        assert back.next_cursor is not None
+
+    def test_get_page_by_path_id_offset(self, db_session, sample_path, sample_request):
+        """Test that offset mode still works and offers cursors."""
+        page = Request.get_page_by_path_id(sample_path.path_id, limit=10, offset=0)
+        assert [r.id for r in page.requests] == [sample_request.id]
+        assert page.next_cursor is None
+        assert page.prev_cursor is None
+
+        assert Request.get_page_by_path_id(sample_path.path_id, offset=1).requests == []
+
+    def test_json_columns_round_trip(self, db_session, sample_path):
+        """Test that headers and query params are stored as JSON documents."""
+        request = Request(
+            path_id=sample_path.id,
+            method="POST",
+            headers={"Content-Type": "application/json"},
+            query_params={"page": "2"},
+        )
+        db_session.add(request)
+        db_session.commit()
+        db_session.expire_all()
+
+        stored = db_session.get(Request, request.id)
+        assert stored.headers == {"Content-Type": "application/json"}
+        assert stored.to_dict()["query_params"] == {"page": "2"}
+
+        # Rows written as JSON text before the column type changed
+        stored.headers = '{"X-Legacy": "1"}'
+        assert stored.headers_dict == {"X-Legacy": "1"}
+
+    def test_get_page_by_path_id_projects_headers(
+        self, db_session, sample_path, sample_request
+    ):
+        """Test that requested header keys are extracted by the database."""
+        page = Request.get_page_by_path_id(
+            sample_path.path_id, header_keys=["content-type", "X-Missing"]
+        )
+
+        request = page.requests[0]
+        assert request.headers_dict == {"Content-Type": "application/json"}
+        assert "headers" not in request.__dict__
+
+    def test_orm_delete_releases_body(self, db_session, sample_request):
+        """Test that deleting a request through the session drops its reference."""
+        from app.models.request_body import RequestBody
+
+        db_session.delete(sample_request)
+        db_session.commit()
+
+        assert RequestBody.query.one().refcount == 0
+        assert RequestBody.collect_garbage() == 1
+        assert RequestBody.query.count() == 0
+
+    def test_get_page_by_path_id_invalid_cursor(self, sample_path):
+        """Test that a malformed cursor is rejected."""
+        with pytest.raises(ValueError):
+            Request.get_page_by_path_id(sample_path.path_id, cursor="not-a-cursor")
+
+
+class TestRequestRollupModel:
+    """Test cases for the RequestRollup model."""
+
+    def test_record_counts_minute_buckets(self, db_session, sample_path):
+        """Test that captures are summed per minute and method."""
+        rows = [
+            {
+                "path_id": sample_path.id,
+                "method": method,
+                "body_size": 10,
+                "timestamp": datetime(2026, 1, 1, 12, 0, second),
+            }
+            for method, second in (("POST", 5), ("POST", 50), ("GET", 30))
+        ]
+        RequestRollup.record(rows[:1])
+        RequestRollup.record(rows[1:])
+        db_session.commit()
+
+        rollups = {
+            (rollup.unit, rollup.bucket, rollup.method): (
+                rollup.count,
+                rollup.body_bytes,
+            )
+            for rollup in RequestRollup.query
+        }
+        assert rollups == {
+            ("minute", datetime(2026, 1, 1, 12, 0), "POST"): (2, 20),
+            ("minute", datetime(2026, 1, 1, 12, 0), "GET"): (1, 10),
+        }
+
+    def test_coarsen_and_series(self, db_session, sample_path):
+        """Test that old buckets are folded and still served as a series."""
+        now = datetime(2026, 3, 1, 12, 30)
+        RequestRollup.record(
+            {
+                "path_id": sample_path.id,
+                "method": "POST",
+                "body_size": 1,
+                "timestamp": timestamp,
+            }
+            for timestamp in (
+                datetime(2026, 1, 1, 9, 15),  # folded into a day
+                datetime(2026, 1, 1, 10, 45),  # folded into the same day
+                datetime(2026, 2, 26, 8, 5),  # folded into an hour
+                datetime(2026, 3, 1, 12, 10),  # kept per minute
+            )
+        )
+        db_session.commit()
+
+        assert RequestRollup.coarsen(now=now) == 5
+        assert sorted(rollup.unit for rollup in RequestRollup.query) == [
+            "day",
+            "hour",
+            "minute",
+        ]
+
+        series = RequestRollup.series(
+            sample_path.id, datetime(2026, 1, 1, 10), now, "hour"
+        )
+        assert [(bucket, unit, count) for bucket, unit, count, _, _ in series] == [
+            (datetime(2026, 1, 1), "day", 2),
+            (datetime(2026, 2, 26, 8), "hour", 1),
+            (datetime(2026, 3, 1, 12), "hour", 1),
+        ]
+
+    def test_coarsen_in_batches(self, db_session, sample_path):
+        """Test that folding in small batches gives the same buckets."""
+        RequestRollup.record(
+            {
+                "path_id": sample_path.id,
+                "method": method,
+                "body_size": 10,
+                "timestamp": datetime(2026, 1, 1, 9, minute),
+            }
+            for minute in range(5)
+            for method in ("GET", "POST")
+        )
+        db_session.commit()
+
+        assert RequestRollup.coarsen(now=datetime(2026, 3, 1), batch_size=3) == 12
+        assert sorted(
+            (rollup.unit, rollup.bucket, rollup.method, rollup.count, rollup.body_bytes)
+            for rollup in RequestRollup.query
+        ) == [
+            ("day", datetime(2026, 1, 1), "GET", 5, 50),
+            ("day", datetime(2026, 1, 1), "POST", 5, 50),
+        ]
+
+    def test_path_delete_removes_rollups(self, client, sample_path):
+        """Test that deleting a path deletes its rollups."""
+        client.post(f"/webhook/{sample_path.path_id}", data="x")
+        assert RequestRollup.query.count() == 1
+
+        sample_path.delete()
+        assert RequestRollup.query.count() == 0
+
+
+class TestMigrations:
+    """Test cases for the Alembic migration set."""
+
+    def test_migrations_match_models(self, make_app):
+        """Test that upgrading to head yields the schema the models declare."""
+        import os
+
+        from alembic.autogenerate import compare_metadata
+        from alembic.migration import MigrationContext
+        from flask_migrate import upgrade
+
+        app = make_app(create_tables=False)
+        migrations_dir = os.path.join(os.path.dirname(__file__), "..", "migrations")
+
+        with app.app_context():
+            upgrade(directory=migrations_dir)
+
+            with db.engine.connect() as connection:
+                context = MigrationContext.configure(connection)
+                diff = compare_metadata(context, db.metadata)
+
+        assert diff == []
@@ -1,9 +1,42 @@
 """Tests for service layer."""
 
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
 
 import pytest
 
+from app.models.path import Path
+from app.models.request import Request
+from app.models.request_rollup import RequestRollup
+from app.services.blob_store import BlobStore
+from app.services.capture_broker import (
+    CaptureBroker,
+    LocalBackend,
+    PostgresBackend,
+    SubscriberLimitReached,
+    sse_stream,
+)
+from app.services.export import (
+    columnar_batches,
+    columnar_chunks,
+    common_keys,
+    iter_export_records,
+    ndjson_chunks,
+)
+from app.services.forwarder import CircuitBreaker, Forwarder
+from app.services.importer import RequestImporter
+from app.services.ingest_queue import IngestError, IngestQueue
+from app.services.partitions import Partition, RequestPartitions, parse_bound
+from app.services.path_filter import PathFilter
+from app.services.replay import RateLimiter, ReplayManager, build_delivery
+from app.services.retention import RetentionWorker
+from app.services.stats_snapshot import StatsSnapshot, compute_dashboard_stats
 from app.services.webhook_service import PathService, RequestService
 
 
@@ -48,6 +81,94 @@ class TestPathService:
         assert "POST" in stats["method_counts"]
         assert stats["method_counts"]["POST"] == 1
 
+    def test_get_path_statistics_groups_in_database(self, db_session, sample_path):
+        """Test method, content type, size and hourly breakdowns."""
+        base = datetime(2024, 1, 1, 10, 15)
+        rows = [
+            ("POST", "application/json", 0, base),
+            ("POST", "application/json", 2048, base + timedelta(minutes=10)),
+            ("GET", None, 0, base + timedelta(hours=1)),
+            ("PUT", "text/plain", 2 * 1024 * 1024, base + timedelta(hours=3)),
+        ]
+        for method, content_type, body_size, timestamp in rows:
+            db_session.add(
+                Request(
+                    path_id=sample_path.id,
+                    method=method,
+                    content_type=content_type,
+                    body_size=body_size,
+                    timestamp=timestamp,
+                )
+            )
+        RequestRollup.record(
+            [
+                {
+                    "path_id": sample_path.id,
+                    "method": method,
+                    "body_size": body_size,
+                    "timestamp": timestamp,
+                }
+                for method, _, body_size, timestamp in rows
+            ]
+        )
+        db_session.commit()
+        Path.recalculate_counters()
+
+        # Without a window: totals of the whole path, breakdowns of the last day
+        recent = PathService.get_path_statistics(sample_path.path_id)
+        assert recent["total_requests"] == 4
+        assert recent["last_request"] == "2024-01-01T13:15:00"
+        assert recent["method_counts"] == {}
+        assert recent["requests_per_hour"] == []
+        assert recent["since"] is None
+        assert recent["breakdown_since"] is not None
+
+        stats = PathService.get_path_statistics(
+            sample_path.path_id, since=datetime(2024, 1, 1)
+        )
+
+        assert stats["total_requests"] == 4
+        assert stats["total_body_bytes"] == 2048 + 2 * 1024 * 1024
+        assert stats["method_counts"] == {"POST": 2, "GET": 1, "PUT": 1}
+        assert stats["content_type_counts"] == {
+            "application/json": 2,
+            "text/plain": 1,
+            "unknown": 1,
+        }
+        assert stats["body_size_buckets"] == {
+            "empty": 2,
+            "<1KB": 0,
+            "1KB-64KB": 1,
+            "64KB-1MB": 0,
+            ">=1MB": 1,
+        }
+        assert stats["requests_per_hour"] == [
+            {"hour": "2024-01-01T10:00:00", "resolution": "hour", "count": 2},
+            {"hour": "2024-01-01T11:00:00", "resolution": "hour", "count": 1},
+            {"hour": "2024-01-01T13:00:00", "resolution": "hour", "count": 1},
+        ]
+        assert stats["last_request"] == "2024-01-01T13:15:00"
+
+        windowed = PathService.get_path_statistics(
+            sample_path.path_id,
+            since=datetime(2024, 1, 1, 11),
+            until=datetime(2024, 1, 1, 12),
+        )
+        assert windowed["total_requests"] == 1
+        assert windowed["method_counts"] == {"GET": 1}
+        assert windowed["last_request"] == "2024-01-01T11:15:00"
+
+        # Hours folded into days are reported at day resolution
+        RequestRollup.coarsen(
+            now=datetime(2024, 1, 5), minutes_for=timedelta(0), hours_for=timedelta(0)
+        )
+        folded = PathService.get_path_statistics(
+            sample_path.path_id, since=datetime(2024, 1, 1)
+        )
+        assert folded["requests_per_hour"] == [
+            {"hour": "2024-01-01T00:00:00", "resolution": "day", "count": 4}
+        ]
+
     def test_get_path_statistics_not_found(self, app):
         """Test getting statistics for non-existent path."""
         with app.app_context():
@@ -79,7 +200,7 @@ class TestRequestService:
             result = RequestService.capture_request(mock_request, sample_path.path_id)
 
             assert result == mock_request_obj
-            mock_create.assert_called_once_with(mock_request, sample_path)
+            mock_create.assert_called_once_with(mock_request, sample_path.ref)
 
     def test_capture_request_path_not_found(self, app):
         """Test capturing request for non-existent path."""
@@ -138,14 +259,1079 @@ class TestRequestService:
         request = RequestService.get_request_by_id(fake_id, sample_path.path_id)
         assert request is None
 
-    @patch("app.services.webhook_service.db.session")
-    def test_delete_old_requests(self, mock_session):
+    def test_delete_old_requests(self, db_session, sample_path, sample_request):
         """Test deleting old requests."""
+        for days in (40, 50):
+            db_session.add(
+                Request(
+                    path_id=sample_path.id,
+                    method="GET",
+                    body_size=10,
+                    timestamp=datetime.utcnow() - timedelta(days=days),
+                )
+            )
+        db_session.commit()
+        Path.recalculate_counters()
+
+        deleted_count = RequestService.delete_old_requests(days_old=30)
+
+        assert deleted_count == 2
+        db_session.refresh(sample_path)
+        assert sample_path.request_count == 1
+        assert sample_path.total_body_bytes == sample_request.body_size
+        assert sample_path.last_request_at == sample_request.timestamp
+
+    def test_delete_old_requests_clears_last_request(self, db_session, sample_path):
+        """Test that a path emptied by retention has no last request time."""
+        db_session.add(
+            Request(
+                path_id=sample_path.id,
+                method="GET",
+                timestamp=datetime.utcnow() - timedelta(days=40),
+            )
+        )
+        db_session.commit()
+        Path.recalculate_counters()
+
+        assert RequestService.delete_old_requests(days_old=30) == 1
+        db_session.refresh(sample_path)
+        assert sample_path.request_count == 0
+        assert sample_path.last_request_at is None
+
+    def test_delete_old_requests_collects_bodies(
+        self, db_session, sample_path, sample_request
+    ):
+        """Test that retention deletes bodies left without references."""
+        from app.models.request_body import RequestBody
+
+        db_session.add(
+            Request(
+                path_id=sample_path.id,
+                method="POST",
+                body="expired",
+                timestamp=datetime.utcnow() - timedelta(days=40),
+            )
+        )
+        db_session.commit()
+        assert RequestBody.query.count() == 2
+
+        assert RequestService.delete_old_requests(days_old=30) == 1
+        assert [body.digest for body in RequestBody.query] == [
+            sample_request.body_digest
+        ]
+
+    def test_delete_old_requests_in_batches(self, db_session, sample_path):
+        """Test that expired requests are deleted oldest first, batch by batch."""
+        for days in (40, 41, 42, 43, 44):
+            db_session.add(
+                Request(
+                    path_id=sample_path.id,
+                    method="GET",
+                    body="expired",
+                    timestamp=datetime.utcnow() - timedelta(days=days),
+                )
+            )
+        db_session.commit()
+        Path.recalculate_counters()
+
+        progress = []
+        deleted_count = RequestService.delete_old_requests(
+            days_old=30, batch_size=2, progress=progress.append
+        )
+
+        assert deleted_count == 5
+        assert progress == [2, 4, 5]
+        db_session.refresh(sample_path)
+        assert sample_path.request_count == 0
+
+    def test_delete_old_requests_honours_path_max_age(self, db_session, sample_path):
+        """Test that a path's max_age replaces the global retention period."""
+        kept_long = Path(path_id="kept-long", max_age=90 * 86400)
+        kept_short = Path(path_id="kept-short", max_age=3600)
+        db_session.add_all([kept_long, kept_short])
+        db_session.commit()
+        for path in (sample_path, kept_long, kept_short):
+            for days in (0.5, 40):
+                db_session.add(
+                    Request(
+                        path_id=path.id,
+                        method="GET",
+                        timestamp=datetime.utcnow() - timedelta(days=days),
+                    )
+                )
+        db_session.commit()
+        Path.recalculate_counters()
+
+        assert RequestService.delete_old_requests(days_old=30) == 3
+        for path, remaining in ((sample_path, 1), (kept_long, 2), (kept_short, 0)):
+            db_session.refresh(path)
+            assert path.request_count == remaining
+
+    def test_delete_old_requests_trims_to_max_bytes(self, db_session):
+        """Test that retention trims paths over max_bytes, oldest first."""
+        path = Path(path_id="capped", max_bytes=25)
+        db_session.add(path)
+        db_session.commit()
+        for minutes in (4, 3, 2, 1):
+            db_session.add(
+                Request(
+                    path_id=path.id,
+                    method="POST",
+                    body=f"body {minutes}",
+                    body_size=10,
+                    timestamp=datetime.utcnow() - timedelta(minutes=minutes),
+                )
+            )
+        db_session.commit()
+        Path.recalculate_counters()
+
+        progress = []
+        assert (
+            RequestService.delete_old_requests(
+                days_old=30, batch_size=1, progress=progress.append
+            )
+            == 2
+        )
+        # Trimmed one batch at a time, like expiry
+        assert progress[-3:] == [1, 2, 2]
+        db_session.refresh(path)
+        assert (path.request_count, path.total_body_bytes) == (2, 20)
+
+    def test_delete_old_requests_drops_partitions(self, app, sample_path):
+        """Test that retention drops whole partitions before deleting rows."""
+        partitions = Mock()
+        partitions.drop_before.return_value = 5
+        app.extensions["request_partitions"] = partitions
+
+        assert RequestService.delete_old_requests(days_old=30) == 5
+        partitions.ensure.assert_called_once()
+        cutoff = partitions.drop_before.call_args.args[0]
+        assert cutoff < datetime.utcnow() - timedelta(days=29)
+
+    @patch("app.services.webhook_service.db.session")
+    def test_delete_old_requests_rolls_back(self, mock_session, app):
+        """Test that a failed retention delete is rolled back."""
         mock_query = Mock()
-        mock_query.filter.return_value.delete.return_value = 5
+        mock_query.filter.side_effect = Exception("boom")
 
         with patch("app.models.request.Request.query", mock_query):
-            deleted_count = RequestService.delete_old_requests(days_old=30)
+            with pytest.raises(Exception, match="boom"):
+                RequestService.delete_old_requests(days_old=30)
+
+            mock_session.rollback.assert_called_once()
+
+
+class TestIngestQueue:
+    """Test cases for the write-behind ingest queue."""
+
+    def _build(self, path, method="POST"):
+        return Request(
+            id=str(uuid.uuid4()),
+            path_id=path.id,
+            method=method,
+            timestamp=datetime.utcnow(),
+        )
+
+    def test_flush_writes_batches(self, app, sample_path):
+        """Test that pending rows are written in size-bounded batches."""
+        ingest_queue = IngestQueue(app, batch_size=2, durability="enqueue")
+        ingest_queue._ensure_writer = Mock()
+
+        for _ in range(5):
+            ingest_queue.put(self._build(sample_path))
+
+        assert ingest_queue.stats()["queue_depth"] == 5
+        assert ingest_queue.flush() == 5
+        assert Request.query.filter_by(path_id=sample_path.id).count() == 5
+
+        stats = ingest_queue.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["flushed_batches"] == 3
+        assert stats["last_batch_size"] == 1
+
+    def test_full_queue_writes_synchronously(self, app, sample_path):
+        """Test that a full queue falls back to a direct write."""
+        ingest_queue = IngestQueue(app, maxsize=1, durability="enqueue")
+        ingest_queue._ensure_writer = Mock()
+
+        ingest_queue.put(self._build(sample_path))
+        ingest_queue.put(self._build(sample_path))
+
+        assert ingest_queue.stats()["overflow"] == 1
+        assert Request.query.filter_by(path_id=sample_path.id).count() == 1
+
+    def test_failed_row_is_isolated(self, app, sample_path):
+        """Test that one bad row does not drop the rest of its batch."""
+        ingest_queue = IngestQueue(app, durability="enqueue")
+        ingest_queue._ensure_writer = Mock()
+
+        ingest_queue.put(self._build(sample_path))
+        ingest_queue.put(self._build(sample_path, method=None))
+
+        assert ingest_queue.flush() == 1
+        assert ingest_queue.stats()["failed_rows"] == 1
+
+    def test_flush_durability_times_out(self, app, sample_path):
+        """Test that an unflushed row is reported when waiting for commit."""
+        ingest_queue = IngestQueue(app, flush_timeout=0.01)
+        ingest_queue._ensure_writer = Mock()
+
+        with pytest.raises(IngestError):
+            ingest_queue.put(self._build(sample_path))
+
+        # The withdrawn row is never written, so a retry is not a duplicate
+        assert ingest_queue.flush() == 0
+        assert ingest_queue.stats()["withdrawn"] == 1
+        assert Request.query.filter_by(path_id=sample_path.id).count() == 0
+
+    def test_flush_timeout_while_writing_is_accepted(self, app, sample_path):
+        """Test that a row already being written is not reported as failed."""
+        ingest_queue = IngestQueue(app, flush_interval=0, flush_timeout=0.5)
+        ingest_queue._ensure_writer = Mock()
+        writing = threading.Event()
+        release = threading.Event()
+        bulk_insert = Request.bulk_insert
+
+        def slow_insert(rows, copy=False):
+            writing.set()
+            release.wait(5)
+            return bulk_insert(rows, copy)
+
+        def writer():
+            writing_batch = ingest_queue._drain(block=True)
+            ingest_queue._write(writing_batch)
+
+        thread = threading.Thread(target=writer)
+        with patch.object(Request, "bulk_insert", side_effect=slow_insert):
+            thread.start()
+            assert ingest_queue.put(self._build(sample_path)) is False
+            assert writing.is_set()
+            release.set()
+            thread.join(5)
+
+        assert Request.query.filter_by(path_id=sample_path.id).count() == 1
+
+    def test_unknown_durability(self, app):
+        """Test that an invalid durability setting is rejected."""
+        with pytest.raises(ValueError):
+            IngestQueue(app, durability="sometimes")
+
+
+class TestPathFilter:
+    """Test cases for the unknown-path filter."""
+
+    def test_rejects_unknown_paths(self, sample_path):
+        """Test that only existing paths pass the filter."""
+        path_filter = PathFilter()
+
+        assert path_filter.rejects(sample_path.path_id) is False
+        assert path_filter.rejects("missing-path") is True
+        assert path_filter.stats()["bloom_rejections"] == 1
+        assert path_filter.stats()["rebuilds"] == 1
+
+    def test_refresh_picks_up_new_paths(self, db_session):
+        """Test that paths created elsewhere are seen after a refresh."""
+        now = [0.0]
+        path_filter = PathFilter(refresh_interval=1.0, clock=lambda: now[0])
+        assert path_filter.rejects("late-path") is True
+
+        db_session.add(Path(path_id="late-path"))
+        db_session.commit()
+        assert path_filter.rejects("late-path") is True
+
+        now[0] = 2.0
+        assert path_filter.rejects("late-path") is False
+        assert path_filter.stats()["refreshes"] == 1
+
+    def test_negative_cache(self, db_session):
+        """Test that missing paths reported by the database are cached."""
+        path_filter = PathFilter()
+        path_filter.remember_missing("gone-path")
+
+        assert path_filter.rejects("gone-path") is True
+        assert path_filter.stats()["negative_cache_hits"] == 1
+
+        db_session.add(Path(path_id="gone-path"))
+        db_session.commit()
+        path_filter.add("gone-path")
+        assert path_filter.rejects("gone-path") is False
+
+    def test_deleted_path_is_rejected(self, app, sample_path):
+        """Test that deleting a path makes lookups skip the database."""
+        path_filter = app.extensions["path_filter"]
+        assert Path.resolve(sample_path.path_id) is not None
+
+        sample_path.delete()
+
+        assert Path.resolve("test-path-123") is None
+        assert path_filter.stats()["negative_cache_hits"] == 1
+        assert path_filter.stats()["db_misses"] == 0
+
+    def test_falls_back_to_database_on_error(self, app):
+        """Test that a failed build never rejects a path."""
+        path_filter = PathFilter()
+
+        with patch.object(Path, "load_path_ids", side_effect=Exception("boom")):
+            assert path_filter.rejects("any-path") is False
+
+
+class TestStatsSnapshot:
+    """Test cases for the shared dashboard statistics snapshot."""
+
+    def _snapshot(self, app, tmp_path, ttl=60, compute=None):
+        return StatsSnapshot(
+            app,
+            str(tmp_path / "stats.json"),
+            ttl=ttl,
+            compute=compute or (lambda: {"total_webhooks": 1}),
+        )
+
+    def test_compute_dashboard_stats(self, sample_path, sample_request):
+        """Test the aggregate queries behind the dashboard."""
+        stats = compute_dashboard_stats()
+
+        assert stats["total_webhooks"] == 1
+        assert stats["total_requests"] == 1
+        assert stats["active_webhooks"] == 1
+        assert stats["recent_requests"][0]["id"] == sample_request.id
+
+    def test_fresh_snapshot_is_shared(self, app, tmp_path):
+        """Test that a fresh snapshot is served without recomputing."""
+        compute = Mock(return_value={"total_webhooks": 3})
+        worker_a = self._snapshot(app, tmp_path, compute=compute)
+        worker_b = self._snapshot(app, tmp_path, compute=compute)
+
+        assert worker_a.get()["total_webhooks"] == 3
+        assert worker_b.get()["total_webhooks"] == 3
+        assert compute.call_count == 1
+
+    def test_stale_snapshot_refreshes_in_background(self, app, tmp_path):
+        """Test that a stale snapshot is served while it is recomputed."""
+        values = iter([1, 2])
+        snapshot = self._snapshot(
+            app, tmp_path, ttl=0.01, compute=lambda: {"total_webhooks": next(values)}
+        )
+        assert snapshot.get()["total_webhooks"] == 1
+
+        time.sleep(0.02)
+        assert snapshot.get()["total_webhooks"] == 1
+
+        for _ in range(100):
+            if snapshot.refreshes:
+                break
+            time.sleep(0.01)
+        assert snapshot.refreshes == 1
+        assert snapshot.get()["total_webhooks"] == 2
+
+    def test_zero_ttl_computes_every_time(self, app, tmp_path):
+        """Test that a TTL of 0 disables the snapshot."""
+        compute = Mock(return_value={"total_webhooks": 0})
+        snapshot = self._snapshot(app, tmp_path, ttl=0, compute=compute)
+
+        snapshot.get()
+        snapshot.get()
+
+        assert compute.call_count == 2
+        assert not (tmp_path / "stats.json").exists()
+
+
+class TestBlobStore:
+    """Test cases for the segment file blob store."""
+
+    def test_append_and_read(self, tmp_path):
+        """Test that appended bodies are read back from their offsets."""
+        store = BlobStore(str(tmp_path), fsync=False)
+
+        first = store.append(b"hello")
+        second = store.append(b"world!")
+
+        assert first == (1, 0)
+        assert second == (1, 5)
+        assert store.read(1, 5, 6) == b"world!"
+        assert store.read(*first, 5) == b"hello"
+
+    def test_full_segment_rolls_over(self, tmp_path):
+        """Test that appends move to a new segment once one is full."""
+        store = BlobStore(str(tmp_path), segment_size=8, fsync=False)
+
+        store.append(b"12345")
+        assert store.append(b"6789") == (2, 0)
+        # A body larger than a segment still gets one to itself
+        assert store.append(b"0123456789") == (3, 0)
+        assert store.segments() == [1, 2, 3]
+
+    def test_read_after_growth_and_remove(self, tmp_path):
+        """Test that maps follow growing segments and survive removal."""
+        store = BlobStore(str(tmp_path), fsync=False)
+        store.append(b"abc")
+        assert store.read(1, 0, 3) == b"abc"
+
+        store.append(b"def")
+        assert store.read(1, 3, 3) == b"def"
+
+        store.remove(1)
+        assert store.segments() == []
+        with pytest.raises(FileNotFoundError):
+            store.read(1, 0, 3)
+
+    def test_unreferenced_spilled_body_is_revived(self, make_app, tmp_path):
+        """Test that a body without references is reused, not appended again."""
+        from app import db
+        from app.models.request_body import RequestBody
+
+        app = make_app(BODY_SPILL_THRESHOLD=4, BODY_SPILL_DIR=str(tmp_path / "blobs"))
+        with app.app_context():
+            path = Path.create_new_path()
+            first = Request(path_id=path.id, method="POST", body=b"same body")
+            db.session.add(first)
+            db.session.commit()
+            db.session.delete(first)
+            db.session.commit()
+            assert RequestBody.query.one().refcount == 0
+
+            db.session.add(Request(path_id=path.id, method="POST", body=b"same body"))
+            db.session.commit()
+
+            stored = RequestBody.query.one()
+            assert (stored.refcount, stored.segment_offset) == (1, 0)
+            blob_store = app.extensions["blob_store"]
+            assert os.path.getsize(blob_store.segment_path(1)) == len(b"same body")
+
+    def test_compaction_after_retention(self, make_app, tmp_path):
+        """Test that retention rewrites segments left mostly empty."""
+        from app import db
+        from app.models.request_body import RequestBody
+
+        app = make_app(
+            BODY_SPILL_THRESHOLD=4,
+            BODY_SPILL_DIR=str(tmp_path / "blobs"),
+            BODY_SEGMENT_SIZE=24,
+        )
+        with app.app_context():
+            path = Path.create_new_path()
+            old = datetime.utcnow() - timedelta(days=40)
+            for body, timestamp in (
+                (b"expired1", old),
+                (b"kept-one", datetime.utcnow()),
+                (b"expired2", old),
+                (b"expired3", old),
+            ):
+                db.session.add(
+                    Request(
+                        path_id=path.id, method="POST", body=body, timestamp=timestamp
+                    )
+                )
+                db.session.commit()
+
+            blob_store = app.extensions["blob_store"]
+            assert blob_store.segments() == [1, 2]
+            assert RequestBody.query.filter(RequestBody.data.is_(None)).count() == 4
+
+            RequestService.delete_old_requests(days_old=30)
+            # Segments written moments ago are skipped until the grace passes
+            assert blob_store.segments() == [1, 2]
+            assert RequestBody.compact_segments(grace=0) == 1
+
+            kept = Request.query.one()
+            assert kept.body == b"kept-one"
+            assert (kept.body_record.segment, kept.body_record.segment_offset) == (2, 8)
+            assert blob_store.segments() == [2]
+
+
+class TestRequestPartitions:
+    """Test cases for request partition planning."""
+
+    def test_floor(self):
+        """Test that partitions start at midnight, weeks on Monday."""
+        moment = datetime(2024, 5, 16, 13, 45)  # A Thursday
+
+        assert RequestPartitions("day").floor(moment) == datetime(2024, 5, 16)
+        assert RequestPartitions("week").floor(moment) == datetime(2024, 5, 13)
+        assert RequestPartitions("day").partition_name(moment) == "requests_p20240516"
+
+    def test_unknown_granularity(self):
+        """Test that only days and weeks are supported."""
+        with pytest.raises(ValueError):
+            RequestPartitions("month")
+
+    def test_missing_ranges(self):
+        """Test planning the partitions to create ahead of time."""
+        partitions = RequestPartitions("day", ahead=2)
+        now = datetime(2024, 5, 16, 13, 45)
+        existing = [
+            Partition(
+                "requests_p20240516", datetime(2024, 5, 16), datetime(2024, 5, 17)
+            )
+        ]
+
+        assert partitions.missing(existing, now=now) == [
+            (datetime(2024, 5, 17), datetime(2024, 5, 18)),
+            (datetime(2024, 5, 18), datetime(2024, 5, 19)),
+        ]
+        assert len(partitions.missing([], now=now, since=datetime(2024, 5, 1))) == 18
+
+    def test_missing_skips_overlaps(self):
+        """Test that weeks overlapping existing day partitions are skipped."""
+        partitions = RequestPartitions("week", ahead=1)
+        existing = [
+            Partition(
+                "requests_p20240516", datetime(2024, 5, 16), datetime(2024, 5, 17)
+            )
+        ]
+
+        assert partitions.missing(existing, now=datetime(2024, 5, 16)) == [
+            (datetime(2024, 5, 20), datetime(2024, 5, 27))
+        ]
+
+    def test_ensure_skips_failed_partitions(self, app):
+        """Test that a partition that cannot be attached does not stop the rest."""
+        from sqlalchemy.exc import OperationalError
+
+        partitions = RequestPartitions("day", ahead=2)
+        first = datetime(2024, 5, 16)
+
+        def create(start, end):
+            if start == first:
+                raise OperationalError("ATTACH", {}, Exception("default violated"))
+
+        with patch.object(partitions, "partitions", return_value=[]), patch.object(
+            partitions, "_create", side_effect=create
+        ):
+            created = partitions.ensure(now=first)
+
+        assert created == ["requests_p20240517", "requests_p20240518"]
+
+    def test_parse_bound(self):
+        """Test reading partition bounds from the PostgreSQL catalog."""
+        assert parse_bound(
+            "FOR VALUES FROM ('2024-05-16 00:00:00') TO ('2024-05-17 00:00:00')"
+        ) == (datetime(2024, 5, 16), datetime(2024, 5, 17))
+        assert parse_bound("DEFAULT") is None
+
+
+class TestRetentionWorker:
+    """Test cases for the retention worker."""
+
+    def _worker(self, app, tmp_path, **kwargs):
+        return RetentionWorker(
+            app, lock_path=str(tmp_path / "retention.lock"), pause=0, **kwargs
+        )
+
+    def test_run_once_reports_rate(self, app, tmp_path, sample_path):
+        """Test that a run deletes expired requests and reports its rate."""
+        from app import db
+
+        for days in (40, 50):
+            db.session.add(
+                Request(
+                    path_id=sample_path.id,
+                    method="GET",
+                    timestamp=datetime.utcnow() - timedelta(days=days),
+                )
+            )
+        db.session.commit()
+
+        worker = self._worker(app, tmp_path, days=30)
+        result = worker.run_once()
+
+        assert result["deleted"] == 2
+        assert result["rows_per_second"] > 0
+        assert worker.stats()["last_run"] == result
+
+    def test_only_one_scheduler_holds_the_lock(self, app, tmp_path):
+        """Test that a second worker on the host does not run passes."""
+        first = self._worker(app, tmp_path)
+        second = self._worker(app, tmp_path)
+
+        assert first._acquire() is True
+        assert second._acquire() is False
+
+        first._release()
+        assert second._acquire() is True
+        second._release()
+
+    def test_cli_run(self, app, sample_path):
+        """Test the flask retention run command."""
+        from app import db
+
+        db.session.add(
+            Request(
+                path_id=sample_path.id,
+                method="GET",
+                timestamp=datetime.utcnow() - timedelta(days=10),
+            )
+        )
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(
+            args=["retention", "run", "--days", "7", "--pause", "0"]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert "Deleted 1 requests older than 7 days" in result.output
+        assert Request.query.count() == 0
+
+
+class TestCaptureBroker:
+    """Test cases for CaptureBroker."""
+
+    def _request(self, path, body="x"):
+        return Request(
+            id=str(uuid.uuid4()),
+            path_id=path.id,
+            method="POST",
+            body=body,
+            body_size=len(body),
+            timestamp=datetime.utcnow(),
+        )
+
+    def test_publish_reaches_path_subscribers(self, app, sample_path):
+        """Test that events go to the subscribers of their path only."""
+        broker = CaptureBroker(LocalBackend())
+        with broker.subscribe("test-path-123") as subscription, broker.subscribe(
+            "other"
+        ) as other:
+            broker.publish("test-path-123", self._request(sample_path))
+
+            event = subscription.get(timeout=1)
+            assert event["request"]["body"] == "x"
+            assert other.get(timeout=0) is None
+        assert broker.stats()["subscribers"] == 0
+
+    def test_large_bodies_are_omitted(self, app, sample_path):
+        """Test that events leave out bodies over the limit."""
+        broker = CaptureBroker(LocalBackend(), body_limit=4)
+        event = broker.event_for(self._request(sample_path, body="too large"))
+        assert event["request"]["body"] is None
+        assert event["request"]["body_encoding"] == "omitted"
+
+    def test_subscriber_limit(self):
+        """Test that a worker refuses subscribers past its limit."""
+        broker = CaptureBroker(LocalBackend(), max_subscribers=1)
+        broker.subscribe("a")
+        with pytest.raises(SubscriberLimitReached):
+            broker.subscribe("b")
+        assert broker.stats()["rejected"] == 1
+
+    def test_slow_subscriber_overflows(self, app, sample_path):
+        """Test that a subscriber falling behind is cut off."""
+        broker = CaptureBroker(LocalBackend(), queue_size=2)
+        subscription = broker.subscribe("test-path-123")
+        for _ in range(3):
+            broker.publish("test-path-123", self._request(sample_path))
+
+        assert subscription.overflowed is True
+        assert subscription.get(timeout=0) is None
+        assert broker.stats()["overflowed"] == 1
+
+    def test_postgres_backend_tracks_followed_paths(self, app):
+        """Test that announcements of other workers decide what is published."""
+        backend = PostgresBackend(app, poll_interval=0.05)
+        broker = CaptureBroker(backend)
+        broker._backend.get = Mock()
+        sent = []
+        with patch.object(PostgresBackend, "_notify", lambda self, p: sent.append(p)):
+            broker.publish("remote-path", Mock())
+            assert sent == []
+
+            backend._handle({"sender": "other", "paths": ["remote-path"]})
+            assert backend.has_subscribers("remote-path")
+            with patch.object(broker, "event_for", return_value={"id": "1"}):
+                broker.publish("remote-path", Mock())
+            assert json.loads(sent.pop())["path_id"] == "remote-path"
+
+            with broker.subscribe("local-path"):
+                assert json.loads(sent.pop())["paths"] == ["local-path"]
+                backend._handle({"sender": "new", "sync": True})
+                assert json.loads(sent.pop())["paths"] == ["local-path"]
+            assert json.loads(sent.pop())["paths"] == []
+
+        time.sleep(0.2)
+        assert not backend.has_subscribers("remote-path")
+
+    def test_custom_backend(self, app):
+        """Test that CAPTURE_BROKER accepts a module:Class backend."""
+        app.config["CAPTURE_BROKER"] = "app.services.capture_broker:LocalBackend"
+        broker = CaptureBroker.from_config(app)
+        assert isinstance(broker.backend, LocalBackend)
+
+        app.config["CAPTURE_BROKER"] = "redis"
+        with pytest.raises(ValueError):
+            CaptureBroker.from_config(app)
+
+    def test_sse_stream(self, app, sample_path):
+        """Test the backlog, duplicate skipping and heartbeats of a stream."""
+        broker = CaptureBroker(LocalBackend())
+        subscription = broker.subscribe("test-path-123")
+        first, second = self._request(sample_path), self._request(sample_path)
+        broker.publish("test-path-123", first)
+        broker.publish("test-path-123", second)
+
+        messages = list(
+            sse_stream(
+                subscription,
+                [broker.event_for(first)],
+                heartbeat=0.01,
+                max_duration=0.05,
+            )
+        )
+
+        assert messages[0] == "retry: 1000\n\n"
+        events = [message for message in messages if message.startswith("id:")]
+        assert len(events) == 2
+        assert first.id in events[0]
+        assert second.id in events[1]
+        assert ": keepalive\n\n" in messages
+        assert broker.stats()["subscribers"] == 0
+
+
+class TestColumnarExport:
+    """Test cases for the Parquet and Arrow exports."""
+
+    def _add_requests(self, db_session, path, count):
+        for index in range(count):
+            request = Request(
+                path_id=path.id,
+                method="POST",
+                body=b"x",
+                body_size=1,
+                timestamp=datetime(2025, 1, 1) + timedelta(minutes=index),
+            )
+            request.headers_dict = {"X-Index": str(index), "Accept": "*/*"}
+            if index % 2:
+                request.headers_dict = dict(request.headers_dict, **{"X-Odd": "1"})
+            request.query_params_dict = {"page": str(index)}
+            db_session.add(request)
+        db_session.commit()
+
+    def test_common_keys(self, db_session, sample_path):
+        """Test that the most common names are found, most common first."""
+        self._add_requests(db_session, sample_path, 5)
+
+        header_keys, query_keys = common_keys(sample_path, limit=2)
+
+        assert header_keys == ["Accept", "X-Index"]
+        assert query_keys == ["page"]
+
+    def test_columnar_batches(self, db_session, sample_path):
+        """Test row-group batching and flattening of headers and parameters."""
+        self._add_requests(db_session, sample_path, 5)
+        records = iter_export_records(sample_path, raw=True)
+
+        batches = list(columnar_batches(records, ["X-Odd"], ["page"], 2))
+
+        assert [len(batch["id"]) for batch in batches] == [2, 2, 1]
+        assert batches[0]["header.X-Odd"] == [None, "1"]
+        assert batches[1]["query.page"] == ["2", "3"]
+        assert batches[0]["body"] == [b"x", b"x"]
+        assert batches[0]["timestamp"][0] == datetime(2025, 1, 1)
+        assert "body_encoding" not in batches[0]
+
+    def test_arrow_stream(self, db_session, sample_path):
+        """Test an Arrow stream of every path in record batches."""
+        pyarrow = pytest.importorskip("pyarrow")
+        import pyarrow.ipc  # noqa: F401
+
+        self._add_requests(db_session, sample_path, 5)
+        chunks = columnar_chunks(format="arrow", row_group_size=2)
+
+        reader = pyarrow.ipc.open_stream(b"".join(chunks))
+        batches = list(reader)
+        assert [batch.num_rows for batch in batches] == [2, 2, 1]
+        assert "header.X-Index" in reader.schema.names
+
+
+class TestRequestImporter:
+    """Test cases for RequestImporter."""
+
+    def test_round_trip(self, db_session, sample_path, sample_request):
+        """Test that an NDJSON export imports back into a fresh path."""
+        binary = Request(
+            path_id=sample_path.id,
+            method="PUT",
+            body=b"\xff\xfe",
+            body_size=2,
+            timestamp=sample_request.timestamp - timedelta(minutes=1),
+        )
+        db_session.add(binary)
+        db_session.commit()
+        lines = "".join(ndjson_chunks(iter_export_records(sample_path)))
+        lines = lines.replace(sample_path.path_id, "imported-path")
+        db_session.query(Request).delete()
+        db_session.commit()
+
+        result = RequestImporter(batch_size=1).run(lines.splitlines())
+
+        assert result["imported"] == 2
+        assert result["paths_created"] == 1
+        path = Path.find_by_path_id("imported-path")
+        assert path.request_count == 2
+        assert path.total_body_bytes == sample_request.body_size + 2
+        restored = {request.id: request for request in path.requests}
+        assert restored[binary.id].body == b"\xff\xfe"
+        assert restored[sample_request.id].body == b'{"test": "data"}'
+        assert restored[sample_request.id].headers_dict == sample_request.headers_dict
+
+    def test_skips_existing_and_invalid(self, db_session, sample_path, sample_request):
+        """Test that existing requests and invalid lines are skipped."""
+        lines = list(
+            "".join(ndjson_chunks(iter_export_records(sample_path))).splitlines()
+        )
+        lines += [
+            "not json",
+            '{"path_id": "other", "method": "GET"}',
+            '{"path_id": "other", "method": "GET", "timestamp": "2025-01-01",'
+            ' "body": "aGk=", "body_encoding": "base64"}',
+        ]
+
+        result = RequestImporter().run(lines)
+
+        assert result["read"] == 4
+        assert result["imported"] == 1
+        assert result["skipped"] == 1
+        assert result["invalid"] == 2
+        assert Path.find_by_path_id(sample_path.path_id).request_count == 1
+        other = Path.find_by_path_id("other")
+        assert other.request_count == 1
+        assert other.requests[0].body == b"hi"
+        assert other.requests[0].body_size == 2
+
+
+class TestReplayManager:
+    """Test cases for ReplayManager."""
+
+    def _make_job(self, app, count=3, **settings):
+        from app import db
+        from app.models.replay import ReplayJob
+
+        path = Path.create_new_path()
+        for index in range(count):
+            request = Request(
+                path_id=path.id,
+                method="POST",
+                body=f"body-{index}",
+                body_size=6,
+                timestamp=datetime(2025, 1, 1) + timedelta(seconds=index),
+            )
+            request.headers_dict = {
+                "Content-Type": "text/plain",
+                "Keep-Alive": "timeout=5",
+                "X-Index": str(index),
+            }
+            request.query_params_dict = {"n": str(index)}
+            db.session.add(request)
+        job = ReplayJob(path_id=path.id, **settings)
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+    def test_build_delivery(self, db_session, sample_request):
+        """Test that a captured request is rebuilt without hop-by-hop headers."""
+        sample_request.headers_dict = dict(
+            sample_request.headers_dict, Connection="close"
+        )
+
+        delivery = build_delivery(sample_request, "http://target/hook?a=1")
+
+        assert delivery["method"] == "POST"
+        assert delivery["url"] == "http://target/hook?a=1"
+        assert delivery["params"] == {"param1": "value1"}
+        assert delivery["data"] == b'{"test": "data"}'
+        assert "Connection" not in delivery["headers"]
+        assert delivery["headers"]["X-Replay-Request-Id"] == sample_request.id
+
+    def test_ordered_replay(self, make_app, target_server):
+        """Test that an ordered replay re-sends every request in capture order."""
+        from app import db
+        from app.models.replay import ReplayJob, ReplayResult
+
+        app = make_app()
+        with app.app_context():
+            job_id = self._make_job(
+                app, target_url=f"{target_server.url}/hook", ordered=True
+            )
+            ReplayManager(app).run(job_id)
+
+            received = target_server.received
+            assert [record["body"] for record in received] == [
+                b"body-0",
+                b"body-1",
+                b"body-2",
+            ]
+            assert received[1]["path"] == "/hook"
+            assert received[1]["query"] == {"n": "1"}
+            assert received[1]["headers"]["X-Index"] == "1"
+            assert "Keep-Alive" not in received[1]["headers"]
+            job = db.session.get(ReplayJob, job_id)
+            assert (job.status, job.total, job.sent, job.succeeded) == (
+                "completed",
+                3,
+                3,
+                3,
+            )
+            results, total = ReplayResult.page_for_job(job_id)
+            assert total == 3
+            assert [result.sequence for result in results] == [1, 2, 3]
+
+    def test_retries_and_failures(self, make_app, target_server):
+        """Test that retryable errors are retried and others are final."""
+        from app import db
+        from app.models.replay import ReplayJob, ReplayResult
+
+        failures = {b"body-0": 2}
+
+        def respond(record):
+            if record["body"] == b"body-1":
+                return 400
+            if failures.get(record["body"]):
+                failures[record["body"]] -= 1
+                return 503, {"Retry-After": "0"}
+            return 200
+
+        target_server.respond = respond
+        app = make_app()
+        with app.app_context():
+            job_id = self._make_job(
+                app, count=2, target_url=target_server.url, concurrency=2
+            )
+            ReplayManager(app, backoff_base=0.01).run(job_id)
+
+            job = db.session.get(ReplayJob, job_id)
+            assert (job.status, job.succeeded, job.failed) == ("completed", 1, 1)
+            results = {
+                result.sequence: result
+                for result in ReplayResult.page_for_job(job_id)[0]
+            }
+            assert (results[1].status, results[1].attempts) == ("succeeded", 3)
+            assert (results[2].status, results[2].status_code) == ("failed", 400)
+            assert results[2].attempts == 1
+
+    def test_cancelled_before_start(self, make_app, target_server):
+        """Test that a job cancelled while pending sends nothing."""
+        from app import db
+        from app.models.replay import ReplayJob
+
+        app = make_app()
+        with app.app_context():
+            job_id = self._make_job(app, target_url=target_server.url)
+            assert ReplayJob.request_cancel(job_id)
+            ReplayManager(app).run(job_id)
+
+            assert target_server.received == []
+            assert db.session.get(ReplayJob, job_id).status == "cancelled"
+
+    def test_fail_interrupted(self, make_app, target_server):
+        """Test that only jobs whose worker stopped updating them are failed."""
+        from app import db
+        from app.models.replay import ReplayJob
+
+        app = make_app()
+        with app.app_context():
+            stale_id = self._make_job(app, target_url=target_server.url)
+            live_id = self._make_job(app, target_url=target_server.url)
+            stale = db.session.get(ReplayJob, stale_id)
+            stale.status = "running"
+            stale.updated_at = datetime.utcnow() - timedelta(hours=1)
+            db.session.commit()
+
+            assert ReplayManager(app).fail_interrupted() == 1
+            db.session.expire_all()
+            assert db.session.get(ReplayJob, stale_id).status == "failed"
+            assert db.session.get(ReplayJob, live_id).status == "pending"
+
+    def test_job_limit(self, make_app):
+        """Test that a worker runs at most max_jobs replays at once."""
+        from app.services.replay import ReplayLimitReached
+
+        manager = ReplayManager(make_app(), max_jobs=1)
+        with patch.object(ReplayManager, "run", lambda self, job_id, stop: stop.wait()):
+            manager.start("first")
+            with pytest.raises(ReplayLimitReached):
+                manager.start("second")
+            manager.cancel("first")
+        assert manager.stats()["started"] == 1
+
+    def test_rate_limiter(self):
+        """Test that the rate limiter spaces out calls."""
+        import threading
+
+        limiter = RateLimiter(rate=50)
+        stop = threading.Event()
+        started = time.monotonic()
+        for _ in range(5):
+            assert limiter.wait(stop)
+        assert time.monotonic() - started >= 0.07
+        stop.set()
+        assert not RateLimiter(rate=0.1).wait(stop)
+
+
+class TestForwarder:
+    """Test cases for Forwarder and CircuitBreaker."""
+
+    def test_circuit_breaker(self):
+        """Test opening, the half-open trial call and closing again."""
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow() and breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert not breaker.allow()  # One trial call at a time
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert (breaker.opened, breaker.rejected) == (2, 2)
+
+    def test_forward(self, target_server):
+        """Test that 5xx responses open the circuit of one upstream only."""
+        target_server.respond = lambda record: (
+            503,
+            {"Retry-After": "1", "Connection": "keep-alive"},
+            b"busy",
+        )
+        forwarder = Forwarder(breaker_threshold=2, breaker_reset=60)
+        delivery = {"method": "POST", "url": f"{target_server.url}/a", "data": b"x"}
+
+        result = forwarder.submit(delivery).result()
+        assert (result.status_code, result.body, result.error) == (503, b"busy", None)
+        assert ("Retry-After", "1") in result.headers
+        assert "Connection" not in dict(result.headers)
+        forwarder.forward(delivery)
+        assert forwarder.forward(delivery).error == "circuit_open"
+        assert len(target_server.received) == 2
+
+        other = forwarder.forward(dict(delivery, url="http://127.0.0.1:9/"))
+        assert (other.status_code, other.error) == (None, "connection_error")
+        stats = forwarder.stats()
+        assert (stats["upstreams"], stats["open_circuits"]) == (2, 1)
+        assert (stats["forwarded"], stats["failed"]) == (3, 1)
+
+    def test_forward_result_timeout(self):
+        """Test that waiting for a forward that never finishes is bounded."""
+        forwarder = Forwarder(timeout=0.05, connect_timeout=0.05)
+        pending = Future()
+
+        result = forwarder.result(pending)
+
+        assert (result.status_code, result.error) == (None, "timeout")
+        assert pending.cancelled()
+        assert forwarder.stats()["abandoned"] == 1
+
+    def test_forward_response_limit(self, target_server):
+        """Test that upstream bodies over the limit are not relayed."""
+        target_server.respond = lambda record: (200, {}, b"x" * 100)
+        delivery = {"method": "GET", "url": target_server.url}
+
+        at_limit = Forwarder(max_response_bytes=100).forward(delivery)
+        assert (at_limit.status_code, len(at_limit.body)) == (200, 100)
 
-            assert deleted_count == 5
-            mock_session.commit.assert_called_once()
+        too_large = Forwarder(max_response_bytes=99).forward(delivery)
+        assert (too_large.status_code, too_large.body) == (None, None)
+        assert too_large.error == "response_too_large"
@@ -5,7 +5,18 @@ from datetime import datetime
 
 import pytest
 
+from app.utils.bloom import BloomFilter
+from app.utils.cache import LRUCache
+from app.utils.compression import (
+    CODEC_LZMA,
+    CODEC_NONE,
+    CODEC_ZLIB,
+    compress,
+    decompress,
+)
 from app.utils.helpers import (
+    decode_cursor,
+    encode_cursor,
     format_headers,
     format_timestamp,
     get_client_ip,
@@ -13,11 +24,13 @@ from app.utils.helpers import (
     is_valid_uuid,
     mask_sensitive_headers,
     parse_content_type,
+    parse_timestamp,
     safe_json_loads,
     sanitize_path_id,
     truncate_string,
     validate_pagination_params,
 )
+from app.utils.process import PerProcess
 
 
 class TestUtilityFunctions:
@@ -176,6 +189,29 @@ class TestUtilityFunctions:
         for content_type in non_json_types:
             assert is_json_content_type(content_type) is False
 
+    def test_parse_timestamp(self):
+        """Test ISO 8601 parsing into naive UTC datetimes."""
+        assert parse_timestamp(None) is None
+        assert parse_timestamp("") is None
+        assert parse_timestamp("2024-01-01T10:00:00") == datetime(2024, 1, 1, 10)
+        assert parse_timestamp("2024-01-01T10:00:00Z") == datetime(2024, 1, 1, 10)
+        assert parse_timestamp("2024-01-01T12:00:00+02:00") == datetime(2024, 1, 1, 10)
+
+        with pytest.raises(ValueError):
+            parse_timestamp("not-a-date")
+
+    def test_cursor_round_trip(self):
+        """Test encoding and decoding pagination cursors."""
+        timestamp = datetime(2024, 1, 1, 10, 0, 0, 123456)
+        cursor = encode_cursor(timestamp, "abc", "prev")
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (timestamp, "abc", "prev")
+
+        for bad in ["bogus", encode_cursor(timestamp, "abc", "sideways"), ""]:
+            with pytest.raises(ValueError):
+                decode_cursor(bad)
+
 
 '''
     def test_safe_json_loads(self):
@@ -207,3 +243,161 @@ class TestUtilityFunctions:
         assert masked["Cookie"] == "***MASKED***"
         assert masked["X-API-Key"] == "***MASKED***"
 '''
+
+
+class TestLRUCache:
+    """Test cases for the LRU/TTL cache."""
+
+    def test_get_and_set(self):
+        """Test hits and misses are counted."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after their TTL."""
+        now = [0.0]
+        cache = LRUCache(ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=1)
+
+        now[0] = 5
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+        now[0] = 11
+        assert cache.get("a") is None
+
+    def test_invalidate_and_clear(self):
+        """Test explicit invalidation."""
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.invalidate("a")
+        assert cache.get("a") is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_zero_size_disables_cache(self):
+        """Test that a zero-size cache stores nothing."""
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+
+class TestBloomFilter:
+    """Test cases for the Bloom filter."""
+
+    def test_added_items_are_found(self):
+        """Test that there are no false negatives."""
+        items = [f"path-{i}" for i in range(500)]
+        bloom = BloomFilter.from_items(items, capacity=1000)
+
+        assert all(item in bloom for item in items)
+        assert bloom.count == 500
+
+    def test_false_positive_rate(self):
+        """Test that unknown items are mostly rejected."""
+        bloom = BloomFilter.from_items(
+            (f"path-{i}" for i in range(1000)), capacity=1000, error_rate=0.01
+        )
+
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_readding_does_not_inflate_count(self):
+        """Test that duplicate adds are not counted."""
+        bloom = BloomFilter(capacity=10)
+        bloom.add("a")
+        bloom.add("a")
+
+        assert bloom.count == 1
+
+    def test_invalid_parameters(self):
+        """Test that invalid sizing is rejected."""
+        with pytest.raises(ValueError):
+            BloomFilter(capacity=0)
+        with pytest.raises(ValueError):
+            BloomFilter(error_rate=1.5)
+
+
+class TestPerProcess:
+    """Test cases for per-process lazy values."""
+
+    def test_started_once_per_process(self, monkeypatch):
+        """Test that the value is created on first use and again after a fork."""
+        created = []
+        value = PerProcess(lambda: created.append(1) or len(created))
+
+        assert value.value is None
+        assert value.get() == 1
+        assert value.get() == 1
+
+        monkeypatch.setattr("app.utils.process.os.getpid", lambda: -1)
+        assert value.get() == 2
+        assert len(created) == 2
+
+    def test_restarted_when_not_alive(self):
+        """Test that a stopped value is replaced."""
+        states = []
+
+        def start():
+            states.append({"alive": True})
+            return states[-1]
+
+        value = PerProcess(start, alive=lambda state: state["alive"])
+        first = value.get()
+        first["alive"] = False
+
+        assert value.get() is not first
+        assert len(states) == 2
+
+
+class TestCompression:
+    """Test cases for body compression codecs."""
+
+    def test_round_trip(self):
+        """Test that each codec restores the original bytes."""
+        data = b'{"event": "payment.completed", "amount": 29.99}' * 50
+
+        for name, codec_id in [("zlib", CODEC_ZLIB), ("lzma", CODEC_LZMA)]:
+            stored_codec, stored = compress(data, name, threshold=0)
+            assert stored_codec == codec_id
+            assert len(stored) < len(data)
+            assert decompress(stored_codec, stored) == data
+
+    def test_threshold_and_incompressible_data(self):
+        """Test that small or incompressible bodies are stored as-is."""
+        import os
+
+        assert compress(b"tiny", "zlib", threshold=1024) == (CODEC_NONE, b"tiny")
+        assert compress(None, "zlib") == (CODEC_NONE, None)
+
+        noise = os.urandom(4096)
+        assert compress(noise, "zlib", threshold=0) == (CODEC_NONE, noise)
+        assert compress(noise * 2, "none", threshold=0) == (CODEC_NONE, noise * 2)
+
+    def test_unknown_codec(self):
+        """Test that unknown codec names and ids are rejected."""
+        with pytest.raises(ValueError):
+            compress(b"data" * 1000, "brotli", threshold=0)
+        with pytest.raises(ValueError):
+            decompress(99, b"data")